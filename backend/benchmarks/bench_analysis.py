@@ -0,0 +1,291 @@
+"""
+Analysis benchmark suite
+
+Generates a synthetic repository (see benchmarks.synthetic_repo) and times
+the analysis entry points on it: analyze_all_branches (cold and warm cache),
+analyze_file, find_file_conflicts, compute_diff, the /analyze endpoint and
+how long RepoWatcher takes to notice a moved branch. For every case it
+records wall time, git subprocesses started, CPU time and peak RSS, and can
+compare the results with a JSON file saved from an earlier commit.
+
+Peak RSS is the process high-water mark after each case, so it only ever
+grows; run a single case with --only to measure it in isolation.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_analysis [--branches N] [--files N] [--lines N] [--hunks N]
+                                        [--overlap F] [--repeat N] [--only CASE,...]
+                                        [--json OUT] [--compare OLD.json] [--threshold F]
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from benchmarks.synthetic_repo import RepoSpec, generate_repo
+from gittracker.cache import get_cache
+from gittracker.conflict_analyzer import ConflictAnalyzer
+from gittracker.fs_events import inotify_available
+from gittracker.git_utils import GitUtils
+from gittracker.repo_watcher import RepoWatcher
+
+
+class _ForkCounter:
+    """Counts subprocesses started through the subprocess module (git, mostly)"""
+
+    def __init__(self):
+        self.count = 0
+        self._lock = threading.Lock()
+        counter = self
+
+        class CountingPopen(subprocess.Popen):
+            def __init__(self, *args, **kwargs):
+                with counter._lock:
+                    counter.count += 1
+                super().__init__(*args, **kwargs)
+
+        # subprocess.run and friends look Popen up in the module, so this catches them too
+        subprocess.Popen = CountingPopen
+
+
+def _peak_rss_kb(who: int) -> int:
+    """Peak resident set size in KiB (ru_maxrss is bytes on macOS)"""
+    peak = resource.getrusage(who).ru_maxrss
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+def measure(fn: Callable[[], Any], repeat: int, forks: _ForkCounter,
+            setup: Optional[Callable[[], None]] = None) -> Dict[str, Any]:
+    """Run fn `repeat` times (after setup each time) and collect its costs"""
+    times = []
+    forks_before = forks.count
+    cpu_before = os.times()
+    result = None
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    cpu_after = os.times()
+
+    return {
+        'wall_best': round(min(times), 6),
+        'wall_median': round(statistics.median(times), 6),
+        'forks_per_run': (forks.count - forks_before) / repeat,
+        'cpu_self': round((cpu_after.user + cpu_after.system - cpu_before.user - cpu_before.system) / repeat, 6),
+        'cpu_children': round((cpu_after.children_user + cpu_after.children_system
+                               - cpu_before.children_user - cpu_before.children_system) / repeat, 6),
+        'peak_rss_kb': _peak_rss_kb(resource.RUSAGE_SELF),
+        'peak_rss_children_kb': _peak_rss_kb(resource.RUSAGE_CHILDREN),
+        'result_size': len(result) if hasattr(result, '__len__') else None
+    }
+
+
+def _clear_caches(repo_path: str):
+    """Make the next analysis start cold"""
+    cache = get_cache(repo_path)
+    cache.lines.clear()
+    cache.diffs.clear()
+
+
+def _busiest_file(repo_path: str, branches: List[str]) -> str:
+    """The file edited on the most branches"""
+    git = GitUtils(repo_path)
+    counts: Dict[str, int] = {}
+    for branch in branches:
+        for file_path in git.get_modified_files_between_branches('base', branch):
+            counts[file_path] = counts.get(file_path, 0) + 1
+    return max(sorted(counts), key=counts.get)
+
+
+def _watcher_latency(repo_path: str, mode: str, repeat: int, interval: float) -> Dict[str, Any]:
+    """Seconds from a branch moving to RepoWatcher calling back"""
+    noticed = threading.Event()
+    watcher = RepoWatcher(repo_path, callback=lambda changes: noticed.set(), interval=interval,
+                          mode=mode, fetch_interval=0)
+    watcher.start()
+    git = GitUtils(repo_path)
+    original = git._run_git_command(['rev-parse', 'refs/heads/main'])
+    latencies = []
+    try:
+        for n in range(repeat):
+            commit = git._run_git_command(['commit-tree', 'main^{tree}', '-p', original, '-m', f'bench {n}'])
+            noticed.clear()
+            start = time.perf_counter()
+            git._run_git_command(['update-ref', 'refs/heads/main', commit])
+            if not noticed.wait(max(10.0, interval * 4)):
+                latencies.append(None)
+                continue
+            latencies.append(time.perf_counter() - start)
+    finally:
+        watcher.stop()
+        git._run_git_command(['update-ref', 'refs/heads/main', original])
+
+    seen = [latency for latency in latencies if latency is not None]
+    return {
+        'mode': 'events' if watcher.uses_events else 'poll',
+        'latency_best': round(min(seen), 6) if seen else None,
+        'latency_median': round(statistics.median(seen), 6) if seen else None,
+        'missed': latencies.count(None)
+    }
+
+
+def run(spec: RepoSpec, repeat: int, only: Optional[List[str]] = None,
+        repo_path: Optional[str] = None) -> Dict[str, Any]:
+    """Generate the repository and run every (selected) case"""
+    forks = _ForkCounter()
+    work_dir = None
+    if repo_path is None:
+        work_dir = tempfile.mkdtemp(prefix='gittracker-bench-')
+        repo_path = os.path.join(work_dir, 'repo')
+
+    generate_start = time.perf_counter()
+    info = generate_repo(repo_path, spec)
+    results: Dict[str, Any] = {
+        'spec': spec.to_dict(),
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'git': '.'.join(map(str, GitUtils(repo_path).get_git_version())),
+            'commit': _source_commit(),
+            'executor': os.environ.get('GITTRACKER_EXECUTOR', 'thread')
+        },
+        'generate_seconds': round(time.perf_counter() - generate_start, 3),
+        'cases': {}
+    }
+
+    def wanted(case: str) -> bool:
+        return not only or case in only
+
+    analyzer = ConflictAnalyzer(repo_path)
+    branches = info['branch_names']
+    busiest = _busiest_file(repo_path, branches)
+    git = GitUtils(repo_path)
+    base, one, two = git.get_file_contents([('base', busiest), (branches[0], busiest), (branches[1], busiest)])
+    cases = results['cases']
+
+    if wanted('analyze_all_branches_cold'):
+        cases['analyze_all_branches_cold'] = measure(
+            analyzer.analyze_all_branches, repeat, forks, setup=lambda: _clear_caches(repo_path))
+    if wanted('analyze_all_branches_warm'):
+        analyzer.analyze_all_branches()
+        cases['analyze_all_branches_warm'] = measure(analyzer.analyze_all_branches, repeat, forks)
+    if wanted('analyze_file'):
+        cases['analyze_file'] = measure(lambda: analyzer.analyze_file(busiest), repeat, forks,
+                                        setup=lambda: _clear_caches(repo_path))
+    if wanted('find_file_conflicts'):
+        cases['find_file_conflicts'] = measure(
+            lambda: analyzer.find_file_conflicts(busiest, base, one, two, branches[0], branches[1]), repeat, forks)
+    if wanted('compute_diff'):
+        base_lines, one_lines = base.splitlines(), one.splitlines()
+        cases['compute_diff'] = measure(lambda: analyzer.compute_diff(base_lines, one_lines), repeat, forks)
+    if wanted('analyze_endpoint'):
+        cases['analyze_endpoint'] = _endpoint_case(repo_path, repeat, forks)
+    for mode in ('poll', 'events'):
+        case = f'watcher_{mode}'
+        if not wanted(case):
+            continue
+        if mode == 'events' and not inotify_available():
+            cases[case] = {'skipped': 'inotify is not available'}
+            continue
+        cases[case] = _watcher_latency(repo_path, mode, repeat, interval=0.25)
+
+    if work_dir:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+
+def _endpoint_case(repo_path: str, repeat: int, forks: _ForkCounter) -> Dict[str, Any]:
+    """Time POST /analyze (wait=true) through Flask's test client"""
+    try:
+        from gittracker import server
+    except ImportError as e:
+        return {'skipped': f'server dependencies missing: {e}'}
+
+    client = server.app.test_client()
+
+    def call():
+        response = client.post('/analyze', json={'repo_path': repo_path, 'wait': True})
+        return response.get_json()['conflicts']
+
+    # Each request waits for its job, so the next one is not coalesced with it
+    return measure(call, repeat, forks, setup=lambda: _clear_caches(repo_path))
+
+
+def _source_commit() -> Optional[str]:
+    """Commit of the GitTracker checkout being benchmarked"""
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(old: Dict[str, Any], new: Dict[str, Any], threshold: float) -> List[str]:
+    """Print per-case ratios against an earlier run; return the cases that got slower than threshold"""
+    if old.get('spec') != new.get('spec'):
+        print('warning: the runs used different repository specs')
+    regressions = []
+    for case, stats in new['cases'].items():
+        before = old.get('cases', {}).get(case, {})
+        for metric in ('wall_best', 'latency_median'):
+            if stats.get(metric) and before.get(metric):
+                ratio = stats[metric] / before[metric]
+                print(f"    {case:28} {metric:15} {before[metric]:10.4f} -> {stats[metric]:10.4f}  x{ratio:.2f}")
+                if ratio > 1 + threshold:
+                    regressions.append(case)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    defaults = RepoSpec()
+    for field, value in defaults.to_dict().items():
+        parser.add_argument(f'--{field}', type=type(value), default=value)
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per case (best and median are reported)')
+    parser.add_argument('--only', help='Comma-separated cases to run')
+    parser.add_argument('--repo', help='Generate the repository here and keep it (default: a temporary directory)')
+    parser.add_argument('--json', help='Write results to this file')
+    parser.add_argument('--compare', help='Results of an earlier run to compare with')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='Slowdown (fraction) that counts as a regression with --compare')
+    args = parser.parse_args()
+
+    spec = RepoSpec(**{field: getattr(args, field) for field in defaults.to_dict()})
+    only = args.only.split(',') if args.only else None
+    results = run(spec, args.repeat, only=only, repo_path=args.repo)
+
+    print(f"{spec.branches + 1} branches, {spec.files} files x {spec.lines} lines "
+          f"(generated in {results['generate_seconds']}s)")
+    for case, stats in results['cases'].items():
+        if 'skipped' in stats:
+            print(f"    {case:28} skipped: {stats['skipped']}")
+        elif 'wall_best' in stats:
+            print(f"    {case:28} {stats['wall_best'] * 1000:9.2f} ms  {stats['forks_per_run']:7.1f} forks  "
+                  f"{stats['peak_rss_kb'] // 1024:5} MiB peak")
+        else:
+            print(f"    {case:28} {stats['mode']}: median {stats['latency_median']}s, missed {stats['missed']}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            regressions = compare(json.load(f), results, args.threshold)
+        if regressions:
+            raise SystemExit(f"Slower than {args.compare} by more than {args.threshold:.0%}: {', '.join(regressions)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+"""
+Serialization benchmark
+
+Builds a synthetic RepositoryState with many conflicts and times turning it
+into a response body: the original dataclasses.asdict based to_dict, the
+key-table to_dict, and every available encoder (json, orjson, msgpack).
+Also checks that the fast to_dict produces exactly what asdict did.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_serialization [--conflicts N] [--branches N] [--repeat N] [--json OUT]
+"""
+
+import argparse
+import json
+import time
+from dataclasses import asdict
+from typing import Any, Callable, Dict
+
+from gittracker.models import BranchInfo, Conflict, RepositoryState
+from gittracker.serialization import JSON, MSGPACK, encode, msgpack, orjson
+
+
+def synthetic_state(conflicts: int, branches: int) -> RepositoryState:
+    """Build a repository state of roughly realistic shape"""
+    body = '\n'.join(f'    value_{n} = compute({n})' for n in range(12))
+    return RepositoryState(
+        path='/repo',
+        current_branch='main',
+        branches=[
+            BranchInfo(name=f'feature/{n}', tracking=f'feature/{n}', ahead=n % 3, behind=n % 5,
+                       last_commit='0' * 40, last_commit_date='2024-01-01 00:00:00 +0000', author='dev')
+            for n in range(branches)
+        ],
+        conflicts=[
+            Conflict(file=f'src/module_{n % 400}.py', branch1='main', branch2=f'feature/{n % branches}',
+                     line_start=n, line_end=n + 12, content1=body, content2=body.upper())
+            for n in range(conflicts)
+        ],
+        last_analyzed='2024-01-01T00:00:00',
+        version='0123456789abcdef-1'
+    )
+
+
+def legacy_to_dict(state: RepositoryState) -> Dict[str, Any]:
+    """RepositoryState.to_dict as it was implemented with dataclasses.asdict"""
+    def conflict_to_dict(conflict):
+        d = asdict(conflict)
+        d['lineStart'] = d.pop('line_start')
+        d['lineEnd'] = d.pop('line_end')
+        return d
+
+    result = asdict(state)
+    result['conflicts'] = [conflict_to_dict(c) for c in state.conflicts]
+    result['branches'] = [asdict(b) for b in state.branches]
+    return result
+
+
+def _time(fn: Callable[[], Any], repeat: int) -> float:
+    """Best wall time of `repeat` runs, in seconds"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run(conflicts: int, branches: int, repeat: int) -> Dict:
+    """Time every serialization stage"""
+    state = synthetic_state(conflicts, branches)
+    payload = state.to_dict()
+
+    results = {
+        'conflicts': conflicts,
+        'branches': branches,
+        # Compared as JSON so key order has to match too
+        'to_dict_matches_asdict': json.dumps(payload) == json.dumps(legacy_to_dict(state)),
+        'seconds': {
+            'asdict_to_dict': _time(lambda: legacy_to_dict(state), repeat),
+            'to_dict': _time(state.to_dict, repeat),
+            'json.dumps': _time(lambda: json.dumps(payload).encode('utf-8'), repeat),
+        },
+        'bytes': {
+            'json': len(json.dumps(payload).encode('utf-8')),
+        }
+    }
+
+    if orjson is not None:
+        results['seconds']['orjson'] = _time(lambda: encode(payload, JSON), repeat)
+    if msgpack is not None:
+        results['seconds']['msgpack'] = _time(lambda: encode(payload, MSGPACK), repeat)
+        results['bytes']['msgpack'] = len(encode(payload, MSGPACK))
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--conflicts', type=int, default=5000, help='Conflicts in the synthetic state')
+    parser.add_argument('--branches', type=int, default=200, help='Branches in the synthetic state')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per measurement (best is reported)')
+    parser.add_argument('--json', help='Write results to this file')
+    args = parser.parse_args()
+
+    results = run(args.conflicts, args.branches, args.repeat)
+
+    print(f"{results['conflicts']} conflicts, {results['branches']} branches "
+          f"(to_dict matches asdict: {results['to_dict_matches_asdict']})")
+    for stage, seconds in results['seconds'].items():
+        print(f"    {stage:16} {seconds * 1000:8.2f} ms")
+    for encoding, size in results['bytes'].items():
+        print(f"    {encoding:16} {size:8} bytes")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+    if not results['to_dict_matches_asdict']:
+        raise SystemExit('to_dict output differs from the asdict based implementation')
+
+
+if __name__ == '__main__':
+    main()
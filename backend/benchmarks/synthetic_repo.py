@@ -0,0 +1,138 @@
+"""
+Synthetic repository generator
+
+Builds a local Git repository with a base commit on main and one commit per
+branch (main included) that edits a share of the files. Each edit replaces a
+few lines; with probability `overlap` it lands in one of a file's "hot"
+regions, which other branches edit too, so the overlap rate controls how many
+conflicts the analyzer finds. Everything is written through a single
+`git fast-import`, so even large repositories take seconds to build.
+
+Usage (from the backend directory):
+    python -m benchmarks.synthetic_repo PATH [--branches N] [--files N] [--lines N]
+                                              [--hunks N] [--overlap F] [--touch F] [--seed N]
+"""
+
+import argparse
+import os
+import random
+import shutil
+import subprocess
+from dataclasses import asdict, dataclass
+from typing import Dict, List
+
+
+@dataclass
+class RepoSpec:
+    """Shape of a synthetic repository"""
+    branches: int = 10        # Branches besides main
+    files: int = 200
+    lines: int = 300          # Lines per file
+    hunks: int = 3            # Edits per touched file
+    overlap: float = 0.3      # Chance that an edit hits a region other branches edit too
+    touch: float = 0.2        # Share of files each branch edits
+    seed: int = 0
+
+    def to_dict(self) -> Dict:
+        """Convert to dictionary representation"""
+        return asdict(self)
+
+
+def _file_path(n: int) -> str:
+    """Path of the n-th file, spread over a few directories"""
+    return f'src/pkg_{n % 10}/module_{n}.py'
+
+
+def _base_lines(n: int, lines: int) -> List[str]:
+    """Source-like content of the n-th file on the base commit"""
+    return [f'def func_{n}_{i}(x):' if i % 6 == 0 else f'    return x * {i} + {n}' for i in range(lines)]
+
+
+def _edit(lines: List[str], hot: List[int], branch: str, rng: random.Random, spec: RepoSpec) -> List[str]:
+    """Replace a few lines per hunk, in hot regions with probability spec.overlap"""
+    lines = list(lines)
+    for h in range(spec.hunks):
+        if rng.random() < spec.overlap:
+            start = rng.choice(hot) + rng.randint(-1, 1)
+        else:
+            start = rng.randrange(len(lines))
+        start = max(0, min(start, len(lines) - 1))
+        for i in range(start, min(start + rng.randint(1, 4), len(lines))):
+            lines[i] = f'    return {branch.replace("/", "_")}_{h}(x)  # changed on {branch}'
+    return lines
+
+
+def _blob(lines: List[str]) -> bytes:
+    """Encode file content the way fast-import wants it"""
+    data = ('\n'.join(lines) + '\n').encode('utf-8')
+    return b'data %d\n%s\n' % (len(data), data)
+
+
+def _commit(ref: str, parent: str, message: str, changes: Dict[str, List[str]], timestamp: int) -> bytes:
+    """A fast-import commit command writing every file in `changes`"""
+    msg = message.encode('utf-8')
+    out = [
+        f'commit {ref}\n'.encode('utf-8'),
+        f'committer Bench <bench@example.com> {timestamp} +0000\n'.encode('utf-8'),
+        b'data %d\n%s\n' % (len(msg), msg),
+    ]
+    if parent:
+        out.append(f'from {parent}\n'.encode('utf-8'))
+    for path, lines in sorted(changes.items()):
+        out.append(f'M 100644 inline {path}\n'.encode('utf-8'))
+        out.append(_blob(lines))
+    return b''.join(out)
+
+
+def generate_repo(path: str, spec: RepoSpec) -> Dict:
+    """
+    Create (or recreate) a synthetic repository at `path`
+
+    Returns:
+        The spec plus what was generated: branch names and files edited per branch
+    """
+    if os.path.exists(path):
+        shutil.rmtree(path)
+    os.makedirs(path)
+    subprocess.run(['git', 'init', '-q', '-b', 'main', path], check=True)
+    # Benchmarks commit to the repository too (e.g. to move branches under a watcher)
+    subprocess.run(['git', 'config', 'user.name', 'Bench'], cwd=path, check=True)
+    subprocess.run(['git', 'config', 'user.email', 'bench@example.com'], cwd=path, check=True)
+
+    rng = random.Random(spec.seed)
+    base = {_file_path(n): _base_lines(n, spec.lines) for n in range(spec.files)}
+    # A few regions per file that many branches edit
+    hot = {p: [rng.randrange(spec.lines) for _ in range(3)] for p in base}
+
+    timestamp = 1700000000
+    stream = [_commit('refs/heads/main', '', 'base', base, timestamp), b'reset refs/tags/base\nfrom refs/heads/main\n\n']
+
+    branches = ['main'] + [f'feature/{n}' for n in range(spec.branches)]
+    touched = {}
+    for n, branch in enumerate(branches):
+        files = rng.sample(sorted(base), max(1, int(spec.files * spec.touch)))
+        changes = {p: _edit(base[p], hot[p], branch, rng, spec) for p in files}
+        touched[branch] = len(files)
+        stream.append(_commit(f'refs/heads/{branch}', 'refs/tags/base', f'work on {branch}',
+                              changes, timestamp + n + 1))
+
+    subprocess.run(['git', 'fast-import', '--quiet'], cwd=path, input=b''.join(stream), check=True)
+    subprocess.run(['git', 'checkout', '-q', '-f', 'main'], cwd=path, check=True)
+    return dict(spec.to_dict(), path=path, branch_names=branches, files_touched=touched)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('path', help='Where to create the repository (replaced if it exists)')
+    defaults = RepoSpec()
+    for field, value in defaults.to_dict().items():
+        parser.add_argument(f'--{field}', type=type(value), default=value)
+    args = parser.parse_args()
+
+    spec = RepoSpec(**{field: getattr(args, field) for field in defaults.to_dict()})
+    info = generate_repo(args.path, spec)
+    print(f"Created {info['path']}: {len(info['branch_names'])} branches, {spec.files} files of {spec.lines} lines")
+
+
+if __name__ == '__main__':
+    main()
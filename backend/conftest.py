@@ -0,0 +1 @@
+# Makes the backend directory importable (gittracker is a namespace package) for tests/
@@ -0,0 +1,269 @@
+import os
+import sys
+import json
+import logging
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+from gittracker import metrics
+
+logger = logging.getLogger('GitTracker-cache')
+
+# Rough per-object overheads used for memory accounting
+_LINE_OVERHEAD = 56
+_RANGE_SIZE = 72
+
+
+class Lines(list):
+    """
+    The split lines of one blob (treat as read-only)
+
+    Interned by blob SHA (see intern_lines), so the analysis cache and every
+    Conflict that references the blob share a single copy. A list rather than
+    a tuple because tuple subclasses cannot be weakly referenced.
+    """
+
+    __slots__ = ('sha', '__weakref__')
+
+
+# SHA -> Lines for every blob still referenced by a cache or a Conflict
+_interned_lines: 'weakref.WeakValueDictionary[str, Lines]' = weakref.WeakValueDictionary()
+_interned_lock = threading.Lock()
+
+
+def intern_lines(sha: str, lines: Iterable[str]) -> Lines:
+    """Get the shared Lines of a blob, building them from `lines` if nobody holds them yet"""
+    with _interned_lock:
+        interned = _interned_lines.get(sha)
+        if interned is None:
+            # Interning the strings too shares unchanged lines between versions of a file;
+            # going through a tuple allocates the list at its exact size
+            interned = Lines(tuple(sys.intern(line) for line in lines))
+            interned.sha = sha
+            _interned_lines[sha] = interned
+        return interned
+
+
+def _lines_size(lines: List[str]) -> int:
+    """Approximate memory used by split lines"""
+    return sum(len(line) for line in lines) + _LINE_OVERHEAD * (len(lines) + 1)
+
+
+class LRUCache:
+    """Thread-safe LRU cache bounded by an approximate memory budget"""
+
+    def __init__(self, max_bytes: int):
+        """
+        Initialize the cache
+
+        Args:
+            max_bytes: Approximate memory budget; least recently used entries are evicted beyond it
+        """
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: 'OrderedDict[Hashable, Tuple[Any, int]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Get a cached value, or None on a miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: Hashable, value: Any, size: int):
+        """Store a value with its approximate size in bytes"""
+        if size > self.max_bytes:
+            # Never let one huge entry flush the whole cache
+            return
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.current_bytes -= old[1]
+
+            self._entries[key] = (value, size)
+            self.current_bytes += size
+
+            while self.current_bytes > self.max_bytes and self._entries:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        """Drop every entry"""
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, int]:
+        """Get hit/miss/eviction counters and memory usage"""
+        return {
+            'entries': len(self._entries),
+            'bytes': self.current_bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions
+        }
+
+
+class AnalysisCache:
+    """Content-addressed cache of blob lines and diffs, keyed by object SHA"""
+
+    def __init__(self, repo_path: str, max_bytes: int = 128 * 1024 * 1024, use_disk: bool = False):
+        """
+        Initialize the cache
+
+        Args:
+            repo_path: Path to the Git repository
+            max_bytes: Memory budget shared by the line and diff tiers
+            use_disk: Also persist diffs under .git/gittracker/diffs
+        """
+        self.repo_path = repo_path
+        self.lines = LRUCache(max_bytes * 3 // 4)
+        self.diffs = LRUCache(max_bytes // 4)
+        self.disk_dir = None
+
+        git_dir = os.path.join(repo_path, '.git')
+        if use_disk and os.path.isdir(git_dir):
+            self.disk_dir = os.path.join(git_dir, 'gittracker', 'diffs')
+
+    def get_lines(self, shas: Iterable[Optional[str]],
+                  loader: Callable[[List[str]], List[str]]) -> List[Tuple[str, ...]]:
+        """
+        Get the split lines of several blobs
+
+        Args:
+            shas: Blob SHAs; None stands for a missing file and yields no lines
+            loader: Reads the content of the blobs that are not cached yet, in one batch
+        """
+        shas = list(shas)
+        result: Dict[Optional[str], Tuple[str, ...]] = {None: ()}
+        missing = []
+
+        for sha in shas:
+            if sha in result:
+                continue
+            cached = self.lines.get(sha)
+            if cached is None:
+                with _interned_lock:
+                    # Evicted here, but still alive through some Conflict
+                    cached = _interned_lines.get(sha)
+                if cached is not None:
+                    self.lines.put(sha, cached, _lines_size(cached))
+            if cached is None:
+                missing.append(sha)
+                result[sha] = ()
+            else:
+                result[sha] = cached
+
+        metrics.count('cache_hits', len(shas) - len(missing), tier='lines')
+        metrics.count('cache_misses', len(missing), tier='lines')
+        if missing:
+            for sha, content in zip(missing, loader(missing)):
+                lines = intern_lines(sha, content.splitlines())
+                self.lines.put(sha, lines, _lines_size(lines))
+                result[sha] = lines
+
+        return [result[sha] for sha in shas]
+
+    def get_diff(self, key: Tuple[Hashable, ...],
+                 compute: Callable[[], List[Tuple[int, int]]]) -> List[Tuple[int, int]]:
+        """
+        Get the change ranges for a blob pair, computing them on a miss
+
+        Args:
+            key: Identifies the diff, e.g. (base_sha, branch_sha)
+            compute: Computes the change ranges when neither tier has them
+        """
+        diff = self.diffs.get(key)
+        if diff is not None:
+            metrics.count('cache_hits', tier='diffs')
+            return diff
+        metrics.count('cache_misses', tier='diffs')
+
+        diff = self._read_disk(key)
+        if diff is None:
+            diff = compute()
+            self._write_disk(key, diff)
+
+        self.diffs.put(key, diff, _RANGE_SIZE * (len(diff) + 1))
+        return diff
+
+    def _disk_path(self, key: Tuple[Hashable, ...]) -> str:
+        """Get the on-disk location for a diff key"""
+        name = '-'.join(str(part) for part in key)
+        return os.path.join(self.disk_dir, name[:2], f'{name}.json')
+
+    def _read_disk(self, key: Tuple[Hashable, ...]) -> Optional[List[Tuple[int, int]]]:
+        """Load a diff from the on-disk tier, if enabled and present"""
+        if not self.disk_dir or None in key:
+            return None
+        try:
+            with open(self._disk_path(key), 'r', encoding='utf-8') as f:
+                return [tuple(r) for r in json.load(f)]
+        except (OSError, ValueError):
+            return None
+
+    def _write_disk(self, key: Tuple[Hashable, ...], diff: List[Tuple[int, int]]):
+        """Persist a diff to the on-disk tier, if enabled"""
+        if not self.disk_dir or None in key:
+            return
+        path = self._disk_path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(diff, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not write diff cache entry {path}: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Get counters for both tiers"""
+        return {
+            'lines': self.lines.stats(),
+            'diffs': self.diffs.stats(),
+            'disk': bool(self.disk_dir)
+        }
+
+
+# Shared caches, one per repository
+_caches: Dict[str, AnalysisCache] = {}
+_caches_lock = threading.Lock()
+
+
+def _forget_caches_after_fork():
+    """Start child processes with fresh caches (and locks nobody else can hold)"""
+    global _caches_lock
+    _caches.clear()
+    _caches_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_forget_caches_after_fork)
+
+
+def get_cache(repo_path: str) -> AnalysisCache:
+    """Get the shared analysis cache for a repository, creating it if needed"""
+    with _caches_lock:
+        cache = _caches.get(repo_path)
+        if cache is None:
+            max_mb = int(os.environ.get('GITTRACKER_CACHE_MB', 128))
+            use_disk = os.environ.get('GITTRACKER_DISK_CACHE', 'False').lower() == 'true'
+            cache = AnalysisCache(repo_path, max_bytes=max_mb * 1024 * 1024, use_disk=use_disk)
+            _caches[repo_path] = cache
+        return cache
@@ -0,0 +1,314 @@
+import atexit
+import logging
+import os
+import queue
+import subprocess
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from gittracker import metrics
+from gittracker.git_command import DEFAULT_TIMEOUT, GitTimeoutError
+
+logger = logging.getLogger('GitTracker-catfile')
+
+
+class CatFileError(Exception):
+    """Raised when a cat-file worker process cannot serve a request"""
+
+
+class CatFileProcess:
+    """A long-lived `git cat-file --batch` or `--batch-check` worker process"""
+
+    def __init__(self, repo_path: str, check_only: bool = False):
+        """
+        Initialize the worker
+
+        Args:
+            repo_path: Path to the Git repository
+            check_only: Run `--batch-check` (object info only) instead of `--batch`
+        """
+        self.repo_path = repo_path
+        self.check_only = check_only
+        self.process: Optional[subprocess.Popen] = None
+        self.requests_served = 0
+        self._start()
+
+    def _start(self):
+        """Spawn the underlying git process"""
+        mode = '--batch-check' if self.check_only else '--batch'
+        self.process = subprocess.Popen(
+            ['git', 'cat-file', mode],
+            cwd=self.repo_path,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL
+        )
+
+    def is_alive(self) -> bool:
+        """Health check: the process is running and its pipes are open"""
+        return (
+            self.process is not None
+            and self.process.poll() is None
+            and not self.process.stdin.closed
+        )
+
+    def restart(self):
+        """Kill the current process (if any) and spawn a fresh one"""
+        self.close()
+        self._start()
+
+    def close(self):
+        """Terminate the worker process"""
+        if self.process is None:
+            return
+        try:
+            if not self.process.stdin.closed:
+                self.process.stdin.close()
+            self.process.wait(timeout=1.0)
+        except Exception:
+            self.process.kill()
+            self.process.wait()
+        finally:
+            self.process.stdout.close()
+            self.process = None
+
+    def query(self, specs: List[str],
+              timeout: Optional[float] = None) -> List[Optional[Tuple[str, str, int, Optional[bytes]]]]:
+        """
+        Look up a batch of object specs, pipelining all requests
+
+        Returns one entry per spec: (sha, type, size, content) or None if the
+        object is missing. `content` is None for `--batch-check` workers.
+
+        Args:
+            specs: Object specs, one per request
+            timeout: Seconds the whole batch may take (default GITTRACKER_GIT_TIMEOUT);
+                     past that the process is killed and GitTimeoutError raised
+        """
+        if not self.is_alive():
+            raise CatFileError('cat-file process is not running')
+        timeout = DEFAULT_TIMEOUT if timeout is None else timeout
+        process = self.process
+
+        payload = ''.join(f'{spec}\n' for spec in specs).encode('utf-8')
+
+        # Write from a separate thread so git never blocks on a full stdout
+        # pipe while we are still pushing requests into its stdin
+        write_errors = []
+
+        def _write():
+            try:
+                process.stdin.write(payload)
+                process.stdin.flush()
+            except (BrokenPipeError, OSError, ValueError) as e:
+                write_errors.append(e)
+
+        writer = threading.Thread(target=_write, daemon=True)
+        writer.start()
+
+        # A hung git would block the reads below forever; killing it ends them
+        timed_out = threading.Event()
+
+        def kill():
+            timed_out.set()
+            process.kill()
+
+        watchdog = threading.Timer(timeout, kill)
+        watchdog.daemon = True
+        watchdog.start()
+
+        results = []
+        stdout = process.stdout
+        try:
+            for _ in specs:
+                header = stdout.readline()
+                if not header:
+                    raise CatFileError('cat-file process closed its output')
+
+                parts = header.decode('utf-8', errors='replace').rstrip('\n').split(' ')
+                if len(parts) != 3 or parts[-1] in ('missing', 'ambiguous'):
+                    results.append(None)
+                    continue
+
+                sha, obj_type, size = parts[0], parts[1], int(parts[2])
+                content = None
+                if not self.check_only:
+                    content = stdout.read(size)
+                    stdout.read(1)  # Trailing newline after the object body
+                    if len(content) != size:
+                        raise CatFileError('Truncated object read from cat-file')
+                results.append((sha, obj_type, size, content))
+        except (CatFileError, OSError, ValueError):
+            if timed_out.is_set():
+                raise GitTimeoutError(['cat-file', '--batch-check' if self.check_only else '--batch'],
+                                      timeout) from None
+            raise
+        finally:
+            watchdog.cancel()
+            writer.join()
+
+        if write_errors:
+            raise CatFileError(f'Failed to write to cat-file: {write_errors[0]}')
+
+        self.requests_served += len(specs)
+        return results
+
+
+class CatFilePool:
+    """Bounded pool of cat-file worker processes for a single repository"""
+
+    def __init__(self, repo_path: str, max_processes: int = 4):
+        """
+        Initialize the pool
+
+        Args:
+            repo_path: Path to the Git repository
+            max_processes: Maximum number of workers of each kind (batch / batch-check)
+        """
+        self.repo_path = repo_path
+        self.max_processes = max_processes
+        self._lock = threading.Lock()
+        self._idle = {False: queue.LifoQueue(), True: queue.LifoQueue()}
+        self._created = {False: 0, True: 0}
+        self._closed = False
+
+    def _acquire(self, check_only: bool) -> CatFileProcess:
+        """Check out an idle worker, spawning one if the pool has room"""
+        idle = self._idle[check_only]
+        try:
+            return idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            if self._closed:
+                raise CatFileError('cat-file pool is closed')
+            if self._created[check_only] < self.max_processes:
+                self._created[check_only] += 1
+                spawn = True
+            else:
+                spawn = False
+
+        if spawn:
+            try:
+                return CatFileProcess(self.repo_path, check_only=check_only)
+            except Exception:
+                with self._lock:
+                    self._created[check_only] -= 1
+                raise
+
+        # Pool is full: wait for another thread to hand a worker back, but not
+        # forever, since the holder may itself be stuck on a hung process
+        try:
+            return idle.get(timeout=DEFAULT_TIMEOUT)
+        except queue.Empty:
+            mode = '--batch-check' if check_only else '--batch'
+            raise GitTimeoutError(['cat-file', mode], DEFAULT_TIMEOUT) from None
+
+    def _release(self, worker: CatFileProcess):
+        """Return a worker to the pool"""
+        if self._closed:
+            worker.close()
+            with self._lock:
+                self._created[worker.check_only] -= 1
+            return
+        self._idle[worker.check_only].put(worker)
+
+    def _query(self, specs: List[str], check_only: bool) -> List[Optional[Tuple[str, str, int, Optional[bytes]]]]:
+        """Run a batch of specs through a worker, restarting it after any failure"""
+        worker = self._acquire(check_only)
+        try:
+            if not worker.is_alive():
+                worker.restart()
+            try:
+                return worker.query(specs)
+            except CatFileError as e:
+                # The process died or got out of sync: start over with a fresh one
+                logger.warning(f"Restarting cat-file worker for {self.repo_path}: {e}")
+                worker.restart()
+                return worker.query(specs)
+        except Exception:
+            # Whatever failed mid-batch, output left unread would answer the next query
+            worker.restart()
+            raise
+        finally:
+            self._release(worker)
+
+    def read_objects(self, specs: Iterable[str]) -> List[Optional[bytes]]:
+        """Read the content of several objects in one pipelined round trip"""
+        specs = list(specs)
+        if not specs:
+            return []
+        blobs = [entry[3] if entry else None for entry in self._query(specs, check_only=False)]
+        metrics.count('objects_read', len(specs))
+        metrics.count('git_bytes_read', sum(len(blob) for blob in blobs if blob))
+        return blobs
+
+    def read_object(self, spec: str) -> Optional[bytes]:
+        """Read the content of a single object, or None if it does not exist"""
+        return self.read_objects([spec])[0]
+
+    def object_infos(self, specs: Iterable[str]) -> List[Optional[Tuple[str, str, int]]]:
+        """Resolve several specs to (sha, type, size) without reading content"""
+        specs = list(specs)
+        if not specs:
+            return []
+        return [entry[:3] if entry else None for entry in self._query(specs, check_only=True)]
+
+    def close(self):
+        """Terminate all idle workers; busy workers are closed when released"""
+        with self._lock:
+            self._closed = True
+        for idle in self._idle.values():
+            while True:
+                try:
+                    worker = idle.get_nowait()
+                except queue.Empty:
+                    break
+                worker.close()
+                with self._lock:
+                    self._created[worker.check_only] -= 1
+
+
+# Shared pools, one per repository
+_pools: Dict[str, CatFilePool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(repo_path: str, max_processes: int = 4) -> CatFilePool:
+    """Get the shared cat-file pool for a repository, creating it if needed"""
+    with _pools_lock:
+        pool = _pools.get(repo_path)
+        if pool is None:
+            pool = CatFilePool(repo_path, max_processes=max_processes)
+            _pools[repo_path] = pool
+        return pool
+
+
+def close_pool(repo_path: str):
+    """Shut down the shared pool for a repository"""
+    with _pools_lock:
+        pool = _pools.pop(repo_path, None)
+    if pool:
+        pool.close()
+
+
+def _forget_pools_after_fork():
+    """Drop pools inherited from the parent; their pipes belong to the parent's workers"""
+    global _pools_lock
+    _pools.clear()
+    _pools_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_forget_pools_after_fork)
+
+
+@atexit.register
+def close_all_pools():
+    """Shut down every shared pool (called automatically at exit)"""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
@@ -1,30 +1,107 @@
 import os
-from typing import List, Dict, Any, Tuple, Set
-from difflib import SequenceMatcher
-import re
+import threading
+from typing import List, Dict, Any, Callable, Iterator, Tuple, Set, Optional
+from functools import partial
 
 from gittracker.git_utils import GitUtils
-from gittracker.models import Conflict
+from gittracker.git_command import GitCommandError
+from gittracker.cache import get_cache
+from gittracker.diff_engine import get_diff_engine, merge_ranges
+from gittracker.diff_parser import FileDiff
+from gittracker.intervals import find_overlaps, find_overlaps_batch
+from gittracker.executor import AnalysisExecutor, get_default_executor, call_in_worker
+from gittracker.models import Conflict, ContentRef
+from gittracker import metrics
 
 class ConflictAnalyzer:
     """Analyzes Git repositories for potential merge conflicts"""
     
-    def __init__(self, repo_path: str):
-        """Initialize the analyzer with a repository path"""
+    BACKENDS = ('heuristic', 'hunks', 'merge-tree', 'auto')
+
+    # Files named on a `git diff` command line before falling back to filtering its output
+    PATHSPEC_LIMIT = 256
+    
+    def __init__(self, repo_path: str, executor: Optional[AnalysisExecutor] = None,
+                 diff_engine: Optional[str] = None, backend: Optional[str] = None):
+        """
+        Initialize the analyzer with a repository path
+        
+        Args:
+            repo_path: Path to the Git repository
+            executor: Pool used to fan out branch pairs and per-file diffs
+                      (defaults to the process-wide executor)
+            diff_engine: Line diff engine name (see diff_engine.get_diff_engine)
+            backend: 'heuristic' (three-way blob diffs in Python), 'hunks' (one
+                     `git diff -U0` per side, blobs read only for overlapping files),
+                     'merge-tree' (git's own in-memory merge) or 'auto' (merge-tree
+                     when git supports it); defaults to GITTRACKER_ANALYSIS_BACKEND,
+                     then 'heuristic'
+        """
         self.repo_path = repo_path
         self.git = GitUtils(repo_path)
+        self.cache = get_cache(repo_path)
+        self.diff_engine = get_diff_engine(diff_engine, git=self.git)
+        self.backend = self._resolve_backend(backend or os.environ.get('GITTRACKER_ANALYSIS_BACKEND', 'heuristic'))
+        self.executor = executor or get_default_executor()
         self.conflict_threshold = 0.7  # Threshold for considering changes conflicting
+        self.errors: Dict[Tuple[str, str], str] = {}  # Errors from the last analysis, per branch pair
+        self._side_locks: Dict[Tuple[str, ...], threading.Lock] = {}  # One per branch side being diffed
+        self._side_locks_lock = threading.Lock()
     
-    def analyze_all_branches(self) -> List[Conflict]:
-        """Analyze current branch against all other branches for potential conflicts"""
-        current_branch = self.git.get_current_branch()
-        branches = self.git.get_all_branches()
+    def _resolve_backend(self, backend: str) -> str:
+        """Pick the concrete analysis backend, falling back to the heuristic on old git"""
+        backend = backend.lower()
+        if backend not in self.BACKENDS:
+            raise ValueError(f"Unknown analysis backend: {backend}")
         
-        conflicts = []
+        if backend in ('heuristic', 'hunks'):
+            return backend
+        
+        if self.git.supports_merge_tree():
+            return 'merge-tree'
+        
+        if backend == 'merge-tree':
+            print("git merge-tree --write-tree needs git 2.38+, falling back to the heuristic backend")
+        return 'heuristic'
+    
+    def analyze_all_branches(self, snapshot: Optional[Dict[str, Any]] = None,
+                             progress: Optional[Callable[[str, int, int], None]] = None) -> List[Conflict]:
+        """
+        Analyze current branch against all other branches for potential conflicts
+        
+        Args:
+            snapshot: Ref snapshot from GitUtils.get_ref_snapshot, read if not given
+            progress: Called with (stage, completed, total) as work items finish
+        """
+        snapshot = snapshot or self.git.get_ref_snapshot()
+        current_branch = snapshot['current_branch']
         
         # Only compare current branch with others to improve performance
         # detailed pairwise analysis can be done via specific commands if needed
-        for branch in branches:
+        pairs = [(current_branch, branch, None) for branch in self._comparable_branches(snapshot)]
+        
+        return self._analyze_pairs('_prepare_pair', pairs, progress=progress)
+    
+    def iter_all_branches(self, snapshot: Optional[Dict[str, Any]] = None) -> Iterator[Tuple[str, str, List[Conflict]]]:
+        """
+        Like analyze_all_branches, but yield (branch1, branch2, conflicts) as each pair finishes
+        
+        Args:
+            snapshot: Ref snapshot from GitUtils.get_ref_snapshot, read if not given
+        """
+        snapshot = snapshot or self.git.get_ref_snapshot()
+        current_branch = snapshot['current_branch']
+        pairs = [(current_branch, branch, None) for branch in self._comparable_branches(snapshot)]
+        return self._iter_pairs('_prepare_pair', pairs)
+    
+    def _comparable_branches(self, snapshot: Dict[str, Any]) -> List[str]:
+        """Get the branches the current branch should be compared against"""
+        comparable = []
+        current_branch = snapshot['current_branch']
+        branches = snapshot['branches']
+        current_tracking = branches.get(current_branch, {}).get('tracking')
+        
+        for branch in sorted(branches):
             # Skip if same branch or if it's the current branch (already selected as source)
             if branch == current_branch:
                 continue
@@ -32,32 +109,152 @@ class ConflictAnalyzer:
             # Additional optimization: ignore remote branches if local tracking branch exists?
             # For now, we compare against all to be safe but efficient.
             
-            branch_info = self.git.get_branch_tracking_info(current_branch)
-            other_info = self.git.get_branch_tracking_info(branch)
-            
             # Skip if one tracks the other (fast-forward usually)
-            if branch_info.get('tracking') == branch or other_info.get('tracking') == current_branch:
+            if current_tracking == branch or branches[branch]['tracking'] == current_branch:
                 continue
             
-            # Find potential conflicts between current branch and this branch
-            try:
-                branch_conflicts = self.find_conflicts_between_branches(current_branch, branch)
-                conflicts.extend(branch_conflicts)
-            except Exception as e:
-                # Log error but continue with other branches
-                print(f"Error comparing {current_branch} and {branch}: {e}")
+            comparable.append(branch)
+        
+        return comparable
+    
+    def analyze_incremental(self, previous_conflicts: List[Conflict], changes: Dict[str, Any],
+                            previous_branch: Optional[str] = None,
+                            snapshot: Optional[Dict[str, Any]] = None,
+                            previous_heads: Optional[Dict[str, Optional[str]]] = None) -> List[Conflict]:
+        """
+        Re-analyze only what moved since a previous analysis
+        
+        Args:
+            previous_conflicts: Conflicts from the previous analysis
+            changes: Change set produced by RepoWatcher._detect_changes
+            previous_branch: Current branch at the time of the previous analysis
+            snapshot: Ref snapshot from GitUtils.get_ref_snapshot, read if not given
+            previous_heads: Branch -> commit SHA the previous conflicts were computed
+                            from. When given, moved and new branches are worked out
+                            from it instead of from `changes`, which only covers what
+                            the watcher saw and can miss moves from before it started.
+        """
+        snapshot = snapshot or self.git.get_ref_snapshot()
+        current_branch = snapshot['current_branch']
+        if previous_branch and previous_branch != current_branch:
+            # A checkout changes every pair, so there is nothing to reuse
+            return self.analyze_all_branches(snapshot)
+        
+        if previous_heads is not None:
+            heads = {name: info['sha'] for name, info in snapshot['branches'].items()}
+            moved = {
+                branch: previous_heads[branch]
+                for branch, sha in heads.items()
+                if previous_heads.get(branch) and previous_heads[branch] != sha
+            }
+            new_branches = {branch for branch in heads if not previous_heads.get(branch)}
+        else:
+            moved = {
+                update['branch']: update['old_commit']
+                for update in changes.get('updated_branches', [])
+            }
+            new_branches = set(changes.get('new_branches', ()))
+        
+        # Previous results for each branch compared against the current one
+        previous_by_branch: Dict[str, List[Conflict]] = {}
+        for conflict in previous_conflicts:
+            if conflict.branch1 == current_branch:
+                previous_by_branch.setdefault(conflict.branch2, []).append(conflict)
+        
+        branches = self._comparable_branches(snapshot)
+        stale = [
+            branch for branch in branches
+            if branch in new_branches or current_branch in moved or branch in moved
+        ]
+        
+        # Work out which files each moved pair needs to revisit
+        touched_results = self._fan_out('_files_touched_since', [
+            (current_branch, branch, moved.get(current_branch), moved.get(branch))
+            for branch in stale if branch not in new_branches
+        ])
+        touched_by_branch = dict(zip([b for b in stale if b not in new_branches], touched_results))
+        
+        pairs = []
+        for branch in stale:
+            touched, error = touched_by_branch.get(branch, (None, None))
+            if branch in new_branches or error or touched is None:
+                pairs.append((current_branch, branch, None))
+            elif touched:
+                pairs.append((current_branch, branch, touched))
+        
+        recomputed: Dict[str, List[Conflict]] = {}
+        for conflict in self._analyze_pairs('_prepare_pair', pairs):
+            recomputed.setdefault(conflict.branch2, []).append(conflict)
+        
+        conflicts = []
+        for branch in branches:
+            if branch not in stale:
+                # Neither head moved: the previous result still holds
+                conflicts.extend(previous_by_branch.get(branch, []))
                 continue
+            
+            pair_conflicts = recomputed.get(branch, [])
+            touched, error = touched_by_branch.get(branch, (None, None))
+            if touched is not None and not error:
+                # Keep results for untouched files alongside the recomputed ones
+                pair_conflicts = pair_conflicts + [
+                    c for c in previous_by_branch.get(branch, []) if c.file not in touched
+                ]
+                pair_conflicts.sort(key=lambda c: c.file)
+            conflicts.extend(pair_conflicts)
         
         return conflicts
     
-    def find_conflicts_between_branches(self, branch1: str, branch2: str) -> List[Conflict]:
-        """Find potential conflicts between two branches"""
-        conflicts = []
+    def _files_touched_since(self, branch1: str, branch2: str,
+                             old_commit1: Optional[str], old_commit2: Optional[str]) -> Optional[Set[str]]:
+        """
+        Get the files whose base, branch1 or branch2 version may have changed
+        
+        Any file outside this set has the same three blobs as before, so its
+        previous conflicts are still valid. Returns None when the previous
+        heads are unknown and the pair needs a full re-analysis.
+        """
+        old1 = old_commit1 or branch1
+        old2 = old_commit2 or branch2
+        
+        # The old commits must still exist for their diffs to mean anything
+        old_commits = [c for c in (old_commit1, old_commit2) if c]
+        if any(info is None for info in self.git.cat_file.object_infos(old_commits)):
+            return None
+        
+        old_base = self.git.get_merge_base(old1, old2)
+        new_base = self.git.get_merge_base(branch1, branch2)
+        if not old_base or not new_base:
+            return None
+        
+        touched = set()
+        if old_commit1:
+            touched.update(self.git.get_touched_files(old_commit1, branch1))
+        if old_commit2:
+            touched.update(self.git.get_touched_files(old_commit2, branch2))
+        if old_base != new_base:
+            touched.update(self.git.get_touched_files(old_base, new_base))
+        
+        return touched
+    
+    def find_conflicts_between_branches(self, branch1: str, branch2: str,
+                                        files: Optional[Set[str]] = None) -> List[Conflict]:
+        """Find potential conflicts between two branches, optionally limited to some files"""
+        conflicts = self._analyze_pairs('_prepare_pair', [(branch1, branch2, files)])
         
+        error = self.errors.get((branch1, branch2))
+        if error:
+            raise RuntimeError(error)
+        
+        return conflicts
+    
+    def _prepare_pair(self, branch1: str, branch2: str,
+                      files: Optional[Set[str]] = None) -> List[Tuple[str, str, str, str]]:
+        """Find the files modified on both sides and resolve their three versions to blob SHAs"""
         # Get common ancestor (merge base)
         merge_base = self.git.get_merge_base(branch1, branch2)
         if not merge_base:
-            return conflicts
+            return []
         
         # Get modified files in each branch since the merge base
         files_changed_in_branch1 = set(self.git.get_modified_files_between_branches(merge_base, branch1))
@@ -65,32 +262,377 @@ class ConflictAnalyzer:
         
         # Find files modified in both branches
         common_modified_files = files_changed_in_branch1.intersection(files_changed_in_branch2)
+        if files is not None:
+            common_modified_files &= set(files)
         
-        for file_path in common_modified_files:
-            # Check if file exists in both branches
-            try:
-                content_base = self.git.get_file_content(merge_base, file_path)
-                content_branch1 = self.git.get_file_content(branch1, file_path)
-                content_branch2 = self.git.get_file_content(branch2, file_path)
-            except Exception:
-                # Skip if file doesn't exist in one of the branches
-                continue
+        # Resolve every version of every file to a blob SHA in one round trip
+        file_paths = sorted(common_modified_files)
+        requests = []
+        for file_path in file_paths:
+            requests.extend([(merge_base, file_path), (branch1, file_path), (branch2, file_path)])
+        
+        shas = self.git.get_object_ids(requests)
+        
+        return [
+            (file_path, shas[3 * i], shas[3 * i + 1], shas[3 * i + 2])
+            for i, file_path in enumerate(file_paths)
+        ]
+    
+    def _prepare_file_pair(self, branch1: str, branch2: str,
+                           file_path: str) -> List[Tuple[str, str, str, str]]:
+        """Resolve the three versions of a single file to blob SHAs"""
+        # Find merge base
+        merge_base = self.git.get_merge_base(branch1, branch2)
+        if not merge_base:
+            return []
+        
+        base_sha, sha1, sha2 = self.git.get_object_ids([
+            (merge_base, file_path), (branch1, file_path), (branch2, file_path)
+        ])
+        return [(file_path, base_sha, sha1, sha2)]
+    
+    def _prepare_hunk_pair(self, branch1: str, branch2: str,
+                           files: Optional[Set[str]] = None) -> List[Tuple[str, str, str, str, Any, Any]]:
+        """
+        Find the files whose changes overlap from the hunks of both sides
+        
+        Each side is a single streamed `git diff -U0` against the merge base,
+        so no blob is read here: files that both branches touch in different
+        places are dropped before anything is fetched. Binary files have no
+        hunks, so one changed on both sides is passed on with no ranges and
+        compared blob by blob, as the heuristic backend does.
+        
+        Returns:
+            (file path, base blob SHA, branch1 blob SHA, branch2 blob SHA, branch1 ranges,
+            branch2 ranges) for every file with overlapping changes, ranges as
+            compute_diff gives them (None for binary files)
+        """
+        if files is not None and not files:
+            return []
+        
+        merge_base = self.git.get_merge_base(branch1, branch2)
+        if not merge_base:
+            return []
+        
+        # git's own algorithm closest to the configured engine
+        algorithm = 'histogram' if self.diff_engine.name == 'git-histogram' else 'myers'
+        paths = sorted(files) if files is not None and len(files) <= self.PATHSPEC_LIMIT else None
+        
+        with metrics.timer('hunks'):
+            # Only the ranges of one side are held; the other is intersected as git streams it
+            side1 = self._side_hunks(merge_base, branch1, algorithm, paths)
+            overlapping = []
+            for file_diff in self.git.iter_changed_hunks(merge_base, branch2, algorithm, paths):
+                if file_diff.path not in side1 or not file_diff.new_sha:
+                    continue
+                if files is not None and file_diff.path not in files:
+                    continue
+                metrics.count('files_diffed')
+                base_sha, sha1, ranges1 = side1[file_diff.path]
+                ranges2 = None if file_diff.binary else self._hunk_ranges(file_diff)
+                if ranges1 is None or ranges2 is None or self.find_overlapping_changes(ranges1, ranges2):
+                    overlapping.append((file_diff.path, base_sha, sha1, file_diff.new_sha, ranges1, ranges2))
+        
+        return sorted(overlapping, key=lambda item: item[0])
+    
+    def _prepare_hunk_file_pair(self, branch1: str, branch2: str,
+                                file_path: str) -> List[Tuple[str, str, str, str, Any, Any]]:
+        """Hunk ranges and blob SHAs of a single file, if its changes overlap"""
+        return self._prepare_hunk_pair(branch1, branch2, {file_path})
+    
+    def _side_hunks(self, merge_base: str, branch: str, algorithm: str,
+                    paths: Optional[List[str]] = None) -> Dict[str, Tuple[str, str, Any]]:
+        """
+        Base and branch blob SHAs and hunk ranges of every file a branch changed since the merge base
+        
+        Whole-branch results are kept in the diff cache under the commit SHAs,
+        so the side every pair shares (the current branch) is diffed once, even
+        when the pairs are prepared in parallel.
+        """
+        if paths is not None:
+            return self._read_side_hunks(merge_base, branch, algorithm, paths)
+        
+        commit = self.git.run(['rev-parse', '--verify', f'{branch}^{{commit}}'])
+        key = ('hunks', merge_base, commit, algorithm)
+        with self._side_locks_lock:
+            lock = self._side_locks.setdefault(key, threading.Lock())
+        try:
+            with lock:
+                side = self.cache.diffs.get(key)
+                if side is None:
+                    side = self._read_side_hunks(merge_base, branch, algorithm)
+                    size = sum(len(path) + 150 + 16 * len(ranges or ()) for path, (_, _, ranges) in side.items())
+                    self.cache.diffs.put(key, side, size)
+                return side
+        finally:
+            with self._side_locks_lock:
+                self._side_locks.pop(key, None)
+    
+    def _read_side_hunks(self, merge_base: str, branch: str, algorithm: str,
+                         paths: Optional[List[str]] = None) -> Dict[str, Tuple[str, str, Any]]:
+        """
+        Stream one side's `git diff -U0` into {path: (base blob SHA, blob SHA, ranges)}
+        
+        Deleted files are skipped; binary files get None for ranges.
+        """
+        return {
+            file_diff.path: (file_diff.old_sha, file_diff.new_sha,
+                             None if file_diff.binary else self._hunk_ranges(file_diff))
+            for file_diff in self.git.iter_changed_hunks(merge_base, branch, algorithm, paths)
+            if file_diff.new_sha
+        }
+    
+    def _hunk_ranges(self, file_diff: FileDiff) -> List[Tuple[int, int]]:
+        """New-side hunk ranges of a file, 0-based and merged like compute_diff"""
+        return merge_ranges([(start - 1, end - 1) for start, end in file_diff.new_ranges], gap=3)
+    
+    def _merge_tree_pair(self, branch1: str, branch2: str,
+                         files: Optional[Set[str]] = None) -> List[Conflict]:
+        """Predict conflicts between two branches with git's in-memory merge"""
+        result = self.git.merge_tree(branch1, branch2)
+        if not result:
+            return []
+        
+        file_paths = [f for f in result['conflicted_files'] if files is None or f in files]
+        if not file_paths:
+            return []
+        
+        # Conflicted files in the merged tree carry git's conflict markers
+        merged_contents = self.git.get_file_contents([(result['tree'], f) for f in file_paths])
+        
+        conflicts = []
+        for file_path, merged_content in zip(file_paths, merged_contents):
+            file_conflicts = self._parse_conflict_markers(file_path, merged_content, branch1, branch2)
             
-            # Find potentially conflicting line ranges
-            file_conflicts = self.find_file_conflicts(
-                file_path, content_base, content_branch1, content_branch2, branch1, branch2
-            )
+            if not file_conflicts:
+                # Non-content conflicts (modify/delete, renames, binary files) have no markers
+                message = '\n'.join(
+                    m['message'] for m in result['messages']
+                    if file_path in m['paths'] and m['type'].startswith('CONFLICT')
+                ) or f"Merge conflict in {file_path}"
+                file_conflicts = [Conflict(
+                    file=file_path,
+                    branch1=branch1,
+                    branch2=branch2,
+                    line_start=1,
+                    line_end=1,
+                    content1=message,
+                    content2=message
+                )]
             
             conflicts.extend(file_conflicts)
         
         return conflicts
     
+    def _merge_tree_file_pair(self, branch1: str, branch2: str, file_path: str) -> List[Conflict]:
+        """Predict conflicts in a single file with git's in-memory merge"""
+        return self._merge_tree_pair(branch1, branch2, {file_path})
+    
+    def _parse_conflict_markers(self, file_path: str, merged_content: str,
+                                branch1: str, branch2: str) -> List[Conflict]:
+        """
+        Turn the conflict markers of a merged file into Conflict objects
+        
+        Line numbers count the branch1 side of each conflict, i.e. they are
+        positions in the file you get by resolving every conflict to branch1.
+        """
+        conflicts = []
+        ours, theirs = [], []
+        section = None  # None outside a conflict, else 'ours', 'base' or 'theirs'
+        line_no = 0
+        conflict_start = 0
+        
+        for line in merged_content.splitlines():
+            if line.startswith('<<<<<<<') and section is None:
+                section = 'ours'
+                conflict_start = line_no + 1
+                ours, theirs = [], []
+            elif line.startswith('|||||||') and section == 'ours':
+                # diff3 conflict style: skip the base section
+                section = 'base'
+            elif line.startswith('=======') and section in ('ours', 'base'):
+                section = 'theirs'
+            elif line.startswith('>>>>>>>') and section == 'theirs':
+                conflicts.append(Conflict(
+                    file=file_path,
+                    branch1=branch1,
+                    branch2=branch2,
+                    line_start=conflict_start,
+                    line_end=max(conflict_start, conflict_start + len(ours) - 1),
+                    content1='\n'.join(ours),
+                    content2='\n'.join(theirs)
+                ))
+                section = None
+            elif section == 'ours':
+                ours.append(line)
+                line_no += 1
+            elif section == 'theirs':
+                theirs.append(line)
+            elif section is None:
+                line_no += 1
+        
+        return conflicts
+    
+    def _analyze_pairs(self, prepare: str, pairs: List[Tuple],
+                       progress: Optional[Callable[[str, int, int], None]] = None) -> List[Conflict]:
+        """
+        Analyze several branch pairs in two parallel stages
+        
+        The first stage runs `prepare` on every pair (git-bound work: merge base,
+        modified files, blob SHAs). The second diffs every (pair, file) job.
+        Conflicts come back in pair order, then file order; failures are kept
+        in self.errors instead of aborting the other pairs.
+        """
+        self.errors = {}
+        metrics.count('pairs_analyzed', len(pairs))
+        
+        if self.backend == 'merge-tree':
+            # git computes the whole merge in one process per pair; no per-file stage
+            merge_stage = '_merge_tree_pair' if prepare == '_prepare_pair' else '_merge_tree_file_pair'
+            conflicts = []
+            for pair, (pair_conflicts, error) in zip(pairs, self._fan_out(merge_stage, pairs, progress, 'merge')):
+                if error:
+                    self._record_error(pair[0], pair[1], error)
+                    continue
+                conflicts.extend(pair_conflicts)
+            return conflicts
+        
+        prepare, file_stage = self._line_stages(prepare)
+        self._prime_merge_bases(pairs)
+        jobs = []
+        for pair, (files, error) in zip(pairs, self._fan_out(prepare, pairs, progress, 'prepare')):
+            branch1, branch2 = pair[0], pair[1]
+            if error:
+                self._record_error(branch1, branch2, error)
+                continue
+            for file_job in files:
+                jobs.append(tuple(file_job) + (branch1, branch2))
+        
+        conflicts = []
+        for job, (file_conflicts, error) in zip(jobs, self._fan_out(file_stage, jobs, progress, 'diff')):
+            if error:
+                self._record_error(job[-2], job[-1], error)
+                continue
+            conflicts.extend(file_conflicts)
+        
+        return conflicts
+    
+    def _iter_pairs(self, prepare: str, pairs: List[Tuple]) -> Iterator[Tuple[str, str, List[Conflict]]]:
+        """
+        Streaming counterpart of _analyze_pairs
+        
+        Pairs are prepared in parallel as in _analyze_pairs, but each pair's files
+        are diffed (and its conflicts yielded) before moving on to the next pair,
+        so results arrive in pair order without holding every pair in memory.
+        Pairs that fail are recorded in self.errors and yield no conflicts.
+        """
+        self.errors = {}
+        metrics.count('pairs_analyzed', len(pairs))
+        
+        if self.backend == 'merge-tree':
+            merge_stage = '_merge_tree_pair' if prepare == '_prepare_pair' else '_merge_tree_file_pair'
+            for pair, (pair_conflicts, error) in zip(pairs, self.executor.imap(self._stage_fn(merge_stage), pairs)):
+                if error:
+                    self._record_error(pair[0], pair[1], error)
+                yield pair[0], pair[1], pair_conflicts or []
+            return
+        
+        prepare, file_stage = self._line_stages(prepare)
+        self._prime_merge_bases(pairs)
+        for pair, (files, error) in zip(pairs, self.executor.imap(self._stage_fn(prepare), pairs)):
+            branch1, branch2 = pair[0], pair[1]
+            if error:
+                self._record_error(branch1, branch2, error)
+                yield branch1, branch2, []
+                continue
+            
+            jobs = [tuple(file_job) + (branch1, branch2) for file_job in files]
+            pair_conflicts = []
+            for file_conflicts, error in self._fan_out(file_stage, jobs):
+                if error:
+                    self._record_error(branch1, branch2, error)
+                    continue
+                pair_conflicts.extend(file_conflicts)
+            yield branch1, branch2, pair_conflicts
+    
+    def _line_stages(self, prepare: str) -> Tuple[str, str]:
+        """The prepare and per-file stage methods of the line-based backends"""
+        if self.backend == 'hunks':
+            hunk_prepare = '_prepare_hunk_pair' if prepare == '_prepare_pair' else '_prepare_hunk_file_pair'
+            return hunk_prepare, 'find_range_conflicts'
+        return prepare, 'find_blob_conflicts'
+    
+    def _prime_merge_bases(self, pairs: List[Tuple]):
+        """Compute the merge bases of every pair in one batch, so the prepare stage finds them memoized"""
+        if len(pairs) < 2:
+            return
+        try:
+            self.git.get_merge_bases([(pair[0], pair[1]) for pair in pairs])
+        except GitCommandError:
+            # A bad pair is reported by its own prepare stage
+            pass
+    
+    def _record_error(self, branch1: str, branch2: str, error: Exception):
+        """Log an error for a branch pair and keep going with the others"""
+        print(f"Error comparing {branch1} and {branch2}: {error}")
+        self.errors.setdefault((branch1, branch2), str(error))
+    
+    def _fan_out(self, method: str, items: List[Tuple],
+                 progress: Optional[Callable[[str, int, int], None]] = None,
+                 stage: str = None) -> List[Tuple[Any, Optional[Exception]]]:
+        """Run an analyzer method over many argument tuples through the executor"""
+        if progress:
+            progress(stage, 0, len(items))
+            
+            def on_progress(completed: int):
+                progress(stage, completed, len(items))
+        else:
+            on_progress = None
+        
+        return self.executor.map(self._stage_fn(method), items, on_progress=on_progress)
+    
+    def _stage_fn(self, method: str) -> Callable:
+        """Get a callable for an analyzer method that the executor can run"""
+        if self.executor.mode == 'process':
+            # Bound methods can't cross process boundaries; workers rebuild the analyzer
+            return partial(call_in_worker, self._worker_config(), method)
+        return getattr(self, method)
+    
+    def _worker_config(self) -> Dict[str, Any]:
+        """Constructor arguments for rebuilding this analyzer in a worker process"""
+        return {'repo_path': self.repo_path, 'diff_engine': self.diff_engine.name, 'backend': self.backend}
+    
+    def find_blob_conflicts(self, file_path: str, base_sha: str, sha1: str, sha2: str,
+                            branch1: str, branch2: str) -> List[Conflict]:
+        """Find potential conflicts in a file given the blob SHAs of its three versions"""
+        # Lines and diffs are content-addressed, so unchanged blobs are never re-read or re-diffed
+        base_lines, branch1_lines, branch2_lines = self.cache.get_lines(
+            [base_sha, sha1, sha2], self.git.get_blob_contents
+        )
+        
+        engine = self.diff_engine.name
+        diff1 = self.cache.get_diff((base_sha, sha1, engine), lambda: self.compute_diff(base_lines, branch1_lines))
+        diff2 = self.cache.get_diff((base_sha, sha2, engine), lambda: self.compute_diff(base_lines, branch2_lines))
+        
+        return self._build_conflicts(file_path, branch1_lines, branch2_lines, diff1, diff2, branch1, branch2)
+    
+    def find_range_conflicts(self, file_path: str, base_sha: Optional[str], sha1: str, sha2: str,
+                             diff1: Optional[List[Tuple[int, int]]], diff2: Optional[List[Tuple[int, int]]],
+                             branch1: str, branch2: str) -> List[Conflict]:
+        """
+        Find potential conflicts in a file whose change ranges are known, reading only the two branch blobs
+        
+        Without ranges for either side (binary files) the three blobs are diffed as find_blob_conflicts does.
+        """
+        if diff1 is None or diff2 is None:
+            return self.find_blob_conflicts(file_path, base_sha, sha1, sha2, branch1, branch2)
+        branch1_lines, branch2_lines = self.cache.get_lines([sha1, sha2], self.git.get_blob_contents)
+        return self._build_conflicts(file_path, branch1_lines, branch2_lines, diff1, diff2, branch1, branch2)
+    
     def find_file_conflicts(self, file_path: str, base_content: str, 
                            branch1_content: str, branch2_content: str,
                            branch1: str, branch2: str) -> List[Conflict]:
         """Find potential conflicts in a specific file between two branches"""
-        conflicts = []
-        
         # Split content into lines
         base_lines = base_content.splitlines()
         branch1_lines = branch1_content.splitlines()
@@ -100,16 +642,24 @@ class ConflictAnalyzer:
         diff1 = self.compute_diff(base_lines, branch1_lines)
         diff2 = self.compute_diff(base_lines, branch2_lines)
         
+        return self._build_conflicts(file_path, branch1_lines, branch2_lines, diff1, diff2, branch1, branch2)
+    
+    def _build_conflicts(self, file_path: str, branch1_lines: List[str], branch2_lines: List[str],
+                         diff1: List[Tuple[int, int]], diff2: List[Tuple[int, int]],
+                         branch1: str, branch2: str) -> List[Conflict]:
+        """Turn overlapping change ranges into Conflict objects"""
+        conflicts = []
+        
         # Find overlapping changes
         overlaps = self.find_overlapping_changes(diff1, diff2)
         
         for start1, end1, start2, end2 in overlaps:
-            # Get context for the conflict
-            context1 = '\n'.join(branch1_lines[max(0, start1-1):min(len(branch1_lines), end1+1)])
-            context2 = '\n'.join(branch2_lines[max(0, start2-1):min(len(branch2_lines), end2+1)])
+            # Get context for the conflict; references into the shared lines, joined only when read
+            context1 = ContentRef(branch1_lines, max(0, start1-1), min(len(branch1_lines), end1+1))
+            context2 = ContentRef(branch2_lines, max(0, start2-1), min(len(branch2_lines), end2+1))
             
             # Only include meaningful conflicts (non-empty changes)
-            if context1.strip() and context2.strip():
+            if self._has_text(context1) and self._has_text(context2):
                 conflict = Conflict(
                     file=file_path,
                     branch1=branch1,
@@ -123,41 +673,32 @@ class ConflictAnalyzer:
         
         return conflicts
     
+    def _has_text(self, content: ContentRef) -> bool:
+        """Whether referenced lines contain anything but whitespace"""
+        return any(line.strip() for line in content.lines[content.start:content.end])
+    
     def compute_diff(self, a: List[str], b: List[str]) -> List[Tuple[int, int]]:
         """Compute diff between two lists of lines"""
-        matcher = SequenceMatcher(None, a, b)
-        changes = []
-        
-        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
-            if tag in ('replace', 'delete', 'insert'):
-                changes.append((j1, j2-1))  # Convert to inclusive end index
-        
-        # Merge adjacent or overlapping changes
-        if changes:
-            merged_changes = [changes[0]]
-            for current in changes[1:]:
-                prev = merged_changes[-1]
-                if current[0] <= prev[1] + 3:  # Allow small gaps (3 lines)
-                    merged_changes[-1] = (prev[0], max(prev[1], current[1]))
-                else:
-                    merged_changes.append(current)
+        metrics.count('files_diffed')
+        with metrics.timer('diff'):
+            # Changed ranges on the b side, with inclusive end indexes
+            changes = self.diff_engine.changed_ranges(a, b)
             
-            return merged_changes
-        
-        return []
+            # Merge adjacent or overlapping changes, allowing small gaps (3 lines)
+            return merge_ranges(changes, gap=3)
     
     def find_overlapping_changes(self, changes1: List[Tuple[int, int]], 
                                 changes2: List[Tuple[int, int]]) -> List[Tuple[int, int, int, int]]:
         """Find overlapping changes between two sets of changes"""
-        overlaps = []
-        
-        for start1, end1 in changes1:
-            for start2, end2 in changes2:
-                # Check for overlap
-                if self.is_overlapping(start1, end1, start2, end2):
-                    overlaps.append((start1, end1, start2, end2))
-        
-        return overlaps
+        # Sort-and-sweep instead of comparing every pair of hunks
+        with metrics.timer('overlap'):
+            return find_overlaps(changes1, changes2)
+    
+    def find_overlapping_changes_batch(
+            self, changes: Dict[str, Tuple[List[Tuple[int, int]], List[Tuple[int, int]]]]
+    ) -> Dict[str, List[Tuple[int, int, int, int]]]:
+        """Find overlapping changes for many files at once, keyed by file path"""
+        return find_overlaps_batch(changes)
     
     def is_overlapping(self, start1: int, end1: int, start2: int, end2: int) -> bool:
         """Check if two ranges overlap"""
@@ -166,39 +707,22 @@ class ConflictAnalyzer:
     
     def analyze_file(self, file_path: str) -> List[Conflict]:
         """Analyze a specific file across all branches"""
+        return self._analyze_pairs('_prepare_file_pair', self._file_pairs(file_path))
+    
+    def iter_file(self, file_path: str) -> Iterator[Tuple[str, str, List[Conflict]]]:
+        """Like analyze_file, but yield (branch1, branch2, conflicts) as each pair finishes"""
+        return self._iter_pairs('_prepare_file_pair', self._file_pairs(file_path))
+    
+    def _file_pairs(self, file_path: str) -> List[Tuple[str, str, str]]:
+        """Every pair of branches, for analyzing one file"""
         branches = self.git.get_all_branches()
-        conflicts = []
         
-        for i, branch1 in enumerate(branches):
-            for branch2 in branches[i+1:]:
-                if branch1 == branch2:
-                    continue
-                
-                # Check if file exists in both branches
-                try:
-                    content1 = self.git.get_file_content(branch1, file_path)
-                    content2 = self.git.get_file_content(branch2, file_path)
-                except Exception:
-                    continue
-                
-                # Find merge base
-                merge_base = self.git.get_merge_base(branch1, branch2)
-                if not merge_base:
-                    continue
-                
-                try:
-                    base_content = self.git.get_file_content(merge_base, file_path)
-                except Exception:
-                    continue
-                
-                # Find conflicts in this file between these branches
-                file_conflicts = self.find_file_conflicts(
-                    file_path, base_content, content1, content2, branch1, branch2
-                )
-                
-                conflicts.extend(file_conflicts)
-        
-        return conflicts
+        return [
+            (branch1, branch2, file_path)
+            for i, branch1 in enumerate(branches)
+            for branch2 in branches[i+1:]
+            if branch1 != branch2
+        ]
     
     def suggest_resolution(self, conflict: Conflict) -> str:
         """Suggest a resolution for a conflict"""
@@ -210,11 +734,9 @@ class ConflictAnalyzer:
         lines1 = content1.splitlines()
         lines2 = content2.splitlines()
         
-        matcher = SequenceMatcher(None, lines1, lines2)
-        
         # Build a merged version
         merged = []
-        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        for tag, i1, i2, j1, j2 in self.diff_engine.get_opcodes(lines1, lines2):
             if tag == 'equal':
                 # Add lines that are the same in both versions
                 merged.extend(lines1[i1:i2])
@@ -0,0 +1,241 @@
+import os
+import tempfile
+from difflib import SequenceMatcher
+from typing import Dict, Hashable, List, Optional, Sequence, Tuple
+
+from gittracker.diff_parser import iter_parse_diff
+
+# (tag, i1, i2, j1, j2) in the same shape as SequenceMatcher.get_opcodes()
+Opcode = Tuple[str, int, int, int, int]
+
+
+class DiffEngine:
+    """Base class for line diff engines"""
+
+    name = 'base'
+
+    def get_opcodes(self, a: Sequence[str], b: Sequence[str]) -> List[Opcode]:
+        """Get the edit script turning a into b"""
+        raise NotImplementedError
+
+    def changed_ranges(self, a: Sequence[str], b: Sequence[str]) -> List[Tuple[int, int]]:
+        """Get the changed line ranges on the b side as (start, inclusive end), 0-based"""
+        return [
+            (j1, j2 - 1)
+            for tag, i1, i2, j1, j2 in self.get_opcodes(a, b)
+            if tag != 'equal'
+        ]
+
+
+class SequenceMatcherEngine(DiffEngine):
+    """difflib.SequenceMatcher based diff (the original engine)"""
+
+    name = 'sequencematcher'
+
+    def get_opcodes(self, a: Sequence[str], b: Sequence[str]) -> List[Opcode]:
+        return SequenceMatcher(None, a, b).get_opcodes()
+
+
+class MyersDiffEngine(DiffEngine):
+    """Linear-space Myers O(ND) diff over lines interned to integer IDs"""
+
+    name = 'myers'
+
+    def get_opcodes(self, a: Sequence[str], b: Sequence[str]) -> List[Opcode]:
+        ids: Dict[Hashable, int] = {}
+        a_ids = [ids.setdefault(line, len(ids)) for line in a]
+        b_ids = [ids.setdefault(line, len(ids)) for line in b]
+        return _runs_to_opcodes(_myers_runs(a_ids, b_ids), len(a), len(b))
+
+
+class GitHistogramEngine(DiffEngine):
+    """Delegates to `git diff --histogram`, streamed through diff_parser.iter_parse_diff"""
+
+    name = 'git-histogram'
+
+    def __init__(self, git):
+        """Initialize with a GitUtils instance used to run git"""
+        self.git = git
+        self._fallback = MyersDiffEngine()
+
+    def get_opcodes(self, a: Sequence[str], b: Sequence[str]) -> List[Opcode]:
+        # git only reports the changed side we need for ranges; full opcodes come from Myers
+        return self._fallback.get_opcodes(a, b)
+
+    def changed_ranges(self, a: Sequence[str], b: Sequence[str]) -> List[Tuple[int, int]]:
+        if list(a) == list(b):
+            return []
+
+        with tempfile.TemporaryDirectory(prefix='gittracker-diff-') as tmp_dir:
+            paths = []
+            for name, lines in (('a', a), ('b', b)):
+                path = os.path.join(tmp_dir, name)
+                with open(path, 'w', encoding='utf-8', errors='surrogateescape', newline='\n') as f:
+                    f.write(''.join(f'{line}\n' for line in lines))
+                paths.append(path)
+
+            # Exit code 1 just means the files differ; hunks are parsed as git writes them
+            ranges = []
+            for file_diff in iter_parse_diff(self.git.iter_lines(
+                    ['diff', '--no-index', '--histogram', '-U0', '--no-color', '--no-ext-diff', *paths],
+                    ok_returncodes=(0, 1))):
+                # 1-based inclusive ranges; zero-count hunks are empty ranges (start, start - 1)
+                ranges.extend((start - 1, end - 1) for start, end in file_diff.new_ranges)
+        return ranges
+
+
+_ENGINES = {
+    SequenceMatcherEngine.name: SequenceMatcherEngine,
+    MyersDiffEngine.name: MyersDiffEngine,
+    GitHistogramEngine.name: GitHistogramEngine,
+}
+
+
+def get_diff_engine(name: Optional[str] = None, git=None) -> DiffEngine:
+    """
+    Create a diff engine by name
+
+    Args:
+        name: 'myers', 'sequencematcher' or 'git-histogram'; defaults to
+              GITTRACKER_DIFF_ENGINE, then 'myers'
+        git: GitUtils instance, required by the git-histogram engine
+    """
+    name = (name or os.environ.get('GITTRACKER_DIFF_ENGINE') or MyersDiffEngine.name).lower()
+    if name not in _ENGINES:
+        raise ValueError(f"Unknown diff engine: {name}")
+    if name == GitHistogramEngine.name:
+        if git is None:
+            raise ValueError("The git-histogram diff engine needs a GitUtils instance")
+        return GitHistogramEngine(git)
+    return _ENGINES[name]()
+
+
+def merge_ranges(changes: List[Tuple[int, int]], gap: int = 3) -> List[Tuple[int, int]]:
+    """Merge sorted change ranges that overlap or are at most `gap` lines apart"""
+    if not changes:
+        return []
+
+    merged_changes = [changes[0]]
+    for current in changes[1:]:
+        prev = merged_changes[-1]
+        if current[0] <= prev[1] + gap:
+            merged_changes[-1] = (prev[0], max(prev[1], current[1]))
+        else:
+            merged_changes.append(current)
+
+    return merged_changes
+
+
+def _myers_runs(a: List[int], b: List[int]) -> List[Tuple[int, int, int]]:
+    """Get the matching runs (i, j, length) of a minimal diff between a and b"""
+    runs = []
+    # Explicit stack of (a_lo, a_hi, b_lo, b_hi) regions instead of recursion
+    stack = [(0, len(a), 0, len(b))]
+
+    while stack:
+        a_lo, a_hi, b_lo, b_hi = stack.pop()
+
+        # Strip the common prefix and suffix
+        start_a, start_b = a_lo, b_lo
+        while a_lo < a_hi and b_lo < b_hi and a[a_lo] == b[b_lo]:
+            a_lo += 1
+            b_lo += 1
+        if a_lo > start_a:
+            runs.append((start_a, start_b, a_lo - start_a))
+
+        end_a = a_hi
+        while a_lo < a_hi and b_lo < b_hi and a[a_hi - 1] == b[b_hi - 1]:
+            a_hi -= 1
+            b_hi -= 1
+        if a_hi < end_a:
+            runs.append((a_hi, b_hi, end_a - a_hi))
+
+        if a_lo == a_hi or b_lo == b_hi:
+            # Pure insertion or deletion
+            continue
+
+        x_start, y_start, x_end, y_end = _middle_snake(a, b, a_lo, a_hi, b_lo, b_hi)
+        if x_end > x_start:
+            runs.append((x_start, y_start, x_end - x_start))
+        stack.append((x_end, a_hi, y_end, b_hi))
+        stack.append((a_lo, x_start, b_lo, y_start))
+
+    runs.sort()
+    return runs
+
+
+def _middle_snake(a: List[int], b: List[int], a_lo: int, a_hi: int,
+                  b_lo: int, b_hi: int) -> Tuple[int, int, int, int]:
+    """Find the middle snake of the shortest edit script (Myers 1986, section 4b)"""
+    n = a_hi - a_lo
+    m = b_hi - b_lo
+    delta = n - m
+    odd = delta & 1
+    max_d = (n + m + 1) // 2
+    offset = max_d + 1
+    forward = [0] * (2 * max_d + 3)
+    backward = [0] * (2 * max_d + 3)
+
+    for d in range(max_d + 1):
+        # Forward search from the top-left corner
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and forward[offset + k - 1] < forward[offset + k + 1]):
+                x = forward[offset + k + 1]
+            else:
+                x = forward[offset + k - 1] + 1
+            y = x - k
+            x0, y0 = x, y
+            while x < n and y < m and a[a_lo + x] == b[b_lo + y]:
+                x += 1
+                y += 1
+            forward[offset + k] = x
+
+            c = delta - k
+            if odd and -(d - 1) <= c <= d - 1 and x + backward[offset + c] >= n:
+                return a_lo + x0, b_lo + y0, a_lo + x, b_lo + y
+
+        # Backward search from the bottom-right corner, in reversed coordinates
+        for c in range(-d, d + 1, 2):
+            if c == -d or (c != d and backward[offset + c - 1] < backward[offset + c + 1]):
+                x = backward[offset + c + 1]
+            else:
+                x = backward[offset + c - 1] + 1
+            y = x - c
+            x0, y0 = x, y
+            while x < n and y < m and a[a_hi - 1 - x] == b[b_hi - 1 - y]:
+                x += 1
+                y += 1
+            backward[offset + c] = x
+
+            k = delta - c
+            if not odd and -d <= k <= d and x + forward[offset + k] >= n:
+                return a_hi - x, b_hi - y, a_hi - x0, b_hi - y0
+
+    # Unreachable for valid input: the searches always meet by max_d
+    raise RuntimeError("Myers diff failed to find a middle snake")
+
+
+def _runs_to_opcodes(runs: List[Tuple[int, int, int]], len_a: int, len_b: int) -> List[Opcode]:
+    """Turn sorted matching runs into SequenceMatcher-style opcodes"""
+    opcodes = []
+    i = j = 0
+
+    for run_i, run_j, size in runs + [(len_a, len_b, 0)]:
+        if i < run_i and j < run_j:
+            opcodes.append(('replace', i, run_i, j, run_j))
+        elif i < run_i:
+            opcodes.append(('delete', i, run_i, j, j))
+        elif j < run_j:
+            opcodes.append(('insert', i, i, j, run_j))
+
+        if size:
+            if opcodes and opcodes[-1][0] == 'equal' and opcodes[-1][2] == run_i:
+                # Adjacent runs (e.g. prefix + snake) collapse into one block
+                _, i1, _, j1, _ = opcodes.pop()
+                opcodes.append(('equal', i1, run_i + size, j1, run_j + size))
+            else:
+                opcodes.append(('equal', run_i, run_i + size, run_j, run_j + size))
+
+        i, j = run_i + size, run_j + size
+
+    return opcodes
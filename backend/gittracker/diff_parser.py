@@ -0,0 +1,191 @@
+import re
+from dataclasses import dataclass, field
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+# old_start, old_count, new_start, new_count as written in the hunk header
+Hunk = Tuple[int, int, int, int]
+
+_HUNK_HEADER = re.compile(r'^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@')
+
+_ESCAPES = {'a': 7, 'b': 8, 't': 9, 'n': 10, 'v': 11, 'f': 12, 'r': 13, '"': 34, '\\': 92}
+
+DEV_NULL = '/dev/null'
+
+
+@dataclass
+class FileDiff:
+    """The hunks of one file in a unified diff"""
+    old_path: Optional[str]          # None for added files
+    new_path: Optional[str]          # None for deleted files
+    status: str = 'modified'         # modified, added, deleted, renamed or copied
+    binary: bool = False
+    hunks: List[Hunk] = field(default_factory=list)
+    old_sha: Optional[str] = None    # Blob IDs from the index line (abbreviated unless --full-index)
+    new_sha: Optional[str] = None
+
+    @property
+    def path(self) -> str:
+        """The path the file has after the change (before it, if deleted)"""
+        return self.new_path if self.new_path is not None else self.old_path
+
+    @property
+    def old_ranges(self) -> List[Tuple[int, int]]:
+        """Changed lines on the old side as 1-based inclusive ranges (see hunk_range)"""
+        return [hunk_range(start, count) for start, count, _, _ in self.hunks]
+
+    @property
+    def new_ranges(self) -> List[Tuple[int, int]]:
+        """Changed lines on the new side as 1-based inclusive ranges (see hunk_range)"""
+        return [hunk_range(start, count) for _, _, start, count in self.hunks]
+
+
+def hunk_range(start: int, count: int) -> Tuple[int, int]:
+    """
+    Turn a hunk side into a 1-based inclusive (start, end) range
+
+    A zero-count side (a pure insertion or deletion) names the line *after*
+    which the change sits, so it becomes the empty range (start + 1, start).
+    """
+    if count == 0:
+        return (start + 1, start)
+    return (start, start + count - 1)
+
+
+def unquote_path(path: str) -> str:
+    """Undo git's C-style quoting of paths with special or non-ASCII characters"""
+    if len(path) < 2 or not (path.startswith('"') and path.endswith('"')):
+        return path
+    out = bytearray()
+    text = path[1:-1]
+    i = 0
+    while i < len(text):
+        char = text[i]
+        if char != '\\' or i + 1 == len(text):
+            out += char.encode('utf-8')
+            i += 1
+        elif text[i + 1] in _ESCAPES:
+            out.append(_ESCAPES[text[i + 1]])
+            i += 2
+        elif text[i + 1:i + 4].isdigit():
+            # Octal escape of one UTF-8 byte
+            out.append(int(text[i + 1:i + 4], 8) & 0xFF)
+            i += 4
+        else:
+            out += char.encode('utf-8')
+            i += 1
+    return out.decode('utf-8', errors='replace')
+
+
+def _strip_prefix(path: str) -> Optional[str]:
+    """Unquote a ---/+++ path and drop its a/ or b/ prefix; None for /dev/null"""
+    path = unquote_path(path.split('\t', 1)[0])
+    if path == DEV_NULL:
+        return None
+    return path[2:] if path[:2] in ('a/', 'b/') else path
+
+
+def _header_paths(rest: str) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Paths from the remainder of a `diff --git` line
+
+    Unquoted paths may contain spaces, so "a/x y b/x y" is split where both
+    halves name the same file. That is all a header can tell for renames too;
+    their real paths come from the `rename from/to` lines.
+    """
+    if rest.startswith('"'):
+        end = rest.find('" ', 1)
+        while end != -1 and rest[end - 1] == '\\':
+            end = rest.find('" ', end + 1)
+        if end == -1:
+            return None, None
+        return _strip_prefix(rest[:end + 1]), _strip_prefix(rest[end + 2:])
+    if rest.endswith('"'):
+        start = rest.rfind(' "')
+        return _strip_prefix(rest[:start]), _strip_prefix(rest[start + 1:])
+    half = (len(rest) - 1) // 2
+    if rest[half] == ' ' and rest[2:half] == rest[half + 3:]:
+        return _strip_prefix(rest[:half]), _strip_prefix(rest[half + 1:])
+    old, _, new = rest.partition(' b/')
+    return _strip_prefix(old), _strip_prefix('b/' + new)
+
+
+def iter_parse_diff(lines: Iterable[str]) -> Iterator[FileDiff]:
+    """
+    Parse `git diff` output, yielding each file as soon as its last hunk is read
+
+    Only the current file is held, so memory does not grow with the size of
+    the diff; feed it GitUtils.iter_lines() to parse while git is still
+    writing. Hunk bodies are skipped by their line counts, so content lines
+    that look like headers ("--- x", "diff --git") cannot confuse the parser.
+
+    Args:
+        lines: Diff lines, with or without trailing newlines
+    """
+    current: Optional[FileDiff] = None
+    old_left = new_left = 0
+
+    for line in lines:
+        line = line.rstrip('\n')
+
+        # Inside a hunk body: count lines off instead of interpreting them
+        if old_left > 0 or new_left > 0:
+            tag = line[:1]
+            if tag == '\\':  # "\ No newline at end of file"
+                continue
+            if tag in (' ', ''):
+                old_left -= 1
+                new_left -= 1
+                continue
+            if tag == '-':
+                old_left -= 1
+                continue
+            if tag == '+':
+                new_left -= 1
+                continue
+            # A truncated hunk; fall through and treat the line as a header
+            old_left = new_left = 0
+
+        if line.startswith('diff --git '):
+            if current is not None:
+                yield current
+            old_path, new_path = _header_paths(line[len('diff --git '):])
+            current = FileDiff(old_path, new_path)
+        elif current is None:
+            continue
+        elif line.startswith('@@ '):
+            match = _HUNK_HEADER.match(line)
+            if match:
+                old_start, old_count, new_start, new_count = match.groups()
+                hunk = (int(old_start), 1 if old_count is None else int(old_count),
+                        int(new_start), 1 if new_count is None else int(new_count))
+                current.hunks.append(hunk)
+                old_left, new_left = hunk[1], hunk[3]
+        elif line.startswith('--- '):
+            current.old_path = _strip_prefix(line[4:])
+        elif line.startswith('+++ '):
+            current.new_path = _strip_prefix(line[4:])
+        elif line.startswith('new file mode'):
+            current.status = 'added'
+            current.old_path = None
+        elif line.startswith('deleted file mode'):
+            current.status = 'deleted'
+            current.new_path = None
+        elif line.startswith('rename from '):
+            current.status = 'renamed'
+            current.old_path = unquote_path(line[len('rename from '):])
+        elif line.startswith('rename to '):
+            current.new_path = unquote_path(line[len('rename to '):])
+        elif line.startswith('copy from '):
+            current.status = 'copied'
+            current.old_path = unquote_path(line[len('copy from '):])
+        elif line.startswith('copy to '):
+            current.new_path = unquote_path(line[len('copy to '):])
+        elif line.startswith('index '):
+            blobs = line.split()[1].split('..')
+            if len(blobs) == 2:
+                current.old_sha, current.new_sha = (None if sha.strip('0') == '' else sha for sha in blobs)
+        elif line.startswith('Binary files ') or line == 'GIT binary patch':
+            current.binary = True
+
+    if current is not None:
+        yield current
@@ -0,0 +1,122 @@
+import os
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from gittracker import metrics
+
+# Results are (value, error) pairs so one failing item never sinks a whole batch
+TaskResult = Tuple[Any, Optional[Exception]]
+
+
+class AnalysisExecutor:
+    """Fans analysis work out over a thread or process pool"""
+
+    MODES = ('serial', 'thread', 'process')
+
+    def __init__(self, mode: str = 'thread', max_workers: Optional[int] = None):
+        """
+        Initialize the executor
+
+        Args:
+            mode: 'thread', 'process' or 'serial' (run everything inline)
+            max_workers: Pool size; defaults to the number of CPUs
+        """
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown executor mode: {mode}")
+
+        self.mode = mode
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self._pool: Optional[Executor] = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self) -> Executor:
+        """Create the underlying pool on first use"""
+        with self._lock:
+            if self._pool is None:
+                if self.mode == 'process':
+                    self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+                else:
+                    self._pool = ThreadPoolExecutor(
+                        max_workers=self.max_workers, thread_name_prefix='gittracker-analysis'
+                    )
+            return self._pool
+
+    def map(self, fn: Callable[..., Any], items: Iterable[Tuple],
+            on_progress: Optional[Callable[[int], None]] = None) -> List[TaskResult]:
+        """
+        Call fn(*item) for every item
+
+        Returns one (result, error) pair per item, in the same order as the items.
+        on_progress, if given, is called with the number of items completed so far.
+        """
+        results = []
+        for result in self.imap(fn, items):
+            results.append(result)
+            if on_progress:
+                on_progress(len(results))
+        return results
+
+    def imap(self, fn: Callable[..., Any], items: Iterable[Tuple]) -> Iterator[TaskResult]:
+        """Like map, but yield each (result, error) pair as soon as it and all earlier ones are done"""
+        items = list(items)
+        if self.mode == 'serial' or self.max_workers == 1 or len(items) <= 1:
+            for item in items:
+                yield _call(fn, item)
+            return
+
+        pool = self._get_pool()
+        if self.mode == 'thread':
+            # Pool threads record into the submitting analysis' metrics
+            fn = metrics.bind(fn)
+        futures = [pool.submit(_call, fn, item) for item in items]
+        for future in futures:
+            yield future.result()
+
+    def shutdown(self):
+        """Stop the worker pool"""
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=True)
+                self._pool = None
+
+
+def _call(fn: Callable[..., Any], item: Tuple) -> TaskResult:
+    """Run one task, capturing its error instead of raising"""
+    try:
+        return fn(*item), None
+    except Exception as e:
+        return None, e
+
+
+# Default executor shared by all analyzers in this process
+_default_executor: Optional[AnalysisExecutor] = None
+_default_lock = threading.Lock()
+
+
+def get_default_executor() -> AnalysisExecutor:
+    """Get the process-wide executor configured via GITTRACKER_EXECUTOR / GITTRACKER_MAX_WORKERS"""
+    global _default_executor
+    with _default_lock:
+        if _default_executor is None:
+            mode = os.environ.get('GITTRACKER_EXECUTOR', 'thread').lower()
+            max_workers = int(os.environ.get('GITTRACKER_MAX_WORKERS', 0)) or None
+            _default_executor = AnalysisExecutor(mode=mode, max_workers=max_workers)
+        return _default_executor
+
+
+# Analyzers rebuilt inside process-pool workers, keyed by their configuration
+_worker_analyzers: Dict[Tuple, Any] = {}
+
+
+def call_in_worker(config: Dict[str, Any], method: str, *args) -> Any:
+    """Run an analyzer method inside a process-pool worker"""
+    from gittracker.conflict_analyzer import ConflictAnalyzer
+
+    key = tuple(sorted(config.items()))
+    analyzer = _worker_analyzers.get(key)
+    if analyzer is None:
+        # Workers never fan out again, so they run their analyzer serially
+        analyzer = ConflictAnalyzer(executor=AnalysisExecutor('serial'), **config)
+        _worker_analyzers[key] = analyzer
+    return getattr(analyzer, method)(*args)
@@ -0,0 +1,255 @@
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from typing import Dict, Hashable, Optional, Set, Tuple
+
+logger = logging.getLogger('GitTracker-fsevents')
+
+# inotify(7) event bits
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+_EVENT_HEADER = struct.Struct('iIII')
+_WATCH_MASK = (IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE |
+               IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+
+# Files directly under the git directory that move when refs do
+REF_FILES = frozenset(('HEAD', 'packed-refs', 'FETCH_HEAD'))
+
+_libc = None
+
+
+def _load_libc():
+    """Load libc with the inotify entry points, or None where unavailable"""
+    global _libc
+    if _libc is None:
+        _libc = False
+        if sys.platform.startswith('linux'):
+            try:
+                libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+                libc.inotify_init1.argtypes = [ctypes.c_int]
+                libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+                libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+                _libc = libc
+            except (OSError, AttributeError) as e:
+                logger.info(f"inotify is not available: {e}")
+    return _libc or None
+
+
+def inotify_available() -> bool:
+    """Whether ref change events can be delivered by inotify on this platform"""
+    return _load_libc() is not None
+
+
+class RefEventMonitor:
+    """
+    Watches the refs of one or more Git directories with a single inotify instance
+
+    Each registered git directory is watched at `refs/` (recursively) plus
+    HEAD, packed-refs and FETCH_HEAD. Lock files and unrelated writes (index,
+    logs, objects) are filtered out, so `wait` only wakes up callers when a
+    ref may actually have moved.
+    """
+
+    def __init__(self):
+        """Initialize the monitor; raises OSError if inotify is unavailable"""
+        self._libc = _load_libc()
+        if self._libc is None:
+            raise OSError(errno.ENOSYS, 'inotify is not available on this platform')
+
+        self._fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+
+        # Self-pipe used to wake a blocked wait() on close() or wake()
+        self._wake_r, self._wake_w = os.pipe()
+        os.set_blocking(self._wake_r, False)
+
+        self._lock = threading.Lock()
+        self._watches: Dict[int, Tuple[Hashable, str, bool]] = {}  # wd -> (key, path, is_git_dir)
+        self._git_dirs: Dict[Hashable, str] = {}
+        self.closed = False
+
+    def add(self, key: Hashable, git_dir: str):
+        """
+        Start watching the refs of a git directory
+
+        Args:
+            key: Reported by wait() when this directory's refs change
+            git_dir: Path to the git directory (usually <repo>/.git)
+        """
+        with self._lock:
+            self._git_dirs[key] = git_dir
+            self._add_watch(key, git_dir, is_git_dir=True)
+            self._add_tree(key, os.path.join(git_dir, 'refs'))
+
+    def remove(self, key: Hashable):
+        """Stop watching a git directory"""
+        with self._lock:
+            self._git_dirs.pop(key, None)
+            for wd, (watch_key, _, _) in list(self._watches.items()):
+                if watch_key == key:
+                    self._libc.inotify_rm_watch(self._fd, wd)
+                    del self._watches[wd]
+
+    def keys(self) -> Set[Hashable]:
+        """Keys of the git directories being watched"""
+        with self._lock:
+            return set(self._git_dirs)
+
+    def _add_watch(self, key: Hashable, path: str, is_git_dir: bool = False) -> bool:
+        """Add a single directory watch (caller holds the lock)"""
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), _WATCH_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            if err not in (errno.ENOENT, errno.ENOTDIR):
+                logger.warning(f"Cannot watch {path}: {os.strerror(err)}")
+            return False
+        self._watches[wd] = (key, path, is_git_dir)
+        return True
+
+    def _add_tree(self, key: Hashable, root: str):
+        """Watch a directory and every directory below it (caller holds the lock)"""
+        for dir_path, _, _ in os.walk(root):
+            self._add_watch(key, dir_path)
+
+    def wake(self):
+        """Make a blocked wait() return immediately"""
+        try:
+            os.write(self._wake_w, b'x')
+        except OSError:
+            pass
+
+    def wait(self, timeout: Optional[float] = None) -> Set[Hashable]:
+        """
+        Block until refs change somewhere, the timeout passes or the monitor is woken
+
+        Returns:
+            Keys of the git directories whose refs may have changed; empty on
+            timeout, wake() or close()
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self.closed:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                readable, _, _ = select.select([self._fd, self._wake_r], [], [], remaining)
+            except (OSError, ValueError):
+                # Closed from another thread while we were waiting
+                break
+
+            if self._wake_r in readable:
+                try:
+                    while os.read(self._wake_r, 4096):
+                        pass
+                except OSError:
+                    pass
+                break
+
+            if self._fd in readable and not self.closed:
+                changed = self._read_events()
+                if changed:
+                    return changed
+                # Only unrelated files changed (index, logs, lock files): keep waiting
+
+            if deadline is not None and time.monotonic() >= deadline:
+                break
+
+        return set()
+
+    def _read_events(self) -> Set[Hashable]:
+        """Drain pending inotify events and map them to changed keys"""
+        changed: Set[Hashable] = set()
+        while True:
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            except OSError:
+                return changed
+            if not data:
+                break
+
+            offset = 0
+            with self._lock:
+                while offset < len(data):
+                    wd, mask, _, name_len = _EVENT_HEADER.unpack_from(data, offset)
+                    offset += _EVENT_HEADER.size
+                    name = data[offset:offset + name_len].rstrip(b'\0').decode('utf-8', 'surrogateescape')
+                    offset += name_len
+                    key = self._handle_event(wd, mask, name, changed)
+                    if key is not None:
+                        changed.add(key)
+        return changed
+
+    def _handle_event(self, wd: int, mask: int, name: str, changed: Set[Hashable]) -> Optional[Hashable]:
+        """Update watches for one event and return the affected key, if any (caller holds the lock)"""
+        if mask & IN_Q_OVERFLOW:
+            # Events were lost: every repository needs a rescan
+            logger.warning("inotify event queue overflowed")
+            changed.update(self._git_dirs)
+            return None
+
+        watch = self._watches.get(wd)
+        if watch is None:
+            return None
+        key, path, is_git_dir = watch
+
+        if mask & IN_IGNORED:
+            # The directory is gone (e.g. refs/heads/feature/ after its last branch was deleted)
+            del self._watches[wd]
+            return None
+
+        if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+            return key
+
+        if is_git_dir:
+            if name == 'refs' and mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                self._add_tree(key, os.path.join(path, 'refs'))
+                return key
+            return key if name in REF_FILES else None
+
+        if mask & IN_ISDIR:
+            if mask & (IN_CREATE | IN_MOVED_TO):
+                # Refs may have been written before the new directory was watched
+                self._add_tree(key, os.path.join(path, name))
+            return key
+
+        # Ref updates write <ref>.lock and rename it over <ref>; only the rename matters
+        if name.endswith('.lock'):
+            return None
+        return key
+
+    def close(self):
+        """Release the inotify instance and wake any waiter"""
+        if self.closed:
+            return
+        self.closed = True
+        self.wake()
+        with self._lock:
+            self._watches.clear()
+            self._git_dirs.clear()
+            for fd in (self._fd, self._wake_r, self._wake_w):
+                try:
+                    os.close(fd)
+                except OSError:
+                    pass
+
@@ -0,0 +1,162 @@
+import os
+import subprocess
+import tempfile
+import threading
+from typing import Dict, Iterator, List, Optional, Sequence
+
+from gittracker import metrics
+
+# Seconds a git command may run before it is killed (fetches get longer, see GitUtils.fetch_latest_changes)
+DEFAULT_TIMEOUT = float(os.environ.get('GITTRACKER_GIT_TIMEOUT', 120))
+
+# git processes allowed to run at once per repository (long-lived cat-file workers not included)
+MAX_CONCURRENT = int(os.environ.get('GITTRACKER_GIT_CONCURRENCY', 8))
+
+
+class GitCommandError(Exception):
+    """A git command failed"""
+
+    def __init__(self, command: Sequence[str], returncode: Optional[int], stderr: str = ''):
+        self.command = list(command)
+        self.returncode = returncode
+        self.stderr = stderr.strip()
+        super().__init__(f"git {' '.join(self.command)} exited with {returncode}: {self.stderr}")
+
+
+class GitTimeoutError(GitCommandError):
+    """A git command ran longer than its timeout and was killed"""
+
+    def __init__(self, command: Sequence[str], timeout: float):
+        self.timeout = timeout
+        super().__init__(command, None, f'timed out after {timeout}s')
+        self.args = (f"git {' '.join(self.command)} timed out after {timeout}s",)
+
+
+# One semaphore per repository, so a burst of analyses cannot fork git without bound
+_semaphores: Dict[str, threading.BoundedSemaphore] = {}
+_semaphores_lock = threading.Lock()
+
+
+def _forget_semaphores_after_fork():
+    """Start child processes with unheld semaphores"""
+    global _semaphores_lock
+    _semaphores.clear()
+    _semaphores_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_forget_semaphores_after_fork)
+
+
+def _semaphore(repo_path: str) -> threading.BoundedSemaphore:
+    """Get the concurrency limit of a repository"""
+    with _semaphores_lock:
+        semaphore = _semaphores.get(repo_path)
+        if semaphore is None:
+            semaphore = _semaphores[repo_path] = threading.BoundedSemaphore(MAX_CONCURRENT)
+        return semaphore
+
+
+def _env() -> Dict[str, str]:
+    """Environment for git: never wait on a credential prompt nobody can answer"""
+    return dict(os.environ, GIT_TERMINAL_PROMPT='0')
+
+
+def run_git(repo_path: str, command: List[str], timeout: Optional[float] = None,
+            ok_returncodes: Optional[Sequence[int]] = (0,)) -> str:
+    """
+    Run a git command and return its stripped output
+
+    Args:
+        repo_path: Repository to run in
+        command: Arguments after `git`
+        timeout: Seconds before the command is killed (defaults to GITTRACKER_GIT_TIMEOUT)
+        ok_returncodes: Exit codes that are not failures; None accepts any
+
+    Raises:
+        GitTimeoutError: The command ran too long
+        GitCommandError: It exited with any other code, or could not be started
+    """
+    timeout = DEFAULT_TIMEOUT if timeout is None else timeout
+    metrics.count('git_commands', subcommand=command[0])
+    with _semaphore(repo_path), metrics.timer('git'):
+        try:
+            result = subprocess.run(
+                ['git'] + command,
+                cwd=repo_path,
+                capture_output=True,
+                text=True,
+                encoding='utf-8',
+                errors='replace',
+                timeout=timeout,
+                env=_env()
+            )
+        except subprocess.TimeoutExpired:
+            raise GitTimeoutError(command, timeout) from None
+        except OSError as e:
+            raise GitCommandError(command, None, str(e)) from e
+
+    metrics.count('git_bytes_read', len(result.stdout))
+    if ok_returncodes is not None and result.returncode not in ok_returncodes:
+        raise GitCommandError(command, result.returncode, result.stderr)
+    return result.stdout.strip()
+
+
+def iter_git_lines(repo_path: str, command: List[str], timeout: Optional[float] = None,
+                   ok_returncodes: Optional[Sequence[int]] = (0,)) -> Iterator[str]:
+    """
+    Run a git command and yield its output line by line as it is produced
+
+    Output never sits in memory as a whole. The timeout covers the whole
+    iteration, including time the consumer spends between lines, and the
+    repository's concurrency slot is held until the iterator is exhausted
+    or closed. Closing early kills git.
+
+    Raises (from the iteration): GitTimeoutError, GitCommandError as run_git
+    """
+    timeout = DEFAULT_TIMEOUT if timeout is None else timeout
+    metrics.count('git_commands', subcommand=command[0])
+    semaphore = _semaphore(repo_path)
+    semaphore.acquire()
+    # stderr goes to a file so a chatty command can never block on a full pipe
+    stderr = tempfile.TemporaryFile()
+    process = None
+    timed_out = threading.Event()
+    try:
+        try:
+            process = subprocess.Popen(['git'] + command, cwd=repo_path, stdout=subprocess.PIPE,
+                                       stderr=stderr, env=_env())
+        except OSError as e:
+            raise GitCommandError(command, None, str(e)) from e
+
+        def kill():
+            timed_out.set()
+            process.kill()
+
+        watchdog = threading.Timer(timeout, kill)
+        watchdog.daemon = True
+        watchdog.start()
+        read = 0
+        try:
+            for raw in process.stdout:
+                read += len(raw)
+                yield raw.rstrip(b'\n').decode('utf-8', errors='replace')
+            process.wait()
+        finally:
+            watchdog.cancel()
+            metrics.count('git_bytes_read', read)
+
+        if timed_out.is_set():
+            raise GitTimeoutError(command, timeout)
+        if ok_returncodes is not None and process.returncode not in ok_returncodes:
+            stderr.seek(0)
+            raise GitCommandError(command, process.returncode, stderr.read().decode('utf-8', errors='replace'))
+    finally:
+        if process is not None:
+            if process.poll() is None:
+                # The consumer stopped early (or failed); nobody will read the rest
+                process.kill()
+            process.stdout.close()
+            process.wait()
+        stderr.close()
+        semaphore.release()
@@ -1,7 +1,26 @@
+import io
 import os
-import subprocess
+import re
+import hashlib
 import json
-from typing import List, Dict, Any, Tuple, Optional
+from typing import List, Dict, Any, Iterable, Iterator, Tuple, Optional, Sequence, Union
+
+from gittracker import metrics
+from gittracker.cat_file import get_pool
+from gittracker.diff_parser import FileDiff, iter_parse_diff
+from gittracker.git_command import GitCommandError, GitTimeoutError, iter_git_lines, run_git
+from gittracker.merge_base import get_merge_base_service
+
+# Installed git version, detected once per process
+_git_version: Optional[Tuple[int, ...]] = None
+
+def ref_fingerprint(snapshot: Dict[str, Any]) -> str:
+    """Hash the current branch and every branch head of a ref snapshot (see GitUtils.get_ref_snapshot)"""
+    digest = hashlib.sha1(f"HEAD {snapshot['current_branch']}\n".encode('utf-8'))
+    for name, info in sorted(snapshot['branches'].items()):
+        digest.update(f"{name} {info['sha']}\n".encode('utf-8'))
+    return digest.hexdigest()
+
 
 class GitUtils:
     """Utility class for Git operations"""
@@ -13,41 +32,108 @@ class GitUtils:
         # Verify this is a git repository
         if not os.path.exists(os.path.join(repo_path, '.git')):
             raise ValueError(f"Not a git repository: {repo_path}")
+        
+        # Long-lived cat-file workers shared by every GitUtils on this repo
+        self.cat_file = get_pool(repo_path)
+        
+        # Memoized merge bases, shared the same way
+        self.merge_bases = get_merge_base_service(repo_path)
+    
+    def run(self, command: List[str], timeout: Optional[float] = None,
+            ok_returncodes: Optional[Sequence[int]] = (0,)) -> str:
+        """Run a git command with a timeout and return its output; raises GitCommandError (see git_command.run_git)"""
+        return run_git(self.repo_path, command, timeout=timeout, ok_returncodes=ok_returncodes)
     
-    def _run_git_command(self, command: List[str]) -> str:
-        """Run a git command and return its output"""
+    def iter_lines(self, command: List[str], timeout: Optional[float] = None,
+                   ok_returncodes: Optional[Sequence[int]] = (0,)) -> Iterator[str]:
+        """Stream a git command's output line by line (see git_command.iter_git_lines)"""
+        return iter_git_lines(self.repo_path, command, timeout=timeout, ok_returncodes=ok_returncodes)
+    
+    def _run_git_command(self, command: List[str], check: bool = True) -> str:
+        """
+        Run a git command and return its output, or "" if it fails
+        
+        Kept for callers that treat failure as "no output"; new code should use
+        run() or iter_lines(), which raise. check=False keeps the output of
+        non-zero exits.
+        """
         try:
-            result = subprocess.run(
-                ['git'] + command,
-                cwd=self.repo_path,
-                check=True,
-                capture_output=True,
-                text=True,
-                encoding='utf-8',
-                errors='replace'
-            )
-            return result.stdout.strip()
-        except subprocess.CalledProcessError as e:
+            return self.run(command, ok_returncodes=(0,) if check else None)
+        except GitCommandError as e:
             print(f"Git command failed: {e}")
-            print(f"Error output: {e.stderr}")
             return ""
     
     def get_all_branches(self) -> List[str]:
         """Get all branches in the repository"""
-        local_branches = self._run_git_command(['branch', '--format=%(refname:short)']).split('\n')
-        remote_branches = self._run_git_command(['branch', '-r', '--format=%(refname:short)']).split('\n')
+        # Sorted so results come back in a stable order
+        return sorted(self.get_ref_snapshot()['branches'])
+    
+    def get_ref_snapshot(self) -> Dict[str, Any]:
+        """
+        Read every local and remote branch with one `git for-each-ref` call
+        
+        Returns a dict with 'current_branch' and 'branches', which maps each branch
+        name (remote branches without their 'origin/' prefix, local branches taking
+        precedence) to its sha, tracking branch, ahead/behind counts and last commit.
+        """
+        fields = [
+            '%(refname)', '%(refname:short)', '%(objectname)', '%(upstream:short)',
+            '%(upstream:track)', '%(authordate:iso)', '%(authorname)', '%(HEAD)', '%(symref)'
+        ]
+        output = self.run([
+            'for-each-ref', f'--format={"%00".join(fields)}', 'refs/remotes', 'refs/heads'
+        ])
+        
+        snapshot = {'current_branch': None, 'branches': {}}
         
-        # Filter out empty strings
-        local_branches = [b for b in local_branches if b]
-        remote_branches = [b for b in remote_branches if b]
+        entries = [line.split('\0') for line in output.split('\n')]
+        entries = [parts for parts in entries if len(parts) == len(fields)]
         
-        # Remove 'origin/' prefix from remote branches
-        remote_branches = [b.replace('origin/', '') for b in remote_branches]
+        # Handle remote refs first, so local branches of the same name overwrite them
+        entries.sort(key=lambda parts: not parts[0].startswith('refs/remotes/'))
         
-        # Combine and remove duplicates
-        all_branches = list(set(local_branches + remote_branches))
+        for refname, short_name, sha, upstream, track, date, author, head, symref in entries:
+            
+            if symref:
+                # e.g. origin/HEAD, an alias of another remote branch
+                continue
+            
+            if refname.startswith('refs/remotes/'):
+                # Remove 'origin/' prefix from remote branches
+                name = short_name.replace('origin/', '')
+            else:
+                name = short_name
+            
+            # Remove 'origin/' prefix from the tracking branch if present
+            tracking = upstream.split('/', 1)[1] if '/' in upstream else (upstream or None)
+            
+            ahead = re.search(r'ahead (\d+)', track)
+            behind = re.search(r'behind (\d+)', track)
+            
+            snapshot['branches'][name] = {
+                'name': name,
+                'ref': refname,
+                'sha': sha,
+                'tracking': tracking,
+                'ahead': int(ahead.group(1)) if ahead else 0,
+                'behind': int(behind.group(1)) if behind else 0,
+                'last_commit': sha,
+                'last_commit_date': date,
+                'author': author
+            }
+            
+            if head == '*':
+                snapshot['current_branch'] = name
+        
+        if snapshot['current_branch'] is None:
+            # Detached HEAD (or unborn branch)
+            snapshot['current_branch'] = self.get_current_branch()
         
-        return all_branches
+        return snapshot
+    
+    def get_git_dir(self) -> str:
+        """Get the absolute path of the repository's git directory"""
+        return self._run_git_command(['rev-parse', '--absolute-git-dir']) or os.path.join(self.repo_path, '.git')
     
     def get_current_branch(self) -> str:
         """Get the current branch name"""
@@ -67,29 +153,146 @@ class GitUtils:
         return {'tracking': tracking_branch}
     
     def get_merge_base(self, branch1: str, branch2: str) -> str:
-        """Get the common ancestor (merge base) of two branches"""
-        return self._run_git_command(['merge-base', branch1, branch2])
+        """Get the common ancestor (merge base) of two branches, or "" if they have none or git fails"""
+        try:
+            return self.merge_bases.merge_base(branch1, branch2) or ""
+        except GitCommandError as e:
+            print(f"Git command failed: {e}")
+            return ""
+    
+    def get_merge_bases(self, pairs: List[Tuple[str, str]]) -> List[str]:
+        """Get the merge bases of many branch pairs, computing the unknown ones in one pass"""
+        try:
+            return [base or "" for base in self.merge_bases.merge_bases(pairs)]
+        except GitCommandError:
+            # An unknown branch fails the whole batch; the others still get their answer
+            return [self.get_merge_base(branch1, branch2) for branch1, branch2 in pairs]
     
     def get_branch_files(self, branch: str) -> List[str]:
         """Get list of files in a branch"""
-        files = self._run_git_command(['ls-tree', '-r', '--name-only', branch])
-        return files.split('\n') if files else []
+        return list(self.iter_branch_files(branch))
+    
+    def iter_branch_files(self, branch: str) -> Iterator[str]:
+        """Yield the files of a branch as git lists them"""
+        return self.iter_lines(['ls-tree', '-r', '--name-only', branch])
     
     def get_file_content(self, branch: str, file_path: str) -> str:
         """Get content of a file in a specific branch"""
-        return self._run_git_command(['show', f'{branch}:{file_path}'])
+        return self.get_file_contents([(branch, file_path)])[0]
+    
+    def get_file_contents(self, requests: List[Tuple[str, str]]) -> List[str]:
+        """Get the content of several (branch, file_path) pairs in one pipelined read"""
+        specs = [f'{branch}:{file_path}' for branch, file_path in requests]
+        
+        # cat-file reads one spec per line; fall back to `git show` for odd paths
+        if any('\n' in spec for spec in specs):
+            return [self._run_git_command(['show', spec]) for spec in specs]
+        
+        with metrics.timer('blob_read'):
+            blobs = self.cat_file.read_objects(specs)
+        return [blob.decode('utf-8', errors='replace') if blob is not None else '' for blob in blobs]
+    
+    def get_object_ids(self, requests: List[Tuple[str, str]]) -> List[Optional[str]]:
+        """Resolve several (branch, file_path) pairs to blob SHAs (None if missing)"""
+        specs = [f'{branch}:{file_path}' for branch, file_path in requests]
+        
+        if any('\n' in spec for spec in specs):
+            return [self._run_git_command(['rev-parse', '--verify', '-q', spec]) or None for spec in specs]
+        
+        return [info[0] if info and info[1] == 'blob' else None for info in self.cat_file.object_infos(specs)]
+    
+    def get_blob_contents(self, shas: List[str]) -> List[str]:
+        """Get the content of several blobs by SHA in one pipelined read"""
+        with metrics.timer('blob_read'):
+            blobs = self.cat_file.read_objects(shas)
+        return [blob.decode('utf-8', errors='replace') if blob is not None else '' for blob in blobs]
     
     def get_diff_between_branches(self, branch1: str, branch2: str, file_path: Optional[str] = None) -> str:
         """Get the diff between two branches, optionally for a specific file"""
+        return '\n'.join(self.iter_diff_between_branches(branch1, branch2, file_path)).strip()
+    
+    def iter_diff_between_branches(self, branch1: str, branch2: str,
+                                   file_path: Optional[str] = None) -> Iterator[str]:
+        """Yield the lines of the diff between two branches without holding all of it"""
+        command = ['diff', '--no-color', '--no-ext-diff', branch1, branch2]
         if file_path:
-            return self._run_git_command(['diff', branch1, branch2, '--', file_path])
-        else:
-            return self._run_git_command(['diff', branch1, branch2])
+            command += ['--', file_path]
+        return self.iter_lines(command)
     
     def get_modified_files_between_branches(self, branch1: str, branch2: str) -> List[str]:
         """Get list of files modified between two branches"""
-        diff_output = self._run_git_command(['diff', '--name-only', branch1, branch2])
-        return diff_output.split('\n') if diff_output else []
+        return [line for line in self.iter_lines(['diff', '--name-only', branch1, branch2]) if line]
+    
+    def get_touched_files(self, old_commit: str, new_commit: str) -> List[str]:
+        """Get every path added, removed or modified between two commits (renames split in two)"""
+        return [line for line in self.iter_lines(['diff', '--name-only', '--no-renames', old_commit, new_commit])
+                if line]
+    
+    def get_git_version(self) -> Tuple[int, ...]:
+        """Get the installed git version as a tuple, e.g. (2, 39, 5)"""
+        global _git_version
+        if _git_version is None:
+            output = self._run_git_command(['version'])
+            match = re.search(r'(\d+)\.(\d+)(?:\.(\d+))?', output)
+            _git_version = tuple(int(part or 0) for part in match.groups()) if match else (0, 0, 0)
+        return _git_version
+    
+    def supports_merge_tree(self) -> bool:
+        """Check whether git can run an in-memory merge (`merge-tree --write-tree`, git 2.38+)"""
+        return self.get_git_version() >= (2, 38)
+    
+    def merge_tree(self, branch1: str, branch2: str) -> Optional[Dict[str, Any]]:
+        """
+        Merge two branches in memory with `git merge-tree --write-tree`
+        
+        Returns the merged tree SHA, the conflicted paths and git's informational
+        messages, or None if git could not merge at all (e.g. unrelated histories).
+        The tree (with conflict markers in conflicted files) is written to the
+        object database, so its blobs can be read back by SHA.
+        """
+        try:
+            # Exit code 1 means the merge has conflicts, which is what we are after
+            output = self.run([
+                'merge-tree', '--write-tree', '--name-only', '--messages', '-z', branch1, branch2
+            ], ok_returncodes=(0, 1))
+        except GitTimeoutError:
+            raise
+        except GitCommandError:
+            return None
+        if not output:
+            return None
+        
+        # Layout: <tree> NUL <path> NUL ... NUL NUL, then per message:
+        # <path count> NUL <path> NUL ... <type> NUL <message> NUL
+        tokens = output.split('\0')
+        tree = tokens[0]
+        
+        conflicted_files = []
+        idx = 1
+        while idx < len(tokens) and tokens[idx]:
+            conflicted_files.append(tokens[idx])
+            idx += 1
+        idx += 1
+        
+        messages = []
+        while idx < len(tokens) and tokens[idx].isdigit():
+            count = int(tokens[idx])
+            paths = tokens[idx + 1:idx + 1 + count]
+            idx += 1 + count
+            if idx + 1 >= len(tokens):
+                break
+            messages.append({
+                'paths': paths,
+                'type': tokens[idx],
+                'message': tokens[idx + 1].strip()
+            })
+            idx += 2
+        
+        return {
+            'tree': tree,
+            'conflicted_files': conflicted_files,
+            'messages': messages
+        }
     
     def get_commit_history(self, branch: str, max_count: int = 50) -> List[Dict[str, Any]]:
         """Get commit history for a branch"""
@@ -139,51 +342,57 @@ class GitUtils:
         
         return blame_info
     
-    def fetch_latest_changes(self) -> bool:
-        """Fetch latest changes from remote"""
+    def fetch_latest_changes(self, timeout: Optional[float] = None) -> bool:
+        """
+        Fetch latest changes from remote
+        
+        Returns False if the fetch failed or hung past its timeout (defaults to
+        GITTRACKER_FETCH_TIMEOUT), so watchers can back off instead of stalling.
+        """
+        if timeout is None:
+            timeout = float(os.environ.get('GITTRACKER_FETCH_TIMEOUT', 300))
         try:
-            self._run_git_command(['fetch', '--all'])
+            self.run(['fetch', '--all'], timeout=timeout)
             return True
-        except Exception as e:
+        except GitCommandError as e:
             print(f"Failed to fetch changes: {e}")
             return False
     
-    def parse_diff_to_lines(self, diff_output: str) -> Dict[str, List[Tuple[int, int]]]:
-        """Parse git diff output to get line ranges of changes"""
-        changes = {}
-        current_file = None
+    def parse_diff_to_lines(self, diff_output: Union[str, Iterable[str]]) -> Dict[str, List[Tuple[int, int]]]:
+        """
+        Parse git diff output to get line ranges of changes
         
-        lines = diff_output.split('\n')
-        line_idx = 0
+        Args:
+            diff_output: The whole diff, or its lines (e.g. from iter_diff_between_branches)
         
-        while line_idx < len(lines):
-            line = lines[line_idx]
-            
-            # Find file headers
-            if line.startswith('diff --git'):
-                # Extract filename
-                parts = line.split()
-                file_path = parts[2][2:]  # Remove 'a/' prefix
-                current_file = file_path
-                changes[current_file] = []
-                
-            # Find hunks
-            elif line.startswith('@@'):
-                # Parse hunk header
-                parts = line.split()
-                if len(parts) >= 3:
-                    # Extract line range information
-                    range_info = parts[2][1:]  # Remove '+' prefix
-                    if ',' in range_info:
-                        start, count = map(int, range_info.split(','))
-                    else:
-                        start = int(range_info)
-                        count = 1
-                    
-                    end = start + count - 1
-                    if current_file:
-                        changes[current_file].append((start, end))
-            
-            line_idx += 1
+        Returns:
+            Changed 1-based inclusive ranges on the new side by path; deletions
+            and insertion points are empty ranges (start, start - 1)
+        """
+        lines = io.StringIO(diff_output) if isinstance(diff_output, str) else diff_output
+        return {file_diff.path: file_diff.new_ranges for file_diff in iter_parse_diff(lines)}
+    
+    def iter_file_diffs(self, branch1: str, branch2: str, file_path: Optional[str] = None) -> Iterator[FileDiff]:
+        """Stream the per-file hunks between two branches as git produces them"""
+        return iter_parse_diff(self.iter_diff_between_branches(branch1, branch2, file_path))
+    
+    def iter_changed_hunks(self, base: str, branch: str, algorithm: str = 'myers',
+                           paths: Optional[List[str]] = None) -> Iterator[FileDiff]:
+        """
+        Stream the hunks of every file changed between two commits
+        
+        One `git diff -U0` with full blob IDs and no rename detection, so each
+        FileDiff carries its new-side ranges and blob SHAs without a single
+        blob being read on our side.
         
-        return changes
\ No newline at end of file
+        Args:
+            base: Old commit, usually a merge base
+            branch: New commit or branch
+            algorithm: git diff algorithm (myers, minimal, patience or histogram)
+            paths: Limit the diff to these paths
+        """
+        command = ['diff', '-U0', '--no-color', '--no-ext-diff', '--no-renames', '--full-index',
+                   f'--diff-algorithm={algorithm}', base, branch]
+        if paths:
+            command += ['--'] + [f':(literal){path}' for path in paths]
+        return iter_parse_diff(self.iter_lines(command))
\ No newline at end of file
@@ -0,0 +1,74 @@
+import heapq
+from typing import Dict, Hashable, List, Tuple
+
+Range = Tuple[int, int]
+Overlap = Tuple[int, int, int, int]
+
+
+def _is_overlapping(start1: int, end1: int, start2: int, end2: int) -> bool:
+    """Same test as ConflictAnalyzer.is_overlapping (inclusive ends)"""
+    return start1 <= end2 and start2 <= end1
+
+
+def find_overlap_indexes(ranges1: List[Range], ranges2: List[Range]) -> List[Tuple[int, int]]:
+    """
+    Find every overlapping (i, j) pair between two lists of inclusive ranges
+
+    Sort-and-sweep over range starts: each side keeps an active set of ranges
+    that have started and not yet ended, stored in a min-heap keyed by end so
+    finished ranges drop out cheaply. Runs in O((n + m) log(n + m) + k) for k
+    overlaps. Pairs come back ordered by i, then j - the order a nested loop
+    over ranges1 and ranges2 would produce.
+    """
+    events = sorted(
+        [(start, 0, i) for i, (start, _) in enumerate(ranges1)] +
+        [(start, 1, j) for j, (start, _) in enumerate(ranges2)]
+    )
+    sides = (ranges1, ranges2)
+    active: Tuple[List[Tuple[int, int]], List[Tuple[int, int]]] = ([], [])
+    pairs = []
+
+    for start, side, index in events:
+        other = 1 - side
+
+        # Ranges that ended before this one starts can't overlap it or anything later
+        for heap in active:
+            while heap and heap[0][0] < start:
+                heapq.heappop(heap)
+
+        end = sides[side][index][1]
+        for other_end, other_index in active[other]:
+            other_start = sides[other][other_index][0]
+            # Explicit check keeps empty ranges (end < start, e.g. pure deletions) exact
+            if _is_overlapping(start, end, other_start, other_end):
+                pairs.append((index, other_index) if side == 0 else (other_index, index))
+
+        heapq.heappush(active[side], (end, index))
+
+    pairs.sort()
+    return pairs
+
+
+def find_overlaps(ranges1: List[Range], ranges2: List[Range]) -> List[Overlap]:
+    """Find overlapping ranges as (start1, end1, start2, end2) tuples"""
+    return [ranges1[i] + ranges2[j] for i, j in find_overlap_indexes(ranges1, ranges2)]
+
+
+def find_overlaps_batch(changes: Dict[Hashable, Tuple[List[Range], List[Range]]]) -> Dict[Hashable, List[Overlap]]:
+    """
+    Find overlapping ranges for many files at once
+
+    Args:
+        changes: Maps a key (usually a file path) to its (ranges1, ranges2)
+
+    Returns:
+        The same keys mapped to their overlaps; keys without overlaps are omitted
+    """
+    results = {}
+    for key, (ranges1, ranges2) in changes.items():
+        if not ranges1 or not ranges2:
+            continue
+        overlaps = find_overlaps(ranges1, ranges2)
+        if overlaps:
+            results[key] = overlaps
+    return results
@@ -0,0 +1,182 @@
+import os
+import threading
+import time
+import uuid
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from gittracker import metrics
+
+
+class Job:
+    """An analysis running in the background"""
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+
+    def __init__(self, repo_path: str, fingerprint: str):
+        """
+        Initialize the job
+
+        Args:
+            repo_path: Path to the Git repository being analyzed
+            fingerprint: Identifies the ref snapshot the job analyzes
+        """
+        self.id = uuid.uuid4().hex
+        self.repo_path = repo_path
+        self.fingerprint = fingerprint
+        self.status = self.QUEUED
+        self.progress: Dict[str, Any] = {'stage': None, 'completed': 0, 'total': 0}
+        self._result: Any = None
+        self.version: Optional[str] = None  # Version of the repository state the job produced
+        self.error: Optional[str] = None
+        self.created = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.waiters = 1
+        self.metrics = metrics.Recorder()
+        self._done = threading.Event()
+
+    @property
+    def result(self) -> Any:
+        """
+        What the job produced, or None once nothing else holds on to it
+        
+        Repository states are only referenced weakly: the state cache owns
+        them and bounds their memory, so a finished job never keeps one alive.
+        """
+        value = self._result
+        return value() if isinstance(value, weakref.ref) else value
+    
+    @result.setter
+    def result(self, value: Any):
+        self.version = getattr(value, 'version', None)
+        try:
+            self._result = weakref.ref(value)
+        except TypeError:
+            # None, plain containers and the like cannot be weakly referenced
+            self._result = value
+    
+    def is_finished(self) -> bool:
+        """Whether the job has completed or failed"""
+        return self._done.is_set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until the job finishes; returns False on timeout"""
+        return self._done.wait(timeout)
+
+    def update_progress(self, stage: str, completed: int, total: int):
+        """Progress callback handed to the analysis"""
+        self.progress = {'stage': stage, 'completed': completed, 'total': total}
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert to dictionary representation (without the result)"""
+        return {
+            'id': self.id,
+            'repo_path': self.repo_path,
+            'status': self.status,
+            'progress': self.progress,
+            'error': self.error,
+            'waiters': self.waiters,
+            'created': self.created,
+            'started': self.started,
+            'finished': self.finished,
+            'version': self.version,
+            'metrics': self.metrics.to_dict()
+        }
+
+
+class JobManager:
+    """Runs analyses in the background, sharing one job between identical requests"""
+
+    def __init__(self, max_workers: int = 2, retain: float = 600.0):
+        """
+        Initialize the manager
+
+        Args:
+            max_workers: Analyses allowed to run at once
+            retain: How long (in seconds) finished jobs stay available to /jobs
+        """
+        self.retain = retain
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='gittracker-job')
+        self._jobs: Dict[str, Job] = {}
+        self._in_flight: Dict[Tuple[str, str], Job] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, repo_path: str, fingerprint: str, fn: Callable[[Job], Any]) -> Tuple[Job, bool]:
+        """
+        Start fn(job) in the background, unless the same analysis is already in flight
+
+        Args:
+            repo_path: Path to the Git repository
+            fingerprint: Identifies the ref snapshot; requests for the same repository
+                         and snapshot share one job
+            fn: Does the work and returns the job's result
+
+        Returns:
+            (job, coalesced) where coalesced says whether an existing job was reused
+        """
+        key = (repo_path, fingerprint)
+        with self._lock:
+            self._prune()
+            job = self._in_flight.get(key)
+            if job is not None:
+                job.waiters += 1
+                return job, True
+
+            job = Job(repo_path, fingerprint)
+            self._jobs[job.id] = job
+            self._in_flight[key] = job
+
+        self._pool.submit(self._run, job, fn)
+        return job, False
+
+    def _run(self, job: Job, fn: Callable[[Job], Any]):
+        """Worker: run a job and record its outcome"""
+        job.status = Job.RUNNING
+        job.started = time.time()
+        try:
+            # Everything the analysis does, on any pool thread, is accounted to the job
+            with metrics.recording(job.metrics), metrics.timer('analysis'):
+                job.result = fn(job)
+            job.status = Job.DONE
+            metrics.count('analyses')
+        except Exception as e:
+            job.error = str(e)
+            job.status = Job.FAILED
+            metrics.count('analyses_failed')
+        finally:
+            job.finished = time.time()
+            with self._lock:
+                self._in_flight.pop((job.repo_path, job.fingerprint), None)
+            job._done.set()
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """Look up a job by id"""
+        with self._lock:
+            # Pruned here too, so an idle server does not keep finished jobs forever
+            self._prune()
+            return self._jobs.get(job_id)
+
+    def _prune(self):
+        """Forget finished jobs older than the retention period (caller holds the lock)"""
+        cutoff = time.time() - self.retain
+        for job_id in [job_id for job_id, job in self._jobs.items()
+                       if job.finished is not None and job.finished < cutoff]:
+            del self._jobs[job_id]
+
+
+_job_manager: Optional[JobManager] = None
+_job_manager_lock = threading.Lock()
+
+
+def get_job_manager() -> JobManager:
+    """Get the process-wide job manager configured via GITTRACKER_JOB_WORKERS"""
+    global _job_manager
+    with _job_manager_lock:
+        if _job_manager is None:
+            _job_manager = JobManager(max_workers=int(os.environ.get('GITTRACKER_JOB_WORKERS', 2)))
+        return _job_manager
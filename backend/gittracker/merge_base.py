@@ -0,0 +1,344 @@
+import logging
+import os
+import re
+import threading
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from gittracker import metrics
+from gittracker.cache import LRUCache
+from gittracker.git_command import GitCommandError, iter_git_lines, run_git
+
+logger = logging.getLogger('GitTracker-mergebase')
+
+# Commits a single batched rev-list pass may read before falling back to one merge-base per pair
+GRAPH_LIMIT = int(os.environ.get('GITTRACKER_MERGE_BASE_GRAPH_LIMIT', 100000))
+
+# Let the server write a commit-graph into analyzed repositories without one (off by default:
+# it is a write into repositories the tool otherwise only reads)
+WRITE_COMMIT_GRAPH = os.environ.get('GITTRACKER_COMMIT_GRAPH', 'False').lower() == 'true'
+
+_SHA = re.compile(r'^(?:[0-9a-f]{40}|[0-9a-f]{64})$')
+
+# Approximate bytes of one memoized pair
+_ENTRY_SIZE = 256
+
+
+class MergeBaseService:
+    """
+    Memoized merge bases of a repository, keyed by commit SHA
+
+    The merge base of two commits never changes, so results are kept until
+    the LRU drops them; only the branch name -> SHA step depends on refs, and
+    it reads the ref store directly on every call, so moving a ref is the only
+    thing that changes an answer. Misses in a batch are computed together
+    from one `git rev-list` pass over the commits the heads do not share.
+    """
+
+    def __init__(self, repo_path: str, max_entries: int = 65536):
+        """
+        Initialize the service
+
+        Args:
+            repo_path: Path to the Git repository
+            max_entries: Commit pairs remembered
+        """
+        self.repo_path = repo_path
+        self._memo = LRUCache(max_entries * _ENTRY_SIZE)
+        self._packed: Tuple[Optional[Tuple[int, int]], Dict[str, str]] = (None, {})
+        self._lock = threading.Lock()
+
+        common_dir = run_git(repo_path, ['rev-parse', '--git-common-dir'])
+        self.common_dir = os.path.normpath(os.path.join(repo_path, common_dir))
+        # The reftable backend has no files to read; every name then goes through rev-parse
+        self._files_backend = not os.path.isdir(os.path.join(self.common_dir, 'reftable'))
+
+    # -- name resolution ------------------------------------------------------
+
+    def resolve(self, revs: Iterable[str]) -> Dict[str, Optional[str]]:
+        """
+        Resolve revisions to commit SHAs
+
+        Full SHAs are taken as they are and branch names are read from the ref
+        files; anything else (tags, HEAD~2, ...) costs a `git rev-parse`.
+        Unknown revisions map to None.
+        """
+        resolved: Dict[str, Optional[str]] = {}
+        unresolved = []
+        for rev in dict.fromkeys(revs):
+            sha = rev if _SHA.match(rev) else self._read_ref(rev)
+            if sha:
+                resolved[rev] = sha
+            else:
+                unresolved.append(rev)
+
+        for rev in unresolved:
+            metrics.count('git_ref_lookups')
+            try:
+                sha = run_git(self.repo_path, ['rev-parse', '--verify', '-q', f'{rev}^{{commit}}'])
+            except GitCommandError:
+                sha = ''
+            resolved[rev] = sha or None
+        return resolved
+
+    def _read_ref(self, name: str) -> Optional[str]:
+        """Read a branch straight from the ref store, or None to let git resolve it"""
+        if not self._files_backend or name.startswith('refs/tags/') or '..' in name:
+            return None
+        if self._lookup('refs/tags/' + name):
+            # A tag of the same name wins in git's lookup order, and may need peeling
+            return None
+        candidates = [name] if name.startswith('refs/') else ['refs/heads/' + name, 'refs/remotes/' + name]
+        for ref in candidates:
+            sha = self._lookup(ref)
+            if sha:
+                return sha
+        return None
+
+    def _lookup(self, ref: str) -> Optional[str]:
+        """The SHA a loose or packed ref points at"""
+        try:
+            with open(os.path.join(self.common_dir, ref), 'r', encoding='utf-8') as f:
+                value = f.read().strip()
+            # Symbolic refs ("ref: refs/heads/x") are left to git
+            return value if _SHA.match(value) else None
+        except (FileNotFoundError, NotADirectoryError, IsADirectoryError):
+            return self._packed_refs().get(ref)
+        except OSError:
+            return None
+
+    def _packed_refs(self) -> Dict[str, str]:
+        """Refs from packed-refs, re-read whenever the file changes"""
+        path = os.path.join(self.common_dir, 'packed-refs')
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return {}
+        key = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            if self._packed[0] == key:
+                return self._packed[1]
+
+        refs = {}
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            for line in f:
+                if line.startswith(('#', '^')):
+                    continue
+                sha, _, ref = line.rstrip('\n').partition(' ')
+                refs[ref] = sha
+        with self._lock:
+            self._packed = (key, refs)
+        return refs
+
+    # -- merge bases ----------------------------------------------------------
+
+    def merge_base(self, rev1: str, rev2: str) -> Optional[str]:
+        """Get the merge base of two revisions, or None if they have none"""
+        return self.merge_bases([(rev1, rev2)])[0]
+
+    def merge_bases(self, pairs: Sequence[Tuple[str, str]]) -> List[Optional[str]]:
+        """
+        Get the merge bases of many revision pairs at once
+
+        Raises:
+            GitCommandError: A revision does not name a commit
+        """
+        resolved = self.resolve(rev for pair in pairs for rev in pair)
+        for rev1, rev2 in pairs:
+            if resolved[rev1] is None or resolved[rev2] is None:
+                # Let git report it exactly as `git merge-base` always has
+                run_git(self.repo_path, ['merge-base', rev1, rev2], ok_returncodes=(0, 1))
+                raise GitCommandError(['merge-base', rev1, rev2], None, 'not a valid commit')
+
+        # Ordered pairs: with criss-cross merges git's pick among equal bases depends on the order
+        keys = [(resolved[rev1], resolved[rev2]) for rev1, rev2 in pairs]
+        results: Dict[Tuple[str, str], str] = {}
+        missing = []
+        for key in dict.fromkeys(keys):
+            value = self._memo.get(key)
+            if value is None:
+                missing.append(key)
+            else:
+                results[key] = value
+        metrics.count('cache_hits', len(results), tier='merge_bases')
+        metrics.count('cache_misses', len(missing), tier='merge_bases')
+
+        if missing:
+            computed = self._compute_batch(missing) if len(missing) > 1 else {}
+            for key in missing:
+                base = computed.get(key)
+                if base is None:
+                    base = self._compute_one(*key)
+                # '' marks unrelated histories, so they are remembered too
+                self._memo.put(key, base, _ENTRY_SIZE)
+                results[key] = base
+
+        return [results[key] or None for key in keys]
+
+    def _compute_one(self, sha1: str, sha2: str) -> str:
+        """Ask git for the merge base of one pair"""
+        metrics.count('merge_base_computed', source='merge-base')
+        # Exit code 1 without output means unrelated histories, not an error
+        return run_git(self.repo_path, ['merge-base', sha1, sha2], ok_returncodes=(0, 1))
+
+    def _compute_batch(self, pairs: List[Tuple[str, str]]) -> Dict[Tuple[str, str], str]:
+        """
+        Merge bases of many pairs from one walk of the commits above their common base
+
+        Everything reachable from the octopus merge base of all heads is
+        shared by every pair, so `rev-list heads ^base` holds each pair's
+        merge base or leads straight to the shared base. Pairs whose answer is
+        not clear-cut from that graph (criss-cross merges, several candidates)
+        are left out and go to `git merge-base` one by one, as is everything
+        when the graph is larger than GRAPH_LIMIT.
+        """
+        heads = sorted({sha for pair in pairs for sha in pair})
+        octopus = run_git(self.repo_path, ['merge-base', '--octopus'] + heads, ok_returncodes=(0, 1)).split()
+        if len(octopus) != 1:
+            # Unrelated histories or several shared bases; the walk would not be bounded
+            return {}
+
+        parents: Dict[str, List[str]] = {}
+        lines = iter_git_lines(self.repo_path, ['rev-list', '--parents'] + heads + ['^' + octopus[0]])
+        try:
+            for line in lines:
+                commit, *commit_parents = line.split()
+                parents[commit] = commit_parents
+                if len(parents) > GRAPH_LIMIT:
+                    return {}
+        finally:
+            lines.close()
+
+        graph = _CommitGraph(parents)
+        results = {}
+        for sha1, sha2 in pairs:
+            base = graph.merge_base(sha1, sha2, octopus[0])
+            if base is not None:
+                results[(sha1, sha2)] = base
+        metrics.count('merge_base_computed', len(results), source='rev-list')
+        return results
+
+    def stats(self) -> Dict[str, int]:
+        """Get memo counters"""
+        return self._memo.stats()
+
+    # -- commit-graph ---------------------------------------------------------
+
+    def has_commit_graph(self) -> bool:
+        """Whether the repository has a commit-graph file (single or split)"""
+        info = os.path.join(self.common_dir, 'objects', 'info')
+        return (os.path.isfile(os.path.join(info, 'commit-graph'))
+                or os.path.isfile(os.path.join(info, 'commit-graphs', 'commit-graph-chain')))
+
+    def ensure_commit_graph(self, wait: bool = False) -> Optional[threading.Thread]:
+        """
+        Write a commit-graph if the repository has none
+
+        With one, git answers ancestry questions from generation numbers
+        instead of parsing commit objects, which is what keeps merge-base and
+        rev-list fast on long histories. Written in the background unless
+        `wait` is set; returns the thread doing it, if any.
+        """
+        if not WRITE_COMMIT_GRAPH or self.has_commit_graph():
+            return None
+
+        def write():
+            try:
+                run_git(self.repo_path, ['commit-graph', 'write', '--reachable', '--split'], timeout=600)
+                logger.info(f"Wrote a commit-graph for {self.repo_path}")
+            except GitCommandError as e:
+                logger.warning(f"Could not write a commit-graph for {self.repo_path}: {e}")
+
+        if wait:
+            write()
+            return None
+        thread = threading.Thread(target=write, name='gittracker-commit-graph', daemon=True)
+        thread.start()
+        return thread
+
+
+class _CommitGraph:
+    """Parent links of the commits above a shared base, for answering merge-base queries"""
+
+    def __init__(self, parents: Dict[str, List[str]]):
+        self.parents = parents
+        self._ancestors: Dict[str, Set[str]] = {}
+
+    def ancestors(self, commit: str) -> Set[str]:
+        """The commit and its ancestors inside the graph"""
+        cached = self._ancestors.get(commit)
+        if cached is not None:
+            return cached
+        seen = set()
+        stack = [commit]
+        while stack:
+            current = stack.pop()
+            if current in seen or current not in self.parents:
+                continue
+            seen.add(current)
+            stack.extend(self.parents[current])
+        self._ancestors[commit] = seen
+        return seen
+
+    def merge_base(self, sha1: str, sha2: str, shared_base: str) -> Optional[str]:
+        """
+        The single best common ancestor of two commits, or None when it is ambiguous
+
+        Walks down from sha2, stopping at ancestors of sha1 (candidates) and at
+        the edge of the graph (where only shared_base and its ancestors lie).
+        """
+        ancestors1 = self.ancestors(sha1)
+        candidates = set()
+        below_graph = False
+        seen = set()
+        stack = [sha2]
+        while stack:
+            current = stack.pop()
+            if current in seen:
+                continue
+            seen.add(current)
+            if current not in self.parents:
+                below_graph = True
+            elif current in ancestors1:
+                candidates.add(current)
+            else:
+                stack.extend(self.parents[current])
+
+        # A candidate below another candidate is not a *best* common ancestor
+        best = [c for c in candidates if not any(c in self.ancestors(o) for o in candidates if o != c)]
+        if not best and below_graph:
+            return shared_base
+        if len(best) == 1 and (not below_graph or self.descends_from(best[0], shared_base)):
+            # Everything below the graph is shared_base or its ancestors, so a
+            # candidate above shared_base beats them all
+            return best[0]
+        return None
+
+    def descends_from(self, commit: str, shared_base: str) -> bool:
+        """Whether shared_base (just outside the graph) is an ancestor of the commit"""
+        return any(shared_base in self.parents[c] for c in self.ancestors(commit))
+
+
+_services: Dict[str, MergeBaseService] = {}
+_services_lock = threading.Lock()
+
+
+def _reset_locks_after_fork():
+    """Keep the memoized answers in child processes, but not locks another thread may hold"""
+    global _services_lock
+    _services_lock = threading.Lock()
+    for service in _services.values():
+        service._lock = threading.Lock()
+        service._memo._lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_locks_after_fork)
+
+
+def get_merge_base_service(repo_path: str) -> MergeBaseService:
+    """Get the shared merge-base service for a repository, creating it if needed"""
+    with _services_lock:
+        service = _services.get(repo_path)
+        if service is None:
+            service = _services[repo_path] = MergeBaseService(repo_path)
+        return service
@@ -0,0 +1,169 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+LabelSet = Tuple[Tuple[str, str], ...]
+
+
+class Recorder:
+    """
+    Timers and counters collected for one analysis
+
+    Stage times are summed over every thread that worked for the analysis,
+    so with a thread pool they can add up to more than the wall time.
+    """
+
+    def __init__(self):
+        self.stages: Dict[str, List[float]] = {}
+        self.counters: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def add_time(self, stage: str, seconds: float):
+        """Account one timed call of a stage"""
+        with self._lock:
+            entry = self.stages.setdefault(stage, [0.0, 0])
+            entry[0] += seconds
+            entry[1] += 1
+
+    def add(self, name: str, value: float = 1):
+        """Increase a counter"""
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert to dictionary representation"""
+        with self._lock:
+            return {
+                'stages': {
+                    stage: {'seconds': round(seconds, 6), 'calls': calls}
+                    for stage, (seconds, calls) in sorted(self.stages.items())
+                },
+                'counters': dict(sorted(self.counters.items()))
+            }
+
+
+class MetricsRegistry:
+    """Process-wide counters since startup, rendered in the Prometheus text format"""
+
+    def __init__(self, prefix: str = 'gittracker'):
+        self.prefix = prefix
+        self._counters: Dict[str, Dict[LabelSet, float]] = {}
+        self._help: Dict[str, str] = {}
+        self._gauges: Dict[str, Tuple[Callable[[], float], str]] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, value: float = 1, labels: Optional[Dict[str, str]] = None, doc: str = ''):
+        """Increase the counter <prefix>_<name>_total"""
+        key = tuple(sorted((labels or {}).items()))
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+            if doc and name not in self._help:
+                self._help[name] = doc
+
+    def gauge(self, name: str, read: Callable[[], float], doc: str = ''):
+        """Register a gauge read when metrics are rendered"""
+        with self._lock:
+            self._gauges[name] = (read, doc)
+
+    def render(self) -> str:
+        """Render every metric in the Prometheus text exposition format"""
+        with self._lock:
+            counters = {name: dict(series) for name, series in self._counters.items()}
+            gauges = dict(self._gauges)
+            help_texts = dict(self._help)
+
+        lines = []
+        for name, series in sorted(counters.items()):
+            metric = f'{self.prefix}_{name}_total'
+            if name in help_texts:
+                lines.append(f'# HELP {metric} {help_texts[name]}')
+            lines.append(f'# TYPE {metric} counter')
+            for labels, value in sorted(series.items()):
+                lines.append(f'{metric}{_format_labels(labels)} {_format_value(value)}')
+        for name, (read, doc) in sorted(gauges.items()):
+            metric = f'{self.prefix}_{name}'
+            try:
+                value = read()
+            except Exception:
+                continue
+            if doc:
+                lines.append(f'# HELP {metric} {doc}')
+            lines.append(f'# TYPE {metric} gauge')
+            lines.append(f'{metric} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+def _format_labels(labels: LabelSet) -> str:
+    """Format a label set as {a="x",b="y"}"""
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in labels)
+    return '{' + ','.join(f'{key}="{value}"' for (key, _), value in zip(labels, escaped)) + '}'
+
+
+def _format_value(value: float) -> str:
+    """Integers without a trailing .0, everything else as repr"""
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+registry = MetricsRegistry()
+
+_local = threading.local()
+
+
+def current() -> Optional[Recorder]:
+    """The recorder of the analysis running on this thread, if any"""
+    return getattr(_local, 'recorder', None)
+
+
+@contextmanager
+def recording(recorder: Optional[Recorder] = None) -> Iterator[Recorder]:
+    """Collect the timers and counters of everything run on this thread into a recorder"""
+    recorder = recorder or Recorder()
+    previous = current()
+    _local.recorder = recorder
+    try:
+        yield recorder
+    finally:
+        _local.recorder = previous
+
+
+def bind(fn: Callable) -> Callable:
+    """Wrap fn so it records into the calling thread's recorder when run on another thread"""
+    recorder = current()
+    if recorder is None:
+        return fn
+
+    def bound(*args, **kwargs):
+        with recording(recorder):
+            return fn(*args, **kwargs)
+    return bound
+
+
+def count(name: str, value: float = 1, **labels: str):
+    """
+    Increase a counter, process-wide and for the current analysis
+
+    In the analysis the counter is keyed 'name' or 'name:label,...' by label values.
+    """
+    registry.inc(name, value, labels)
+    recorder = current()
+    if recorder is not None:
+        recorder.add(f"{name}:{','.join(labels.values())}" if labels else name, value)
+
+
+@contextmanager
+def timer(stage: str):
+    """Time a pipeline stage, process-wide and for the current analysis"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        registry.inc('stage_seconds', seconds, {'stage': stage}, doc='Time spent per analysis stage')
+        registry.inc('stage_calls', 1, {'stage': stage}, doc='Calls per analysis stage')
+        recorder = current()
+        if recorder is not None:
+            recorder.add_time(stage, seconds)
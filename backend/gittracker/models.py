@@ -1,7 +1,52 @@
-from dataclasses import dataclass, field, asdict
-from typing import List, Dict, Any, Optional
+from dataclasses import dataclass, field
+from typing import List, Dict, Any, Optional, Sequence, Tuple, Union
 import json
 
+# Serialized key of every field, in output order (camelCase where the frontend needs it)
+CONFLICT_KEYS = ('file', 'branch1', 'branch2', 'content1', 'content2', 'id', 'lineStart', 'lineEnd')
+# Conflict keys without the content blobs, for listings (see Conflict.to_summary_dict)
+SUMMARY_KEYS = ('file', 'branch1', 'branch2', 'id', 'lineStart', 'lineEnd')
+BRANCH_KEYS = ('name', 'tracking', 'ahead', 'behind', 'last_commit', 'last_commit_date', 'author')
+
+class ContentRef:
+    """
+    Lazy reference to lines [start, end) of a blob
+    
+    Conflicts keep these instead of joined strings: the lines are the shared,
+    interned Lines of the blob (see cache.intern_lines), so every conflict and
+    branch pair touching a file version points at one copy of it.
+    """
+    
+    __slots__ = ('lines', 'start', 'end')
+    
+    def __init__(self, lines: Sequence[str], start: int, end: int):
+        self.lines = lines
+        self.start = start
+        self.end = end
+    
+    @property
+    def sha(self) -> Optional[str]:
+        """SHA of the referenced blob, if known"""
+        return getattr(self.lines, 'sha', None)
+    
+    def resolve(self) -> str:
+        """Join the referenced lines"""
+        return '\n'.join(self.lines[self.start:self.end])
+    
+    def __reduce__(self):
+        # Re-intern on unpickling (e.g. results from process-pool workers)
+        return _restore_content_ref, (self.sha, tuple(self.lines), self.start, self.end)
+    
+    def __repr__(self) -> str:
+        return f"ContentRef({self.sha}, {self.start}, {self.end})"
+
+def _restore_content_ref(sha: Optional[str], lines: Tuple[str, ...], start: int, end: int) -> ContentRef:
+    """Unpickle a ContentRef onto the process's interned lines"""
+    if sha is not None:
+        from gittracker.cache import intern_lines
+        lines = intern_lines(sha, lines)
+    return ContentRef(lines, start, end)
+
 @dataclass
 class Conflict:
     """Represents a potential merge conflict"""
@@ -10,7 +55,7 @@ class Conflict:
     branch2: str
     line_start: int
     line_end: int
-    content1: str
+    content1: str  # Also accepts a ContentRef, resolved on access
     content2: str
     id: str = None  # Generated ID
     
@@ -19,13 +64,20 @@ class Conflict:
         if not self.id:
             self.id = f"{self.file}:{self.branch1}:{self.branch2}:{self.line_start}:{self.line_end}"
     
+    def to_row(self) -> Tuple:
+        """Convert to a tuple of field values in CONFLICT_KEYS order"""
+        return (self.file, self.branch1, self.branch2, self.content1, self.content2,
+                self.id, self.line_start, self.line_end)
+    
     def to_dict(self) -> Dict[str, Any]:
         """Convert to dictionary representation -- ensuring camelCase for frontend"""
-        d = asdict(self)
-        # Convert snake_case to camelCase manually for keys required by frontend
-        d['lineStart'] = d.pop('line_start')
-        d['lineEnd'] = d.pop('line_end')
-        return d
+        # Fields are immutable scalars, so no asdict() deep copy is needed
+        return dict(zip(CONFLICT_KEYS, self.to_row()))
+    
+    def to_summary_dict(self) -> Dict[str, Any]:
+        """Like to_dict, but without content1/content2"""
+        return dict(zip(SUMMARY_KEYS, (self.file, self.branch1, self.branch2,
+                                       self.id, self.line_start, self.line_end)))
     
     def to_json(self) -> str:
         """Convert to JSON string"""
@@ -46,6 +98,23 @@ class Conflict:
         """Create from JSON string"""
         return cls.from_dict(json.loads(json_str))
 
+def _content_property(name: str) -> property:
+    """Property storing a str or ContentRef and always reading back a str"""
+    attr = f'_{name}'
+    
+    def getter(self) -> str:
+        value = self.__dict__[attr]
+        return value.resolve() if isinstance(value, ContentRef) else value
+    
+    def setter(self, value: Union[str, ContentRef]):
+        self.__dict__[attr] = value
+    
+    return property(getter, setter, doc=f"{name}, resolved from its ContentRef if it has one")
+
+# Installed after @dataclass so the generated __init__/__eq__/__repr__ go through them
+Conflict.content1 = _content_property('content1')
+Conflict.content2 = _content_property('content2')
+
 @dataclass
 class BranchInfo:
     """Information about a Git branch"""
@@ -57,9 +126,14 @@ class BranchInfo:
     last_commit_date: str = None
     author: str = None
     
+    def to_row(self) -> Tuple:
+        """Convert to a tuple of field values in BRANCH_KEYS order"""
+        return (self.name, self.tracking, self.ahead, self.behind,
+                self.last_commit, self.last_commit_date, self.author)
+    
     def to_dict(self) -> Dict[str, Any]:
         """Convert to dictionary representation"""
-        return asdict(self)
+        return dict(zip(BRANCH_KEYS, self.to_row()))
 
 @dataclass
 class RepositoryState:
@@ -69,15 +143,18 @@ class RepositoryState:
     branches: List[BranchInfo] = field(default_factory=list)
     conflicts: List[Conflict] = field(default_factory=list)
     last_analyzed: str = None
+    version: str = None  # Ref snapshot fingerprint + analysis generation
     
     def to_dict(self) -> Dict[str, Any]:
         """Convert to dictionary representation"""
-        result = asdict(self)
-        # Convert conflicts to dicts
-        result['conflicts'] = [c.to_dict() for c in self.conflicts]
-        # Convert branches to dicts
-        result['branches'] = [b.to_dict() for b in self.branches]
-        return result
+        return {
+            'path': self.path,
+            'current_branch': self.current_branch,
+            'branches': [dict(zip(BRANCH_KEYS, b.to_row())) for b in self.branches],
+            'conflicts': [dict(zip(CONFLICT_KEYS, c.to_row())) for c in self.conflicts],
+            'last_analyzed': self.last_analyzed,
+            'version': self.version
+        }
     
     def to_json(self) -> str:
         """Convert to JSON string"""
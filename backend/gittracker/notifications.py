@@ -0,0 +1,154 @@
+import itertools
+import json
+import queue
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Iterator, List, Optional
+
+from gittracker.models import Conflict
+
+
+def diff_conflicts(old: List[Conflict], new: List[Conflict]) -> Dict[str, List]:
+    """
+    Compare two conflict lists by id
+
+    Returns:
+        {'added': [Conflict], 'removed': [id], 'changed': [Conflict]}; a conflict
+        is 'changed' when its id survives but its content differs
+    """
+    old_by_id = {c.id: c for c in old}
+    new_by_id = {c.id: c for c in new}
+    return {
+        'added': [c for c in new if c.id not in old_by_id],
+        'removed': [c.id for c in old if c.id not in new_by_id],
+        'changed': [c for c in new if c.id in old_by_id and old_by_id[c.id] != c]
+    }
+
+
+class Event:
+    """A published notification"""
+
+    __slots__ = ('id', 'type', 'repo_path', 'data')
+
+    def __init__(self, event_id: int, event_type: str, repo_path: str, data: Dict[str, Any]):
+        self.id = event_id
+        self.type = event_type
+        self.repo_path = repo_path
+        self.data = data
+
+    def to_sse(self) -> str:
+        """Format as a Server-Sent Events message"""
+        return f"id: {self.id}\nevent: {self.type}\ndata: {json.dumps(self.data)}\n\n"
+
+
+class Subscription:
+    """A subscriber's queue of pending events, optionally limited to one repository"""
+
+    def __init__(self, broker: 'NotificationBroker', repo_path: Optional[str], max_pending: int):
+        self.broker = broker
+        self.repo_path = repo_path
+        self.queue: 'queue.Queue[Event]' = queue.Queue(maxsize=max_pending)
+        self.overflowed = False
+
+    def wants(self, event: Event) -> bool:
+        """Whether this subscriber is interested in an event"""
+        return self.repo_path is None or event.repo_path == self.repo_path
+
+    def offer(self, event: Event):
+        """Queue an event without ever blocking the publisher"""
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            # A stalled client must resync from /state rather than hold memory
+            self.overflowed = True
+
+    def events(self, heartbeat: float = 15.0) -> Iterator[Optional[Event]]:
+        """Yield events as they arrive, or None every `heartbeat` seconds while idle"""
+        while not self.overflowed:
+            try:
+                yield self.queue.get(timeout=heartbeat)
+            except queue.Empty:
+                yield None
+
+    def close(self):
+        """Stop receiving events"""
+        self.broker.unsubscribe(self)
+
+
+class NotificationBroker:
+    """Fans conflict updates out to streaming clients (see the /events endpoint)"""
+
+    def __init__(self, history: int = 256, max_pending: int = 1024):
+        """
+        Initialize the broker
+
+        Args:
+            history: Recent events kept so reconnecting clients can catch up (Last-Event-ID)
+            max_pending: Events buffered per subscriber before it is dropped
+        """
+        self.max_pending = max_pending
+        self._ids = itertools.count(1)
+        self._history: Deque[Event] = deque(maxlen=history)
+        self._subscribers: List[Subscription] = []
+        self._lock = threading.Lock()
+
+    def subscribe(self, repo_path: Optional[str] = None, last_event_id: Optional[int] = None) -> Subscription:
+        """
+        Register a subscriber
+
+        Args:
+            repo_path: Only receive events for this repository (all repositories if None)
+            last_event_id: Replay newer events still in the history buffer
+        """
+        subscription = Subscription(self, repo_path, self.max_pending)
+        with self._lock:
+            if last_event_id is not None:
+                if self._history and self._history[0].id > last_event_id + 1:
+                    # Some missed events already fell out of the history
+                    subscription.overflowed = True
+                for event in self._history:
+                    if event.id > last_event_id and subscription.wants(event):
+                        subscription.offer(event)
+            self._subscribers.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        """Remove a subscriber"""
+        with self._lock:
+            if subscription in self._subscribers:
+                self._subscribers.remove(subscription)
+
+    def publish(self, repo_path: str, event_type: str, data: Dict[str, Any]) -> Event:
+        """Send an event to every interested subscriber"""
+        with self._lock:
+            event = Event(next(self._ids), event_type, repo_path, data)
+            self._history.append(event)
+            for subscription in self._subscribers:
+                if subscription.wants(event):
+                    subscription.offer(event)
+        return event
+
+    def publish_conflict_delta(self, repo_path: str, old: List[Conflict], new: List[Conflict],
+                               last_analyzed: Optional[str] = None) -> Optional[Event]:
+        """Publish a 'conflicts' event if the conflict list changed; returns it, or None"""
+        delta = diff_conflicts(old, new)
+        if not any(delta.values()):
+            return None
+        return self.publish(repo_path, 'conflicts', {
+            'repo_path': repo_path,
+            'added': [c.to_dict() for c in delta['added']],
+            'removed': delta['removed'],
+            'changed': [c.to_dict() for c in delta['changed']],
+            'total': len(new),
+            'last_analyzed': last_analyzed,
+            'timestamp': time.time()
+        })
+
+    def subscriber_count(self) -> int:
+        """Number of connected subscribers"""
+        with self._lock:
+            return len(self._subscribers)
+
+
+broker = NotificationBroker()
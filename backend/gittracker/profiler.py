@@ -0,0 +1,89 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import List, Optional, Tuple
+
+
+class SamplingProfiler:
+    """
+    Samples the stacks of every thread at a fixed interval
+
+    Cheap enough to leave on for a single request: nothing is traced, a
+    background thread just reads sys._current_frames(). Results are kept
+    as collapsed stacks ("outer;inner;leaf count"), the input format of
+    flamegraph.pl and speedscope.
+    """
+
+    def __init__(self, interval: float = 0.005, max_depth: int = 64):
+        """
+        Initialize the profiler
+
+        Args:
+            interval: Seconds between samples
+            max_depth: Innermost frames kept per stack
+        """
+        self.interval = interval
+        self.max_depth = max_depth
+        self.samples = 0
+        self.stacks: Counter = Counter()
+        self.started: Optional[float] = None
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> 'SamplingProfiler':
+        """Start sampling in the background"""
+        self.started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name='gittracker-profiler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> 'SamplingProfiler':
+        """Stop sampling"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        if self.started is not None:
+            self.duration = time.perf_counter() - self.started
+        return self
+
+    def _run(self):
+        """Profiler thread: record every other thread's stack until stopped"""
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                self.stacks[self._collapse(frame)] += 1
+            self.samples += 1
+
+    def _collapse(self, frame) -> str:
+        """Turn a frame into 'outer;...;inner' function names"""
+        names = []
+        while frame is not None and len(names) < self.max_depth:
+            code = frame.f_code
+            names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+            frame = frame.f_back
+        return ';'.join(reversed(names))
+
+    def collapsed(self) -> str:
+        """All stacks in the collapsed format, most frequent first"""
+        return ''.join(f'{stack} {n}\n' for stack, n in self.stacks.most_common())
+
+    def top(self, limit: int = 20) -> List[Tuple[str, int]]:
+        """Functions seen innermost (running, not waiting on a callee) most often"""
+        leaves: Counter = Counter()
+        for stack, n in self.stacks.items():
+            leaves[stack.rsplit(';', 1)[-1]] += n
+        return leaves.most_common(limit)
+
+    def dump(self, directory: str, name: str) -> str:
+        """Write the collapsed stacks to <directory>/<name>.collapsed and return the path"""
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f'{name}.collapsed')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(self.collapsed())
+        return path
@@ -1,30 +1,53 @@
 import os
 import time
 import threading
-from typing import Callable, Dict, List, Set
+from typing import Callable, Dict, List, Optional, Set
 import logging
 
 from gittracker.git_utils import GitUtils
+from gittracker.fs_events import RefEventMonitor, inotify_available
+
+WATCH_MODES = ('auto', 'events', 'poll')
 
 class RepoWatcher:
     """Watches a Git repository for changes"""
     
-    def __init__(self, repo_path: str, callback: Callable = None, interval: int = 60):
+    def __init__(self, repo_path: str, callback: Callable = None, interval: int = 60,
+                 mode: Optional[str] = None, fetch_interval: Optional[int] = None,
+                 debounce: float = 0.2, scheduler=None):
         """
         Initialize the repository watcher
         
         Args:
             repo_path: Path to the Git repository
             callback: Function to call when changes are detected
-            interval: How often to check for changes (in seconds)
+            interval: How often to check for changes (in seconds) when polling
+            mode: 'events' (inotify on the git directory's refs), 'poll' (fetch and
+                  rescan every interval) or 'auto' (events where available); defaults
+                  to GITTRACKER_WATCH_MODE, then 'auto'
+            fetch_interval: How often to fetch from remotes in events mode
+                            (in seconds, defaults to interval; 0 disables fetching)
+            debounce: Quiet period (in seconds) that ends a burst of ref events
+            scheduler: Shared WatchScheduler to run this watcher on; without one the
+                       watcher runs its own threads
         """
         self.repo_path = repo_path
         self.git = GitUtils(repo_path)
         self.callback = callback
         self.interval = interval
+        self.fetch_interval = interval if fetch_interval is None else fetch_interval
+        self.debounce = debounce
+        self.mode = (mode or os.environ.get('GITTRACKER_WATCH_MODE') or 'auto').lower()
+        if self.mode not in WATCH_MODES:
+            raise ValueError(f"Unknown watch mode: {self.mode}")
         self.running = False
         self.thread = None
+        self.fetch_thread = None
+        self.monitor: Optional[RefEventMonitor] = None
+        self.scheduler = scheduler
+        self.uses_events = False
         self.last_state: Dict = {}
+        self._stop_event = threading.Event()
     
     def start(self):
         """Start watching the repository"""
@@ -32,46 +55,85 @@ class RepoWatcher:
             return
         
         self.running = True
+        self._stop_event.clear()
+        
+        if self.scheduler:
+            self._capture_initial_state()
+            self.uses_events = self.scheduler.add(self)
+            logging.info(f"Scheduled watching repository: {self.repo_path}")
+            return
+        
+        # Watch before capturing the state, so nothing slips in between
+        self.monitor = self._create_monitor()
+        self.uses_events = self.monitor is not None
         self._capture_initial_state()
+        if self.monitor:
+            target = self._event_loop
+            if self.fetch_interval > 0:
+                self.fetch_thread = threading.Thread(target=self._fetch_loop)
+                self.fetch_thread.daemon = True
+                self.fetch_thread.start()
+        else:
+            target = self._watch_loop
         
-        self.thread = threading.Thread(target=self._watch_loop)
+        self.thread = threading.Thread(target=target)
         self.thread.daemon = True
         self.thread.start()
         
-        logging.info(f"Started watching repository: {self.repo_path}")
+        logging.info(f"Started watching repository: {self.repo_path} "
+                     f"({'events' if self.monitor else 'polling'})")
     
     def stop(self):
         """Stop watching the repository"""
         self.running = False
-        if self.thread:
-            self.thread.join(timeout=5.0)
-            self.thread = None
+        self._stop_event.set()
+        if self.scheduler:
+            self.scheduler.remove(self)
+        if self.monitor:
+            # Wakes the event loop out of its blocking wait
+            self.monitor.wake()
+        for thread in (self.thread, self.fetch_thread):
+            if thread:
+                thread.join(timeout=5.0)
+        self.thread = None
+        self.fetch_thread = None
+        if self.monitor:
+            self.monitor.close()
+            self.monitor = None
         
         logging.info(f"Stopped watching repository: {self.repo_path}")
     
-    def _capture_initial_state(self):
+    def _create_monitor(self) -> Optional[RefEventMonitor]:
+        """Set up inotify on the repository's refs, or return None to fall back to polling"""
+        if self.mode == 'poll':
+            return None
+        if not inotify_available():
+            if self.mode == 'events':
+                logging.warning("inotify is not available, falling back to polling")
+            return None
+        
+        try:
+            monitor = RefEventMonitor()
+            monitor.add(self.repo_path, self.git.get_git_dir())
+            return monitor
+        except OSError as e:
+            # e.g. fs.inotify.max_user_watches exhausted
+            logging.warning(f"Cannot watch {self.repo_path} for events, falling back to polling: {e}")
+            return None
+    
+    def _capture_initial_state(self, snapshot: Dict = None):
         """Capture the initial state of the repository"""
+        snapshot = snapshot or self.git.get_ref_snapshot()
         self.last_state = {
-            'branches': set(self.git.get_all_branches()),
-            'head_commits': self._get_head_commits(),
+            'branches': set(snapshot['branches']),
+            'head_commits': self._get_head_commits(snapshot),
             'timestamp': time.time()
         }
     
-    def _get_head_commits(self) -> Dict[str, str]:
+    def _get_head_commits(self, snapshot: Dict = None) -> Dict[str, str]:
         """Get the commit hashes for all branch heads"""
-        branches = self.git.get_all_branches()
-        head_commits = {}
-        
-        for branch in branches:
-            try:
-                # Get the commit hash for this branch
-                commit_hash = self.git._run_git_command(['rev-parse', branch])
-                if commit_hash:
-                    head_commits[branch] = commit_hash
-            except Exception as e:
-                logging.error(f"Error getting head commit for branch {branch}: {e}")
-        
-        return head_commits
+        snapshot = snapshot or self.git.get_ref_snapshot()
+        return {name: info['sha'] for name, info in snapshot['branches'].items() if info['sha']}
     
     def _watch_loop(self):
         """Background thread to periodically check for changes"""
@@ -81,28 +143,64 @@ class RepoWatcher:
                 self.git.fetch_latest_changes()
                 
                 # Check for changes
-                changes = self._detect_changes()
-                
-                if changes['has_changes']:
-                    logging.info(f"Changes detected: {changes}")
-                    
-                    # Update the last state
-                    self._capture_initial_state()
-                    
-                    # Call the callback if provided
-                    if self.callback:
-                        self.callback(changes)
+                self.check_for_changes()
             
             except Exception as e:
                 logging.error(f"Error in repository watcher: {e}")
             
             # Sleep until next check
-            time.sleep(self.interval)
+            self._stop_event.wait(self.interval)
+    
+    def _event_loop(self):
+        """Background thread that rescans refs only after inotify reports they moved"""
+        while self.running:
+            if not self.monitor.wait():
+                continue
+            
+            # Let a burst (commit, rebase, fetch of many branches) settle first
+            deadline = time.monotonic() + max(self.debounce * 10, 1.0)
+            while self.running and time.monotonic() < deadline:
+                if not self.monitor.wait(self.debounce):
+                    break
+            
+            if not self.running:
+                break
+            
+            try:
+                self.check_for_changes()
+            except Exception as e:
+                logging.error(f"Error in repository watcher: {e}")
+    
+    def _fetch_loop(self):
+        """Background thread that fetches from remotes; the event loop sees the updated refs"""
+        while not self._stop_event.wait(self.fetch_interval):
+            try:
+                self.git.fetch_latest_changes()
+            except Exception as e:
+                logging.error(f"Error fetching in repository watcher: {e}")
+    
+    def check_for_changes(self) -> bool:
+        """Rescan refs and notify the callback if anything moved; returns whether anything did"""
+        snapshot = self.git.get_ref_snapshot()
+        changes = self._detect_changes(snapshot)
+        
+        if changes['has_changes']:
+            logging.info(f"Changes detected: {changes}")
+            
+            # Update the last state
+            self._capture_initial_state(snapshot)
+            
+            # Call the callback if provided
+            if self.callback:
+                self.callback(changes)
+        
+        return changes['has_changes']
     
-    def _detect_changes(self) -> Dict:
+    def _detect_changes(self, snapshot: Dict = None) -> Dict:
         """Detect changes in the repository"""
-        current_branches = set(self.git.get_all_branches())
-        current_head_commits = self._get_head_commits()
+        snapshot = snapshot or self.git.get_ref_snapshot()
+        current_branches = set(snapshot['branches'])
+        current_head_commits = self._get_head_commits(snapshot)
         
         changes = {
             'has_changes': False,
@@ -137,34 +235,27 @@ class RepoWatcher:
         # Fetch latest changes
         self.git.fetch_latest_changes()
         
-        branches = self.git.get_all_branches()
-        current_branch = self.git.get_current_branch()
+        snapshot = self.git.get_ref_snapshot()
         incoming_changes = {}
         
-        for branch in branches:
+        for branch, info in snapshot['branches'].items():
             try:
                 # Get upstream branch
-                tracking_info = self.git.get_branch_tracking_info(branch)
-                tracking_branch = tracking_info.get('tracking')
+                tracking_branch = info['tracking']
                 
-                if tracking_branch:
-                    # Check for unpulled commits
-                    unpulled_commits = self.git._run_git_command([
-                        'rev-list', '--count', f'{branch}..origin/{tracking_branch}'
-                    ])
+                # 'behind' counts the unpulled commits on the upstream branch
+                if tracking_branch and info['behind'] > 0:
+                    # Get the list of files that would be affected by pulling
+                    affected_files = self.git.get_modified_files_between_branches(
+                        branch, f'origin/{tracking_branch}'
+                    )
                     
-                    if unpulled_commits and int(unpulled_commits) > 0:
-                        # Get the list of files that would be affected by pulling
-                        affected_files = self.git.get_modified_files_between_branches(
-                            branch, f'origin/{tracking_branch}'
-                        )
-                        
-                        incoming_changes[branch] = {
-                            'tracking': tracking_branch,
-                            'unpulled_commits': int(unpulled_commits),
-                            'affected_files': affected_files
-                        }
+                    incoming_changes[branch] = {
+                        'tracking': tracking_branch,
+                        'unpulled_commits': info['behind'],
+                        'affected_files': affected_files
+                    }
             except Exception as e:
                 logging.error(f"Error analyzing incoming changes for {branch}: {e}")
         
-        return incoming_changes
\ No newline at end of file
+        return incoming_changes
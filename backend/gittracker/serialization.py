@@ -0,0 +1,66 @@
+import json
+from typing import Any, Optional
+
+from gittracker import metrics
+
+# Optional fast encoders; plain json is always available
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+JSON = 'application/json'
+MSGPACK = 'application/msgpack'
+MSGPACK_TYPES = ('application/msgpack', 'application/x-msgpack', 'application/vnd.msgpack')
+
+
+def negotiate(accept: Optional[str]) -> str:
+    """
+    Pick a response mimetype for an Accept header
+
+    msgpack is chosen when the client prefers it and the msgpack package is
+    installed; everything else (including no header at all) gets JSON.
+    """
+    if not accept or msgpack is None:
+        return JSON
+
+    ranges = []
+    for position, part in enumerate(accept.split(',')):
+        media_type, _, params = part.strip().partition(';')
+        quality = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            ranges.append((-quality, position, media_type.strip().lower()))
+
+    for _, _, media_type in sorted(ranges):
+        if media_type in MSGPACK_TYPES:
+            return MSGPACK
+        if media_type in (JSON, 'application/*', '*/*'):
+            return JSON
+    return JSON
+
+
+def encode(payload: Any, mimetype: str = JSON) -> bytes:
+    """Serialize a payload of dicts, lists, tuples and scalars for a negotiated mimetype"""
+    with metrics.timer('serialize'):
+        if mimetype == MSGPACK:
+            return msgpack.packb(payload, use_bin_type=True)
+        if orjson is not None:
+            return orjson.dumps(payload)
+        return json.dumps(payload, separators=(',', ':')).encode('utf-8')
+
+
+def available_encoders() -> list:
+    """Names of the encoders usable in this environment"""
+    return ['json'] + [name for name, module in (('orjson', orjson), ('msgpack', msgpack)) if module]
@@ -10,16 +10,35 @@ import sys
 import json
 import logging
 import datetime
-from typing import Dict, List, Any
+import base64
+import binascii
+import sqlite3
+import argparse
+import itertools
+import tempfile
+import threading
+import time
+from typing import Dict, List, Any, Callable, Optional, Tuple
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
 
 # Import GitTracker modules
-from gittracker.git_utils import GitUtils
+from gittracker.git_utils import GitUtils, ref_fingerprint
+from gittracker.merge_base import get_merge_base_service
 from gittracker.conflict_analyzer import ConflictAnalyzer
 from gittracker.repo_watcher import RepoWatcher
+from gittracker.watch_scheduler import get_scheduler
 from gittracker.models import Conflict, RepositoryState, BranchInfo
+from gittracker.notifications import broker
+from gittracker.jobs import Job, get_job_manager
+from gittracker.serving import serve
+from gittracker import metrics
+from gittracker.profiler import SamplingProfiler
+from gittracker.state_versions import state_versions
+from gittracker.state_cache import StateCache
+from gittracker.snapshot_store import SnapshotStore
+from gittracker.serialization import encode, negotiate
 from gittracker.ai_resolver import AIResolver
 
 from dotenv import load_dotenv
@@ -44,7 +63,73 @@ CORS(app)  # Enable CORS for all routes
 
 # Global state
 active_watchers = {}  # Map of repo_path to RepoWatcher objects
-repo_states = {}      # Cache of repository states
+
+# Cache of repository states; watched repositories are never evicted
+repo_states = StateCache(
+    max_entries=int(os.environ.get('GITTRACKER_STATE_CACHE_ENTRIES', 64)),
+    max_bytes=int(os.environ.get('GITTRACKER_STATE_CACHE_MB', 256)) * 1024 * 1024,
+    ttl=float(os.environ.get('GITTRACKER_STATE_CACHE_TTL', 3600)),
+    is_pinned=lambda repo_path: repo_path in active_watchers,
+    on_evict=state_versions.forget
+)
+
+metrics.registry.gauge('state_cache_entries', lambda: len(repo_states), 'Repository states cached')
+metrics.registry.gauge('state_cache_bytes', lambda: repo_states.current_bytes, 'Approximate memory held by cached states')
+metrics.registry.gauge('state_body_bytes', lambda: state_versions.body_bytes, 'Memory held by encoded response bodies')
+metrics.registry.gauge('watched_repositories', lambda: len(active_watchers), 'Repositories being watched')
+metrics.registry.gauge('event_subscribers', lambda: broker.subscriber_count(), 'Connected /events clients')
+
+# Per-request sampling profiles (?profile=1 or X-GitTracker-Profile: 1), written as collapsed stacks
+PROFILING = os.environ.get('GITTRACKER_PROFILING', 'False').lower() == 'true'
+PROFILE_DIR = os.environ.get('GITTRACKER_PROFILE_DIR', os.path.join(tempfile.gettempdir(), 'gittracker-profiles'))
+
+# Persist analyses in each repository so a restarted server can answer right away
+USE_SNAPSHOTS = os.environ.get('GITTRACKER_SNAPSHOTS', 'True').lower() == 'true'
+_snapshot_stores: Dict[str, SnapshotStore] = {}
+# Repositories found without a usable snapshot, with the store signature seen then
+_missing_snapshots: Dict[str, Optional[Tuple[int, int]]] = {}
+
+# Ref snapshots are numbered as they are read, so results of older analyses never replace newer ones
+_snapshot_sequence = itertools.count(1)
+_stored_seqs: Dict[str, int] = {}  # Sequence number of the snapshot behind each cached state
+_store_lock = threading.Lock()
+
+# Set by main() when several worker processes serve the app; each keeps its own
+# caches, watchers and jobs, and they share analyses through the snapshots
+MULTI_WORKER = False
+
+# Pagination of /conflicts
+DEFAULT_PAGE_SIZE = 200
+MAX_PAGE_SIZE = 5000
+
+@app.before_request
+def start_profiling():
+    """Sample every thread's stack while a request that asked for a profile runs"""
+    if PROFILING and (request.args.get('profile') or request.headers.get('X-GitTracker-Profile')):
+        request.environ['gittracker.profiler'] = SamplingProfiler().start()
+
+@app.after_request
+def finish_request(response):
+    """Count the request and write its profile, if one was taken"""
+    metrics.count('http_requests', endpoint=request.endpoint or 'unknown', status=str(response.status_code))
+    
+    profiler = request.environ.pop('gittracker.profiler', None)
+    if profiler is not None:
+        profiler.stop()
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{request.endpoint or 'unknown'}"
+        try:
+            path = profiler.dump(PROFILE_DIR, name)
+            response.headers['X-GitTracker-Profile'] = path
+            logger.info(f"Profile of {request.path}: {profiler.samples} samples in {path}, "
+                        f"hottest: {profiler.top(3)}")
+        except OSError as e:
+            logger.warning(f"Could not write profile: {e}")
+    return response
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Process-wide counters, stage timers and cache gauges in the Prometheus text format"""
+    return Response(metrics.registry.render(), mimetype='text/plain; version=0.0.4')
 
 @app.route('/health', methods=['GET'])
 def health_check():
@@ -57,7 +142,19 @@ def health_check():
 
 @app.route('/analyze', methods=['POST'])
 def analyze_repository():
-    """Analyze a repository for potential conflicts"""
+    """
+    Start analyzing a repository for potential conflicts
+    
+    Returns 202 with a job (poll /jobs/<id>) by default. With "wait": true the
+    request blocks until the analysis finishes and returns the repository state,
+    as it did before jobs existed; "timeout" bounds the wait in seconds.
+    With "stream": true conflicts are streamed as NDJSON while branch pairs
+    finish; "fields": "summary" leaves out conflict content.
+    
+    Jobs live in the worker process that runs them, so with several workers
+    a poll could reach one that does not know the job: there every request
+    waits for its result, without a timeout.
+    """
     data = request.json
     repo_path = data.get('repo_path')
     
@@ -67,49 +164,25 @@ def analyze_repository():
         }), 400
     
     try:
-        # Initialize Git utilities
-        git = GitUtils(repo_path)
-        analyzer = ConflictAnalyzer(repo_path)
+        if data.get('stream'):
+            return stream_analysis(repo_path, fields=data.get('fields'))
         
-        # Get current branch
-        current_branch = git.get_current_branch()
+        # Requests for the same repo and ref snapshot share one in-flight analysis
+        job, coalesced = submit_analysis(repo_path)
         
-        # Analyze all branches for conflicts
-        conflicts = analyzer.analyze_all_branches()
+        if data.get('wait') or MULTI_WORKER:
+            job.wait(None if MULTI_WORKER else data.get('timeout'))
+            if job.status == Job.DONE:
+                # Per-stage timers and counters of the analysis that produced the result
+                repo_state = _job_state(job)
+                if repo_state is not None:
+                    return _encoded_response(dict(repo_state.to_dict(), metrics=job.metrics.to_dict()))
+            if job.status == Job.FAILED:
+                return jsonify({
+                    'error': job.error
+                }), 500
         
-        # Get branch information
-        branches = git.get_all_branches()
-        branch_infos = []
-        
-        for branch in branches:
-            tracking_info = git.get_branch_tracking_info(branch)
-            
-            # Get commit history for branch (just the most recent commit)
-            commit_history = git.get_commit_history(branch, max_count=1)
-            last_commit = commit_history[0] if commit_history else None
-            
-            branch_info = BranchInfo(
-                name=branch,
-                tracking=tracking_info.get('tracking'),
-                last_commit=last_commit['hash'] if last_commit else None,
-                last_commit_date=last_commit['date'] if last_commit else None,
-                author=last_commit['author'] if last_commit else None
-            )
-            branch_infos.append(branch_info)
-        
-        # Create repository state
-        repo_state = RepositoryState(
-            path=repo_path,
-            current_branch=current_branch,
-            branches=branch_infos,
-            conflicts=conflicts,
-            last_analyzed=datetime.datetime.now().isoformat()
-        )
-        
-        # Cache the state
-        repo_states[repo_path] = repo_state
-        
-        return jsonify(repo_state.to_dict())
+        return jsonify(dict(job.to_dict(), coalesced=coalesced)), 202
     
     except Exception as e:
         logger.error(f"Error analyzing repository: {e}", exc_info=True)
@@ -117,6 +190,38 @@ def analyze_repository():
             'error': str(e)
         }), 500
 
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Get the status and progress of an analysis job"""
+    job = get_job_manager().get(job_id)
+    if job is None:
+        return jsonify({
+            'error': f'Unknown job: {job_id}'
+        }), 404
+    return jsonify(job.to_dict())
+
+@app.route('/jobs/<job_id>/result', methods=['GET'])
+def get_job_result(job_id):
+    """Get the repository state produced by an analysis job (202 while it is still running)"""
+    job = get_job_manager().get(job_id)
+    if job is None:
+        return jsonify({
+            'error': f'Unknown job: {job_id}'
+        }), 404
+    
+    if job.status == Job.DONE:
+        repo_state = _job_state(job)
+        if repo_state is None:
+            return jsonify({
+                'error': f'The result of job {job_id} is no longer available'
+            }), 410
+        return _encoded_response(repo_state.to_dict())
+    if job.status == Job.FAILED:
+        return jsonify({
+            'error': job.error
+        }), 500
+    return jsonify(job.to_dict()), 202
+
 @app.route('/analyze/file', methods=['POST'])
 def analyze_file():
     """Analyze a specific file for potential conflicts"""
@@ -131,11 +236,17 @@ def analyze_file():
     
     try:
         analyzer = ConflictAnalyzer(repo_path)
+        
+        if data.get('stream'):
+            return _stream_conflicts(analyzer.iter_file(file_path), lambda conflicts: {'file': file_path},
+                                     data.get('fields'))
+        
         conflicts = analyzer.analyze_file(file_path)
+        project = _conflict_projection(data.get('fields'))
         
-        return jsonify({
+        return _encoded_response({
             'file': file_path,
-            'conflicts': [c.to_dict() for c in conflicts]
+            'conflicts': [project(c) for c in conflicts]
         })
     
     except Exception as e:
@@ -156,15 +267,14 @@ def get_branches():
     
     try:
         git = GitUtils(repo_path)
-        branches = git.get_all_branches()
-        current_branch = git.get_current_branch()
+        snapshot = git.get_ref_snapshot()
+        current_branch = snapshot['current_branch']
         
         branch_infos = []
-        for branch in branches:
-            tracking_info = git.get_branch_tracking_info(branch)
+        for branch, info in sorted(snapshot['branches'].items()):
             branch_infos.append({
                 'name': branch,
-                'tracking': tracking_info.get('tracking'),
+                'tracking': info['tracking'],
                 'is_current': branch == current_branch
             })
         
@@ -277,9 +387,36 @@ def get_conflicts():
         
     try:
         # Return conflicts from cached state if available
-        if repo_path in repo_states:
-            conflicts = [c.to_dict() for c in repo_states[repo_path].conflicts]
-            return jsonify({'conflicts': conflicts})
+        repo_state = _cached_state(repo_path)
+        if repo_state is not None:
+            project = _conflict_projection(request.args.get('fields'))
+            
+            limit = request.args.get('limit', type=int)
+            cursor = request.args.get('cursor')
+            if not limit and not cursor:
+                return _versioned_response(repo_path, repo_state, f'conflicts:{project.__name__}', lambda: {
+                    'conflicts': [project(c) for c in repo_state.conflicts],
+                    'version': repo_state.version
+                })
+            
+            # Cursor pagination: pages are slices of one version of the state
+            offset = 0
+            if cursor:
+                cursor_version, offset = _decode_cursor(cursor)
+                if cursor_version != repo_state.version:
+                    return jsonify({
+                        'error': 'Cursor is stale: the conflicts changed, restart from the first page',
+                        'version': repo_state.version
+                    }), 409
+            limit = max(1, min(limit or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE))
+            end = offset + limit
+            
+            return _versioned_response(repo_path, repo_state, None, lambda: {
+                'conflicts': [project(c) for c in repo_state.conflicts[offset:end]],
+                'version': repo_state.version,
+                'total': len(repo_state.conflicts),
+                'next_cursor': _encode_cursor(repo_state.version, end) if end < len(repo_state.conflicts) else None
+            })
             
         # If not in cache, return empty list (client should trigger analyze first)
         return jsonify({'conflicts': []})
@@ -290,12 +427,37 @@ def get_conflicts():
             'error': str(e)
         }), 500
 
+@app.route('/conflicts/detail', methods=['GET'])
+def get_conflict_detail():
+    """Get one cached conflict by id, including its content (for clients listing with fields=summary)"""
+    repo_path = request.args.get('repo_path')
+    conflict_id = request.args.get('id')
+    
+    if not repo_path or not conflict_id:
+        return jsonify({
+            'error': 'Repository path and conflict id are required'
+        }), 400
+    
+    repo_state = _cached_state(repo_path)
+    conflict = state_versions.find_conflict(repo_path, repo_state, conflict_id) if repo_state else None
+    if conflict is None:
+        return jsonify({
+            'error': f'Unknown conflict: {conflict_id}'
+        }), 404
+    
+    response = _encoded_response(conflict.to_dict())
+    if repo_state.version:
+        response.set_etag(repo_state.version)
+    return response
+
 @app.route('/watch/start', methods=['POST'])
 def start_watching():
     """Start watching a repository for changes"""
     data = request.json
     repo_path = data.get('repo_path')
     interval = data.get('interval', 60)  # Default to 60 seconds
+    mode = data.get('mode')  # 'events', 'poll' or 'auto' (the default)
+    fetch_interval = data.get('fetch_interval')  # Defaults to interval
     
     if not repo_path:
         return jsonify({
@@ -313,13 +475,16 @@ def start_watching():
         # Define callback function for the watcher
         def on_repo_change(changes):
             logger.info(f"Repository changes detected: {changes}")
-            # We could trigger WebSocket notifications here
-            # For now, we'll just update the cached state
-            analyze_repository_internal(repo_path)
+            # Runs as a job; storing its state pushes the conflict delta to /events subscribers
+            analyze_repository_incremental(repo_path, changes)
         
         # Create and start watcher
-        watcher = RepoWatcher(repo_path, callback=on_repo_change, interval=interval)
+        watcher = RepoWatcher(repo_path, callback=on_repo_change, interval=interval,
+                              mode=mode, fetch_interval=fetch_interval,
+                              scheduler=get_scheduler())
         watcher.start()
+        # Watched repositories are asked for merge bases over and over (GITTRACKER_COMMIT_GRAPH=true)
+        get_merge_base_service(repo_path).ensure_commit_graph()
         
         # Store in active watchers
         active_watchers[repo_path] = watcher
@@ -327,7 +492,8 @@ def start_watching():
         return jsonify({
             'status': 'started',
             'repo_path': repo_path,
-            'interval': interval
+            'interval': interval,
+            'mode': 'events' if watcher.uses_events else 'poll'
         })
     
     except Exception as e:
@@ -373,6 +539,58 @@ def stop_watching():
             'error': str(e)
         }), 500
 
+@app.route('/events', methods=['GET'])
+def stream_events():
+    """Stream conflict updates as Server-Sent Events"""
+    repo_path = request.args.get('repo_path')
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    last_event_id = int(last_event_id) if last_event_id and last_event_id.isdigit() else None
+    
+    subscription = broker.subscribe(repo_path, last_event_id=last_event_id)
+    
+    def generate():
+        try:
+            yield 'retry: 3000\n\n'
+            
+            # Fresh clients start from the cached state; reconnecting ones were replayed what they missed
+            if last_event_id is None:
+                if repo_path:
+                    states = [state for state in [repo_states.peek(repo_path)] if state is not None]
+                else:
+                    states = repo_states.values()
+                for state in states:
+                    snapshot = {
+                        'repo_path': state.path,
+                        'conflicts': [c.to_dict() for c in state.conflicts],
+                        'last_analyzed': state.last_analyzed
+                    }
+                    yield f"event: snapshot\ndata: {json.dumps(snapshot)}\n\n"
+            
+            for event in subscription.events():
+                # Comment lines keep proxies from closing an idle stream
+                yield event.to_sse() if event else ': keep-alive\n\n'
+            
+            # The client fell too far behind; it should reload /state and reconnect
+            yield 'event: resync\ndata: {}\n\n'
+        finally:
+            subscription.close()
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/watch/status', methods=['GET'])
+def watch_status():
+    """Get the shared watch scheduler's per-repository state"""
+    return jsonify(get_scheduler().stats())
+
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    """Get the repository state cache's counters and memory usage"""
+    return jsonify(dict(repo_states.stats(), versions=state_versions.stats()))
+
 @app.route("/status", methods=["GET"])
 def status():
     return jsonify({"status": "ready"}), 200
@@ -389,9 +607,10 @@ def get_repository_state():
         }), 400
     
     try:
-        # Check if we have a cached state
-        if repo_path in repo_states:
-            return jsonify(repo_states[repo_path].to_dict())
+        # Check if we have a cached state (or a persisted one from before a restart)
+        repo_state = _cached_state(repo_path)
+        if repo_state is not None:
+            return _state_response(repo_path, repo_state)
         
         # If not, analyze the repository
         return analyze_repository_internal(repo_path)
@@ -402,52 +621,348 @@ def get_repository_state():
             'error': str(e)
         }), 500
 
-def analyze_repository_internal(repo_path):
-    """Analyze a repository and return its state (helper function)"""
-    try:
-        # Initialize Git utilities
-        git = GitUtils(repo_path)
-        analyzer = ConflictAnalyzer(repo_path)
-        
-        # Get current branch
-        current_branch = git.get_current_branch()
-        
-        # Analyze all branches for conflicts
-        conflicts = analyzer.analyze_all_branches()
+def build_repository_state(repo_path: str, snapshot: Dict[str, Any],
+                           conflicts: List[Conflict]) -> RepositoryState:
+    """Build a RepositoryState from a ref snapshot (see GitUtils.get_ref_snapshot)"""
+    branch_infos = [
+        BranchInfo(
+            name=name,
+            tracking=info['tracking'],
+            ahead=info['ahead'],
+            behind=info['behind'],
+            last_commit=info['last_commit'],
+            last_commit_date=info['last_commit_date'],
+            author=info['author']
+        )
+        for name, info in sorted(snapshot['branches'].items())
+    ]
+    
+    return RepositoryState(
+        path=repo_path,
+        current_branch=snapshot['current_branch'],
+        branches=branch_infos,
+        conflicts=conflicts,
+        last_analyzed=datetime.datetime.now().isoformat()
+    )
+
+def _read_refs(repo_path: str, git: Optional[GitUtils] = None) -> Dict[str, Any]:
+    """Read a ref snapshot, stamped with the order it was read in (see _store_state)"""
+    snapshot = (git or GitUtils(repo_path)).get_ref_snapshot()
+    snapshot['read_seq'] = next(_snapshot_sequence)
+    return snapshot
+
+def _store_state(repo_path: str, repo_state: RepositoryState, snapshot: Dict[str, Any]) -> RepositoryState:
+    """
+    Cache a repository state and push what changed in its conflicts to /events subscribers
+    
+    Analyses finish in any order (full ones run as jobs, incremental ones inline),
+    so a state built from refs read before those of the cached state is dropped.
+    Returns the state that ends up cached.
+    """
+    read_seq = snapshot.get('read_seq')
+    with _store_lock:
+        latest_seq = _stored_seqs.get(repo_path)
+        if read_seq is not None and latest_seq is not None and read_seq < latest_seq:
+            cached = repo_states.peek(repo_path)
+            if cached is not None:
+                logger.info(f"Dropping an analysis of {repo_path} built from older refs than the cached one")
+                return cached
+        if read_seq is not None:
+            _stored_seqs[repo_path] = read_seq
         
-        # Get branch information
-        branches = git.get_all_branches()
-        branch_infos = []
+        previous_state = repo_states.peek(repo_path)
+        fingerprint = ref_fingerprint(snapshot)
+        state_versions.record(repo_path, repo_state, fingerprint)
+        repo_states.put(repo_path, repo_state)
+        if USE_SNAPSHOTS:
+            try:
+                _snapshot_store(repo_path).save(repo_state, fingerprint)
+            except (OSError, sqlite3.Error) as e:
+                logger.warning(f"Could not persist the analysis of {repo_path}: {e}")
+        broker.publish_conflict_delta(
+            repo_path,
+            previous_state.conflicts if previous_state else [],
+            repo_state.conflicts,
+            last_analyzed=repo_state.last_analyzed
+        )
+    return repo_state
+
+def _cached_state(repo_path: str) -> Optional[RepositoryState]:
+    """Get the cached state of a repository, warm-starting from its persisted snapshot on a miss"""
+    repo_state = repo_states.get(repo_path)
+    if repo_state is not None and MULTI_WORKER and USE_SNAPSHOTS:
+        try:
+            latest = _snapshot_store(repo_path).latest_fingerprint()
+        except (OSError, sqlite3.Error):
+            latest = None
+        if latest and not (repo_state.version or '').startswith(latest[:16]):
+            # Another worker analyzed the repository since
+            repo_state = None
+    if repo_state is None and USE_SNAPSHOTS:
+        repo_state = _restore_snapshot(repo_path)
+    return repo_state
+
+def _snapshot_store(repo_path: str) -> SnapshotStore:
+    """Get the snapshot store of a repository"""
+    store = _snapshot_stores.get(repo_path)
+    if store is None:
+        store = _snapshot_stores[repo_path] = SnapshotStore(GitUtils(repo_path).get_git_dir())
+    return store
+
+def _restore_snapshot(repo_path: str) -> Optional[RepositoryState]:
+    """
+    Cache the persisted analysis of a repository, checked against its current refs
+    
+    A snapshot of the current branch heads is as good as a fresh analysis. An
+    older one is served as is while a background analysis replaces it; the
+    update then reaches clients through /events and a new version.
+    """
+    try:
+        store = _snapshot_store(repo_path)
+        signature = store.signature()
+        if repo_path in _missing_snapshots and _missing_snapshots[repo_path] == signature:
+            # Looked for already, and nothing was saved since
+            return None
+        snapshot = _read_refs(repo_path)
+        fingerprint = ref_fingerprint(snapshot)
+        loaded = store.load(fingerprint) or store.load()
+    except Exception as e:
+        logger.warning(f"Could not load the persisted analysis of {repo_path}: {e}")
+        return None
+    if loaded is None:
+        _missing_snapshots[repo_path] = signature
+        return None
+    _missing_snapshots.pop(repo_path, None)
+    
+    stored_fingerprint, stored_state = loaded
+    if stored_fingerprint == fingerprint:
+        # Same branch heads, same conflicts; branch details are refreshed from the refs
+        repo_state = build_repository_state(repo_path, snapshot, stored_state.conflicts)
+        repo_state.last_analyzed = stored_state.last_analyzed
+    else:
+        repo_state = stored_state
+        repo_state.path = repo_path
+    
+    state_versions.record(repo_path, repo_state, stored_fingerprint)
+    repo_states.put(repo_path, repo_state)
+    logger.info(f"Restored the analysis of {repo_path} from its snapshot "
+                f"({'current' if stored_fingerprint == fingerprint else 'stale, revalidating'})")
+    
+    if stored_fingerprint != fingerprint:
+        # Cached first, so the fresh result cannot be overwritten by the stale one
+        submit_analysis(repo_path, snapshot)
+    return repo_state
+
+def _versioned_response(repo_path: str, repo_state: RepositoryState, kind: str,
+                        build: Callable[[], Dict[str, Any]],
+                        delta_fields: Optional[Callable[[], Dict[str, Any]]] = None):
+    """
+    Respond with a cached state, honouring If-None-Match and since=<version>
+    
+    Args:
+        kind: Names the representation ('state', 'conflicts:...') for the body cache;
+              None for representations not worth caching, such as pages
+        build: Produces the full payload
+        delta_fields: Extra fields to send along with a since= delta
+    """
+    version = repo_state.version
+    if version and request.if_none_match.contains_weak(version):
+        response = Response(status=304)
+        response.set_etag(version)
+        return response
+    
+    mimetype = negotiate(request.headers.get('Accept'))
+    since = request.args.get('since')
+    delta = state_versions.delta(repo_path, repo_state, since) if since and version else None
+    if delta is not None:
+        if delta_fields:
+            delta.update(delta_fields())
+        response = _encoded_response(delta, mimetype=mimetype)
+    else:
+        # Unknown or expired since= versions get the full payload
+        if kind is None:
+            body = encode(build(), mimetype)
+        else:
+            body = state_versions.body(repo_path, repo_state, kind, build, mimetype)
+        response = Response(body, mimetype=mimetype)
+        response.vary.add('Accept')
+    
+    if version:
+        response.set_etag(version)
+    return response
+
+def _conflict_projection(fields: Optional[str]) -> Callable[[Conflict], Dict[str, Any]]:
+    """Pick how conflicts are serialized: 'summary' leaves out content1/content2"""
+    if fields == 'summary':
+        return Conflict.to_summary_dict
+    return Conflict.to_dict
+
+def _encode_cursor(version: str, offset: int) -> str:
+    """Build an opaque pagination cursor"""
+    return base64.urlsafe_b64encode(f"{version}:{offset}".encode('utf-8')).decode('ascii')
+
+def _decode_cursor(cursor: str) -> Tuple[Optional[str], int]:
+    """Parse a pagination cursor into (version, offset); bad cursors come back stale"""
+    try:
+        version, _, offset = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8').rpartition(':')
+        return version, int(offset)
+    except (binascii.Error, UnicodeError, ValueError):
+        return None, 0
+
+def _stream_conflicts(pairs, on_done: Callable[[List[Conflict]], Dict[str, Any]], fields: Optional[str]):
+    """
+    Stream conflicts as NDJSON, one line per finished branch pair
+    
+    Args:
+        pairs: Iterator of (branch1, branch2, conflicts) from the analyzer
+        on_done: Receives every conflict once the analysis is over; returns the
+                 fields of the final 'done' line
+        fields: Conflict projection (see _conflict_projection)
+    """
+    project = _conflict_projection(fields)
+    
+    def generate():
+        conflicts = []
+        try:
+            for branch1, branch2, pair_conflicts in pairs:
+                conflicts.extend(pair_conflicts)
+                yield encode({
+                    'type': 'pair',
+                    'branch1': branch1,
+                    'branch2': branch2,
+                    'conflicts': [project(c) for c in pair_conflicts]
+                }) + b'\n'
+            yield encode(dict(on_done(conflicts), type='done', total=len(conflicts))) + b'\n'
+        except Exception as e:
+            # Headers are long gone; report the failure in-band
+            logger.error(f"Error streaming conflicts: {e}", exc_info=True)
+            yield encode({'type': 'error', 'error': str(e)}) + b'\n'
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+def _encoded_response(payload: Any, status: int = 200, mimetype: Optional[str] = None):
+    """Respond with a payload encoded as JSON (orjson when installed) or msgpack, per the Accept header"""
+    mimetype = mimetype or negotiate(request.headers.get('Accept'))
+    response = Response(encode(payload, mimetype), status=status, mimetype=mimetype)
+    response.vary.add('Accept')
+    return response
+
+def _state_response(repo_path: str, repo_state: RepositoryState):
+    """Respond with a full repository state (see _versioned_response)"""
+    return _versioned_response(repo_path, repo_state, 'state', repo_state.to_dict, lambda: {
+        'path': repo_state.path,
+        'current_branch': repo_state.current_branch,
+        'branches': [b.to_dict() for b in repo_state.branches],
+        'last_analyzed': repo_state.last_analyzed
+    })
+
+def analyze_repository_incremental(repo_path: str, changes: Dict[str, Any]) -> Optional[Job]:
+    """
+    Queue an update of a repository's cached state from a RepoWatcher change set
+    
+    Watcher callbacks run on the shared scheduler's few workers, which also
+    fetch and scan every other watched repository, so the update runs as a
+    background job and this returns it right away.
+    """
+    try:
+        snapshot = _read_refs(repo_path)
+        job, _ = get_job_manager().submit(
+            repo_path,
+            ref_fingerprint(snapshot),
+            lambda job: _update_state(repo_path, changes, snapshot, progress=job.update_progress)
+        )
+        return job
+    
+    except Exception as e:
+        logger.error(f"Error in analyze_repository_incremental: {e}", exc_info=True)
+        return None
+
+def _update_state(repo_path: str, changes: Dict[str, Any], snapshot: Dict[str, Any],
+                  progress: Optional[Callable[[str, int, int], None]] = None) -> RepositoryState:
+    """Re-analyze what a change set touched (everything, if nothing is cached) and cache the state"""
+    try:
+        previous_state = repo_states.peek(repo_path)
+        if previous_state is None:
+            # Nothing to build on yet
+            return run_analysis(repo_path, snapshot, progress=progress)
         
-        for branch in branches:
-            tracking_info = git.get_branch_tracking_info(branch)
-            
-            # Get commit history for branch (just the most recent commit)
-            commit_history = git.get_commit_history(branch, max_count=1)
-            last_commit = commit_history[0] if commit_history else None
-            
-            branch_info = BranchInfo(
-                name=branch,
-                tracking=tracking_info.get('tracking'),
-                last_commit=last_commit['hash'] if last_commit else None,
-                last_commit_date=last_commit['date'] if last_commit else None,
-                author=last_commit['author'] if last_commit else None
-            )
-            branch_infos.append(branch_info)
+        analyzer = ConflictAnalyzer(repo_path)
         
-        # Create repository state
-        repo_state = RepositoryState(
-            path=repo_path,
-            current_branch=current_branch,
-            branches=branch_infos,
-            conflicts=conflicts,
-            last_analyzed=datetime.datetime.now().isoformat()
+        # Only pairs whose heads moved are recomputed, and only for touched files
+        # The cached state may predate the watcher's baseline, so what moved is
+        # judged against the heads it was built from, not just this change set
+        conflicts = analyzer.analyze_incremental(
+            previous_state.conflicts, changes,
+            previous_branch=previous_state.current_branch, snapshot=snapshot,
+            previous_heads={branch.name: branch.last_commit for branch in previous_state.branches}
         )
         
-        # Cache the state
-        repo_states[repo_path] = repo_state
+        repo_state = build_repository_state(repo_path, snapshot, conflicts)
+        return _store_state(repo_path, repo_state, snapshot)
+    
+    except Exception as e:
+        logger.error(f"Error updating the state of {repo_path}: {e}", exc_info=True)
+        raise
+
+def run_analysis(repo_path: str, snapshot: Optional[Dict[str, Any]] = None,
+                 progress: Optional[Callable[[str, int, int], None]] = None) -> RepositoryState:
+    """Analyze every branch of a repository and cache the resulting state"""
+    git = GitUtils(repo_path)
+    analyzer = ConflictAnalyzer(repo_path)
+    # Speeds up the merge bases of later analyses, if enabled (GITTRACKER_COMMIT_GRAPH=true)
+    git.merge_bases.ensure_commit_graph()
+    
+    # Read every branch head, upstream and last commit in one go
+    snapshot = snapshot or _read_refs(repo_path, git)
+    
+    # Analyze all branches for conflicts
+    conflicts = analyzer.analyze_all_branches(snapshot, progress=progress)
+    
+    # Create and cache the repository state
+    repo_state = build_repository_state(repo_path, snapshot, conflicts)
+    return _store_state(repo_path, repo_state, snapshot)
+
+def stream_analysis(repo_path: str, fields: Optional[str] = None):
+    """Analyze a repository, streaming conflicts as NDJSON, and cache the resulting state"""
+    analyzer = ConflictAnalyzer(repo_path)
+    snapshot = _read_refs(repo_path)
+    
+    def on_done(conflicts: List[Conflict]) -> Dict[str, Any]:
+        repo_state = _store_state(repo_path, build_repository_state(repo_path, snapshot, conflicts), snapshot)
+        return {'version': repo_state.version, 'last_analyzed': repo_state.last_analyzed}
+    
+    return _stream_conflicts(analyzer.iter_all_branches(snapshot), on_done, fields)
+
+def submit_analysis(repo_path: str, snapshot: Optional[Dict[str, Any]] = None) -> Tuple[Job, bool]:
+    """Start a background analysis, joining one already running for the same ref snapshot"""
+    snapshot = snapshot or _read_refs(repo_path)
+    return get_job_manager().submit(
+        repo_path,
+        ref_fingerprint(snapshot),
+        lambda job: run_analysis(repo_path, snapshot, progress=job.update_progress)
+    )
+
+def _job_state(job: Job) -> Optional[RepositoryState]:
+    """
+    The repository state a finished job produced
+    
+    Jobs only hold their result weakly; once the state cache has let it go,
+    the repository's current state (at least as new) is served instead.
+    """
+    return job.result or _cached_state(job.repo_path)
+
+def analyze_repository_internal(repo_path):
+    """Analyze a repository and return its state (helper function)"""
+    try:
+        job, _ = submit_analysis(repo_path)
+        job.wait()
+        if job.status == Job.FAILED:
+            raise RuntimeError(job.error)
         
-        return jsonify(repo_state.to_dict())
+        repo_state = _job_state(job)
+        if repo_state is None:
+            raise RuntimeError(f"The analysis of {repo_path} finished but its state is no longer cached")
+        return _state_response(repo_path, repo_state)
     
     except Exception as e:
         logger.error(f"Error in analyze_repository_internal: {e}", exc_info=True)
@@ -455,9 +970,55 @@ def analyze_repository_internal(repo_path):
             'error': str(e)
         }), 500
 
-if __name__ == '__main__':
-    port = int(os.environ.get('PORT', 5000))
-    debug = os.environ.get('DEBUG', 'False').lower() == 'true'
+def shutdown():
+    """Stop every watcher and background pool (run when the server stops)"""
+    for repo_path, watcher in list(active_watchers.items()):
+        try:
+            watcher.stop()
+        except Exception as e:
+            logger.warning(f"Error stopping watcher for {repo_path}: {e}")
+    active_watchers.clear()
+    get_scheduler().stop()
+    get_job_manager().shutdown()
+    logger.info("GitTracker server stopped")
+
+def main():
+    """Console entry point: serve the API with a production WSGI server"""
+    global MULTI_WORKER
+    
+    parser = argparse.ArgumentParser(description='GitTracker server')
+    parser.add_argument('--host', default=os.environ.get('HOST', '0.0.0.0'))
+    parser.add_argument('--port', type=int, default=int(os.environ.get('PORT', 5000)))
+    parser.add_argument('--server', choices=['auto', 'waitress', 'gunicorn', 'werkzeug'],
+                        default=os.environ.get('GITTRACKER_SERVER', 'auto'),
+                        help='WSGI server (auto: gunicorn for several workers, else waitress, else werkzeug)')
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('GITTRACKER_WORKERS', 1)),
+                        help='Worker processes (gunicorn only)')
+    parser.add_argument('--threads', type=int, default=int(os.environ.get('GITTRACKER_THREADS', 16)),
+                        help='Requests handled at once per process')
+    parser.add_argument('--queue', type=int, default=int(os.environ.get('GITTRACKER_QUEUE', 64)),
+                        help='Requests allowed to wait for a thread before getting 503')
+    parser.add_argument('--max-streams', type=int,
+                        default=int(os.environ.get('GITTRACKER_MAX_STREAMS', 0)) or None,
+                        help='/events streams open at once before getting 503 (default: half of --threads)')
+    parser.add_argument('--workspace', help='Repository to warm up from its persisted analysis')
+    parser.add_argument('--debug', action='store_true',
+                        default=os.environ.get('DEBUG', 'False').lower() == 'true',
+                        help="Use Flask's development server with the debugger")
+    args = parser.parse_args()
     
-    logger.info(f"Starting GitTracker server on port {port}, debug={debug}")
-    app.run(host='0.0.0.0', port=port, debug=debug)
\ No newline at end of file
+    if args.debug:
+        logger.info(f"Starting GitTracker development server on port {args.port}")
+        app.run(host=args.host, port=args.port, debug=True)
+        return
+    
+    MULTI_WORKER = args.workers > 1
+    if args.workspace and USE_SNAPSHOTS and not MULTI_WORKER:
+        # Loaded in the background so the port opens right away
+        threading.Thread(target=_cached_state, args=(args.workspace,), daemon=True).start()
+    
+    serve(app, host=args.host, port=args.port, server=args.server, workers=args.workers,
+          threads=args.threads, queue=args.queue, max_streams=args.max_streams, on_shutdown=shutdown)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,235 @@
+import logging
+import signal
+import threading
+from typing import Callable, Iterable, Optional
+
+logger = logging.getLogger('GitTracker-serving')
+
+# Long-lived responses that must not count against the request limit
+STREAMING_PATHS = ('/events',)
+
+try:
+    import waitress
+except ImportError:
+    waitress = None
+
+try:
+    import gunicorn.app.base as gunicorn_base
+except ImportError:
+    gunicorn_base = None
+
+
+class ConcurrencyLimit:
+    """
+    WSGI middleware bounding concurrent requests and the queue in front of them
+
+    At most `max_active` requests run at once and at most `max_queued` wait
+    for a slot; anything beyond that is answered with 503 straight away
+    rather than piling up threads. Streams (Server-Sent Events) hold their
+    thread until the client leaves, so they do not take request slots but
+    have a cap of their own, `max_streams`.
+    """
+
+    def __init__(self, app: Callable, max_active: int, max_queued: int,
+                 exempt: Iterable[str] = STREAMING_PATHS, max_streams: Optional[int] = None):
+        """
+        Initialize the middleware
+
+        Args:
+            app: The WSGI application to protect
+            max_active: Requests processed at once
+            max_queued: Requests allowed to wait for a slot
+            exempt: Path prefixes of streams, which do not take request slots
+            max_streams: Streams open at once (unlimited if None)
+        """
+        self.app = app
+        self.max_active = max_active
+        self.max_queued = max_queued
+        self.exempt = tuple(exempt)
+        self.max_streams = max_streams
+        self.rejected = 0
+        self._streams = 0
+        self._slots = threading.BoundedSemaphore(max_active)
+        self._queued = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, environ, start_response):
+        if environ.get('PATH_INFO', '').startswith(self.exempt):
+            return self._stream(environ, start_response)
+
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                if self._queued >= self.max_queued:
+                    return self._reject(start_response)
+                self._queued += 1
+            try:
+                self._slots.acquire()
+            finally:
+                with self._lock:
+                    self._queued -= 1
+
+        try:
+            result = self.app(environ, start_response)
+        except BaseException:
+            self._slots.release()
+            raise
+        return _ReleasingIterable(result, self._slots.release)
+
+    def _stream(self, environ, start_response):
+        """Pass a stream through, unless max_streams are already open"""
+        if self.max_streams is None:
+            return self.app(environ, start_response)
+        with self._lock:
+            if self._streams >= self.max_streams:
+                return self._reject(start_response)
+            self._streams += 1
+        try:
+            result = self.app(environ, start_response)
+        except BaseException:
+            self._end_stream()
+            raise
+        return _ReleasingIterable(result, self._end_stream)
+
+    def _end_stream(self):
+        """Free the place of a stream that has ended"""
+        with self._lock:
+            self._streams -= 1
+
+    def _reject(self, start_response):
+        """Answer 503 (the caller holds the lock)"""
+        self.rejected += 1
+        start_response('503 Service Unavailable', [
+            ('Content-Type', 'application/json'), ('Retry-After', '1')
+        ])
+        return [b'{"error": "Server busy, retry shortly"}']
+
+
+class _ReleasingIterable:
+    """Response body that frees its request slot once the server is done sending it"""
+
+    def __init__(self, result: Iterable[bytes], release: Callable[[], None]):
+        self._result = result
+        self._release = release
+
+    def __iter__(self):
+        return iter(self._result)
+
+    def close(self):
+        try:
+            if hasattr(self._result, 'close'):
+                self._result.close()
+        finally:
+            self._release()
+
+
+def _install_signal_handlers(stop: Callable[[], None]):
+    """Turn SIGTERM (what editors and process managers send) into a clean stop, like Ctrl-C"""
+    def handler(signum, frame):
+        logger.info(f"Received signal {signum}, shutting down")
+        stop()
+
+    signal.signal(signal.SIGTERM, handler)
+    signal.signal(signal.SIGINT, handler)
+
+
+def _waitress_server(app: Callable, host: str, port: int, threads: int, queue: int, max_streams: int):
+    """Create (but do not run) a waitress server behind a concurrency limit"""
+    # Each open stream keeps a pool thread for itself, so the pool has room for
+    # max_streams of them on top of the threads serving requests
+    pool = threads + max_streams
+    return waitress.create_server(ConcurrencyLimit(app, threads, queue, max_streams=max_streams),
+                                  host=host, port=port, threads=pool,
+                                  connection_limit=pool + queue, backlog=queue)
+
+
+def _serve_waitress(app: Callable, host: str, port: int, threads: int, queue: int, max_streams: int):
+    """Serve with waitress: a fixed thread pool, no forking"""
+    server = _waitress_server(app, host, port, threads, queue, max_streams)
+
+    def stop():
+        # run() closes the server and its thread pool on SystemExit
+        raise SystemExit(0)
+
+    _install_signal_handlers(stop)
+    logger.info(f"Serving on http://{host}:{port} with waitress ({threads} threads, {max_streams} streams)")
+    server.run()
+
+
+def _serve_werkzeug(app: Callable, host: str, port: int, threads: int, queue: int, max_streams: int):
+    """Serve with werkzeug's threaded server behind a concurrency limit (always available with Flask)"""
+    from werkzeug.serving import make_server
+
+    server = make_server(host, port, ConcurrencyLimit(app, threads, queue, max_streams=max_streams),
+                         threaded=True)
+    server.daemon_threads = True
+    _install_signal_handlers(lambda: threading.Thread(target=server.shutdown, daemon=True).start())
+    logger.info(f"Serving on http://{host}:{port} with werkzeug ({threads} concurrent requests)")
+    server.serve_forever()
+    server.server_close()
+
+
+def _serve_gunicorn(app: Callable, host: str, port: int, workers: int, threads: int, queue: int,
+                    max_streams: int, on_shutdown: Callable[[], None]):
+    """Serve with gunicorn: preforked workers, each with a thread pool"""
+    class Application(gunicorn_base.BaseApplication):
+        def load_config(self):
+            self.cfg.set('bind', f'{host}:{port}')
+            self.cfg.set('workers', workers)
+            # Room for the open streams on top of the threads serving requests, as with waitress
+            self.cfg.set('threads', threads + max_streams)
+            self.cfg.set('worker_class', 'gthread')
+            self.cfg.set('backlog', queue)
+            # Long enough for a running analysis request to finish
+            self.cfg.set('graceful_timeout', 30)
+            self.cfg.set('timeout', 0)
+            self.cfg.set('worker_exit', lambda server, worker: on_shutdown())
+
+        def load(self):
+            return ConcurrencyLimit(app, threads, queue, max_streams=max_streams)
+
+    logger.info(f"Serving on http://{host}:{port} with gunicorn ({workers} workers x {threads} threads)")
+    Application().run()
+
+
+def serve(app: Callable, host: str = '127.0.0.1', port: int = 5000, server: str = 'auto',
+          workers: int = 1, threads: int = 16, queue: int = 64, max_streams: Optional[int] = None,
+          on_shutdown: Optional[Callable[[], None]] = None):
+    """
+    Serve a WSGI application until SIGTERM/SIGINT, then run on_shutdown
+
+    Args:
+        server: 'waitress', 'gunicorn', 'werkzeug' or 'auto' (gunicorn when several
+                workers are asked for, otherwise waitress, otherwise werkzeug)
+        workers: Processes (gunicorn only)
+        threads: Requests handled at once per process
+        queue: Requests allowed to wait beyond that before being refused
+        max_streams: /events streams open at once per process, each holding a thread
+                     of its own; more are refused with 503 (default: half of threads)
+        on_shutdown: Stops background work once the server stops (in each worker)
+    """
+    on_shutdown = on_shutdown or (lambda: None)
+    max_streams = max(1, threads // 2) if max_streams is None else max_streams
+    if server == 'auto':
+        if workers > 1 and gunicorn_base is not None:
+            server = 'gunicorn'
+        else:
+            server = 'waitress' if waitress is not None else 'werkzeug'
+    if server == 'waitress' and waitress is None:
+        raise RuntimeError('waitress is not installed (pip install waitress)')
+    if server == 'gunicorn' and gunicorn_base is None:
+        raise RuntimeError('gunicorn is not installed (pip install gunicorn)')
+    if workers > 1 and server != 'gunicorn':
+        logger.warning(f"{server} runs a single process; ignoring workers={workers}")
+
+    if server == 'gunicorn':
+        # Workers run on_shutdown themselves as they exit
+        _serve_gunicorn(app, host, port, workers, threads, queue, max_streams, on_shutdown)
+        return
+
+    try:
+        if server == 'waitress':
+            _serve_waitress(app, host, port, threads, queue, max_streams)
+        else:
+            _serve_werkzeug(app, host, port, threads, queue, max_streams)
+    finally:
+        on_shutdown()
@@ -0,0 +1,132 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Optional, Tuple
+
+from gittracker.models import RepositoryState
+
+logger = logging.getLogger('GitTracker-snapshots')
+
+# Bump when RepositoryState.to_dict changes shape; older snapshots are then ignored
+SNAPSHOT_FORMAT = 1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    fingerprint TEXT PRIMARY KEY,
+    format INTEGER NOT NULL,
+    saved REAL NOT NULL,
+    state BLOB NOT NULL
+)
+"""
+
+
+class SnapshotStore:
+    """
+    Analysis results persisted in the repository's git directory
+
+    Each snapshot is a RepositoryState (zlib-compressed to_dict JSON, read back
+    with from_dict) keyed by the fingerprint of the ref snapshot it was computed
+    from (see git_utils.ref_fingerprint). The database lives at
+    <git dir>/gittracker/snapshots.sqlite3 so it follows the repository around
+    and never shows up in the working tree.
+    """
+
+    def __init__(self, git_dir: str, keep: int = 4):
+        """
+        Initialize the store
+
+        Args:
+            git_dir: The repository's git directory (see GitUtils.get_git_dir)
+            keep: Snapshots kept per repository; older ones are deleted on save
+        """
+        self.path = os.path.join(git_dir, 'gittracker', 'snapshots.sqlite3')
+        self.keep = keep
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open the database, creating it if needed"""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=5.0)
+        connection.execute(_SCHEMA)
+        return connection
+
+    def save(self, repo_state: RepositoryState, fingerprint: str):
+        """Persist a state under the fingerprint of its ref snapshot"""
+        state = zlib.compress(json.dumps(repo_state.to_dict(), separators=(',', ':')).encode('utf-8'))
+        with self._lock:
+            connection = self._connect()
+            try:
+                with connection:
+                    connection.execute(
+                        'INSERT OR REPLACE INTO snapshots (fingerprint, format, saved, state) VALUES (?, ?, ?, ?)',
+                        (fingerprint, SNAPSHOT_FORMAT, time.time(), state)
+                    )
+                    connection.execute(
+                        'DELETE FROM snapshots WHERE fingerprint NOT IN '
+                        '(SELECT fingerprint FROM snapshots ORDER BY saved DESC LIMIT ?)',
+                        (self.keep,)
+                    )
+            finally:
+                connection.close()
+
+    def signature(self) -> Optional[Tuple[int, int]]:
+        """(mtime, size) of the database, which changes with every save; None if there is none"""
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def latest_fingerprint(self) -> Optional[str]:
+        """Fingerprint of the most recently saved snapshot, without loading it"""
+        if not os.path.exists(self.path):
+            return None
+        with self._lock:
+            connection = self._connect()
+            try:
+                row = connection.execute(
+                    'SELECT fingerprint FROM snapshots WHERE format = ? ORDER BY saved DESC LIMIT 1',
+                    (SNAPSHOT_FORMAT,)
+                ).fetchone()
+            finally:
+                connection.close()
+        return row[0] if row else None
+
+    def load(self, fingerprint: Optional[str] = None) -> Optional[Tuple[str, RepositoryState]]:
+        """
+        Load a snapshot
+
+        Args:
+            fingerprint: The ref snapshot wanted; None for the most recently saved one
+
+        Returns:
+            (fingerprint, state), or None if there is no usable snapshot
+        """
+        if not os.path.exists(self.path):
+            return None
+
+        query = 'SELECT fingerprint, state FROM snapshots WHERE format = ?'
+        params: tuple = (SNAPSHOT_FORMAT,)
+        if fingerprint is not None:
+            query += ' AND fingerprint = ?'
+            params += (fingerprint,)
+        query += ' ORDER BY saved DESC LIMIT 1'
+
+        with self._lock:
+            connection = self._connect()
+            try:
+                row = connection.execute(query, params).fetchone()
+            finally:
+                connection.close()
+        if row is None:
+            return None
+
+        try:
+            return row[0], RepositoryState.from_dict(json.loads(zlib.decompress(row[1])))
+        except (zlib.error, ValueError, TypeError) as e:
+            logger.warning(f"Ignoring unreadable snapshot {row[0]} in {self.path}: {e}")
+            return None
@@ -0,0 +1,203 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from gittracker.cache import _lines_size
+from gittracker.models import ContentRef, RepositoryState
+
+# Rough per-object costs used to estimate the memory held by a state
+_STATE_OVERHEAD = 512
+_CONFLICT_OVERHEAD = 400
+_BRANCH_OVERHEAD = 350
+
+
+def estimate_state_size(repo_state: RepositoryState) -> int:
+    """
+    Approximate memory held by a repository state
+
+    Every blob the conflicts reference is counted once, even though it may
+    also be shared with the analysis cache or another state.
+    """
+    size = _STATE_OVERHEAD
+    blobs = {}
+    for conflict in repo_state.conflicts:
+        size += _CONFLICT_OVERHEAD + len(conflict.file) + len(conflict.id)
+        for name in ('_content1', '_content2'):
+            content = conflict.__dict__.get(name)
+            if isinstance(content, ContentRef):
+                blobs[id(content.lines)] = content.lines
+            elif content:
+                size += len(content)
+    size += sum(_lines_size(lines) for lines in blobs.values())
+    size += sum(_BRANCH_OVERHEAD + len(b.name or '') + len(b.author or '') for b in repo_state.branches)
+    return size
+
+
+class StateCache:
+    """
+    Analyzed repository states, bounded by entry count, memory and age
+
+    Least recently used states are evicted once either budget is exceeded,
+    and states not read or written for `ttl` seconds expire. Pinned
+    repositories (those being watched) are never evicted, so the budgets
+    are only approximate while many repositories are watched.
+    """
+
+    def __init__(self, max_entries: int = 64, max_bytes: int = 256 * 1024 * 1024, ttl: float = 3600.0,
+                 is_pinned: Optional[Callable[[str], bool]] = None,
+                 on_evict: Optional[Callable[[str], None]] = None):
+        """
+        Initialize the cache
+
+        Args:
+            max_entries: Repositories kept at most (0 for no limit)
+            max_bytes: Approximate memory budget (see estimate_state_size)
+            ttl: Seconds an unused state is kept (0 to never expire)
+            is_pinned: Says whether a repository must be kept, e.g. because it is watched
+            on_evict: Called with the repository path after its state is dropped
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.is_pinned = is_pinned or (lambda repo_path: False)
+        self.on_evict = on_evict
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        # repo_path -> (state, size, last used)
+        self._entries: 'OrderedDict[str, Tuple[RepositoryState, int, float]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, repo_path: str) -> Optional[RepositoryState]:
+        """Get the cached state of a repository, or None on a miss"""
+        now = time.monotonic()
+        dropped = []
+        with self._lock:
+            entry = self._entries.get(repo_path)
+            if entry is not None and self._expired(repo_path, entry, now):
+                self._drop(repo_path)
+                self.expirations += 1
+                dropped.append(repo_path)
+                entry = None
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._entries[repo_path] = (entry[0], entry[1], now)
+                self._entries.move_to_end(repo_path)
+        self._notify(dropped)
+        return entry[0] if entry else None
+
+    def put(self, repo_path: str, repo_state: RepositoryState):
+        """Cache the state of a repository, evicting others beyond the budgets"""
+        size = estimate_state_size(repo_state)
+        now = time.monotonic()
+        with self._lock:
+            old = self._entries.pop(repo_path, None)
+            if old is not None:
+                self.current_bytes -= old[1]
+            self._entries[repo_path] = (repo_state, size, now)
+            self.current_bytes += size
+            dropped = self._evict(now, keep=repo_path)
+        self._notify(dropped)
+
+    def pop(self, repo_path: str) -> Optional[RepositoryState]:
+        """Forget the state of a repository"""
+        with self._lock:
+            entry = self._entries.get(repo_path)
+            if entry is not None:
+                self._drop(repo_path)
+        if entry is not None:
+            self._notify([repo_path])
+        return entry[0] if entry else None
+
+    def __contains__(self, repo_path: str) -> bool:
+        return self.peek(repo_path) is not None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def peek(self, repo_path: str) -> Optional[RepositoryState]:
+        """Get a cached state without counting a hit or refreshing it"""
+        with self._lock:
+            entry = self._entries.get(repo_path)
+            return entry[0] if entry else None
+
+    def keys(self) -> List[str]:
+        """Paths of the cached repositories"""
+        with self._lock:
+            return list(self._entries)
+
+    def values(self) -> List[RepositoryState]:
+        """The cached states (not counted as hits)"""
+        with self._lock:
+            return [entry[0] for entry in self._entries.values()]
+
+    def prune(self) -> int:
+        """Drop expired states now instead of on the next access; returns how many were dropped"""
+        with self._lock:
+            dropped = self._evict(time.monotonic())
+        self._notify(dropped)
+        return len(dropped)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get hit/miss/eviction counters and memory usage"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'bytes': self.current_bytes,
+                'max_bytes': self.max_bytes,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'pinned': sum(1 for repo_path in self._entries if self.is_pinned(repo_path)),
+                'repositories': {
+                    repo_path: {'bytes': size, 'conflicts': len(state.conflicts)}
+                    for repo_path, (state, size, _) in self._entries.items()
+                }
+            }
+
+    def _expired(self, repo_path: str, entry: Tuple[RepositoryState, int, float], now: float) -> bool:
+        """Whether an entry outlived the TTL (caller holds the lock)"""
+        return bool(self.ttl) and now - entry[2] > self.ttl and not self.is_pinned(repo_path)
+
+    def _drop(self, repo_path: str):
+        """Remove an entry (caller holds the lock)"""
+        _, size, _ = self._entries.pop(repo_path)
+        self.current_bytes -= size
+
+    def _evict(self, now: float, keep: Optional[str] = None) -> List[str]:
+        """Drop expired entries, then the least recently used until within budget (caller holds the lock)"""
+        dropped = []
+        for repo_path, entry in list(self._entries.items()):
+            if repo_path != keep and self._expired(repo_path, entry, now):
+                self._drop(repo_path)
+                self.expirations += 1
+                dropped.append(repo_path)
+
+        def over_budget():
+            return ((self.max_entries and len(self._entries) > self.max_entries)
+                    or self.current_bytes > self.max_bytes)
+
+        if over_budget():
+            for repo_path in list(self._entries):
+                if not over_budget():
+                    break
+                if repo_path == keep or self.is_pinned(repo_path):
+                    continue
+                self._drop(repo_path)
+                self.evictions += 1
+                dropped.append(repo_path)
+        return dropped
+
+    def _notify(self, dropped: List[str]):
+        """Report dropped repositories outside the lock"""
+        if self.on_evict:
+            for repo_path in dropped:
+                self.on_evict(repo_path)
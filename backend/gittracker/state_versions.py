@@ -0,0 +1,175 @@
+import itertools
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from gittracker.models import Conflict, RepositoryState
+from gittracker.serialization import JSON, encode
+
+
+def _signature(conflict: Conflict) -> int:
+    """Stands in for a conflict's content when telling whether it changed"""
+    return hash(conflict.to_row())
+
+
+class _Version:
+    """
+    One stored version of a repository state
+
+    Past versions keep only conflict ids and content signatures: conflicts
+    hold references into blob lines, which would outlive the state otherwise.
+    Serialized bodies and the id index exist for the current version only.
+    """
+
+    __slots__ = ('version', 'signatures', 'bodies', 'index')
+
+    def __init__(self, version: str, conflicts: List[Conflict]):
+        self.version = version
+        self.signatures: Dict[str, int] = {c.id: _signature(c) for c in conflicts}
+        self.bodies: Dict[Tuple[str, str], bytes] = {}
+        self.index: Optional[Dict[str, Conflict]] = None
+
+
+class StateVersions:
+    """
+    Version stamps and recent history for cached repository states
+
+    A version is the ref snapshot fingerprint plus a process-wide analysis
+    generation, so it changes whenever refs move or an analysis runs again.
+    The last few versions of each repository are kept to answer
+    `since=<version>` requests with just what changed in the conflicts.
+    Encoded bodies of current versions are kept within `max_body_bytes`,
+    least recently used first out.
+    """
+
+    def __init__(self, max_versions: int = 8, max_body_bytes: int = 64 * 1024 * 1024):
+        """
+        Initialize the history
+
+        Args:
+            max_versions: Versions kept per repository for delta requests
+            max_body_bytes: Memory budget of the encoded bodies of all repositories
+        """
+        self.max_versions = max_versions
+        self.max_body_bytes = max_body_bytes
+        self.body_bytes = 0
+        self._generation = itertools.count(1)
+        self._history: Dict[str, 'OrderedDict[str, _Version]'] = {}
+        # (repo_path, version, kind, mimetype) of every cached body, least recently used first
+        self._bodies: 'OrderedDict[Tuple[str, str, str, str], int]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def record(self, repo_path: str, repo_state: RepositoryState, fingerprint: str) -> str:
+        """Stamp a newly cached state with its version and remember it"""
+        with self._lock:
+            version = f"{fingerprint[:16]}-{next(self._generation)}"
+            repo_state.version = version
+            history = self._history.setdefault(repo_path, OrderedDict())
+            for older in history.values():
+                # Only the current version is ever served in full or looked up by id
+                self._drop_bodies(repo_path, older)
+                older.index = None
+            history[version] = _Version(version, repo_state.conflicts)
+            while len(history) > self.max_versions:
+                history.popitem(last=False)
+        return version
+
+    def forget(self, repo_path: str):
+        """Drop the history of a repository whose state left the cache"""
+        with self._lock:
+            for entry in self._history.pop(repo_path, {}).values():
+                self._drop_bodies(repo_path, entry)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get the size of the history and of the cached bodies"""
+        with self._lock:
+            return {
+                'repositories': len(self._history),
+                'versions': sum(len(history) for history in self._history.values()),
+                'bodies': len(self._bodies),
+                'body_bytes': self.body_bytes,
+                'max_body_bytes': self.max_body_bytes
+            }
+
+    def delta(self, repo_path: str, current: RepositoryState, since: str) -> Optional[Dict[str, Any]]:
+        """
+        Describe how the conflicts changed between `since` and the current version
+
+        Returns None if `since` is unknown or expired, in which case the caller
+        should send the full state.
+        """
+        with self._lock:
+            history = self._history.get(repo_path, {})
+            previous = history.get(since)
+            entry = history.get(current.version)
+        if previous is None:
+            return None
+
+        old = previous.signatures
+        new = entry.signatures if entry is not None else {c.id: _signature(c) for c in current.conflicts}
+        return {
+            'version': current.version,
+            'since': since,
+            'added': [c.to_dict() for c in current.conflicts if c.id not in old],
+            'removed': [conflict_id for conflict_id in old if conflict_id not in new],
+            'changed': [c.to_dict() for c in current.conflicts if c.id in old and old[c.id] != new[c.id]]
+        }
+
+    def find_conflict(self, repo_path: str, repo_state: RepositoryState, conflict_id: str) -> Optional[Conflict]:
+        """Look up a conflict of a state by id (indexed once per version)"""
+        with self._lock:
+            entry = self._history.get(repo_path, {}).get(repo_state.version)
+            if entry is None:
+                return next((c for c in repo_state.conflicts if c.id == conflict_id), None)
+            if entry.index is None:
+                entry.index = {c.id: c for c in repo_state.conflicts}
+            return entry.index.get(conflict_id)
+
+    def body(self, repo_path: str, repo_state: RepositoryState, kind: str,
+             build: Callable[[], Any], mimetype: str = JSON) -> bytes:
+        """
+        Get the encoded body of a representation of a state, serializing it only once per version
+
+        Args:
+            kind: Names the representation, e.g. 'state' or 'conflicts'
+            build: Produces the payload on a miss
+            mimetype: Encoding negotiated with the client (see serialization.negotiate)
+        """
+        key = (kind, mimetype)
+        lru_key = (repo_path, repo_state.version, kind, mimetype)
+        with self._lock:
+            entry = self._history.get(repo_path, {}).get(repo_state.version)
+            body = entry.bodies.get(key) if entry else None
+            if body is not None:
+                self._bodies.move_to_end(lru_key)
+                return body
+
+        body = encode(build(), mimetype)
+        if entry is None or len(body) > self.max_body_bytes:
+            return body
+        with self._lock:
+            if self._history.get(repo_path, {}).get(repo_state.version) is not entry or key in entry.bodies:
+                # Superseded (or cached by another request) meanwhile
+                return body
+            entry.bodies[key] = body
+            self._bodies[lru_key] = len(body)
+            self.body_bytes += len(body)
+            while self.body_bytes > self.max_body_bytes:
+                (old_repo, old_version, old_kind, old_mimetype), size = self._bodies.popitem(last=False)
+                self.body_bytes -= size
+                old_entry = self._history.get(old_repo, {}).get(old_version)
+                if old_entry is not None:
+                    old_entry.bodies.pop((old_kind, old_mimetype), None)
+        return body
+
+    def _drop_bodies(self, repo_path: str, entry: _Version):
+        """Forget the encoded bodies of a version (caller holds the lock)"""
+        for kind, mimetype in entry.bodies:
+            self.body_bytes -= self._bodies.pop((repo_path, entry.version, kind, mimetype), 0)
+        entry.bodies.clear()
+
+
+state_versions = StateVersions(
+    max_body_bytes=int(os.environ.get('GITTRACKER_BODY_CACHE_MB', 64)) * 1024 * 1024
+)
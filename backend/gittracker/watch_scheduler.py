@@ -0,0 +1,266 @@
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from gittracker.fs_events import RefEventMonitor, inotify_available
+
+logger = logging.getLogger('GitTracker-scheduler')
+
+# Repositories with a change detected this recently are served first
+ACTIVE_WINDOW = 600.0
+
+
+class _WatchedRepo:
+    """Scheduling state for one watched repository"""
+
+    def __init__(self, watcher, events: bool):
+        self.watcher = watcher
+        self.events = events
+        self.failures = 0
+        self.last_activity = 0.0
+        self.running = False
+        self.next_fetch = 0.0
+        self.scan_due: Optional[float] = None
+        self.scan_deadline: Optional[float] = None
+
+    @property
+    def fetch_interval(self) -> float:
+        """Seconds between fetches (in polling mode, between fetch-and-scan rounds)"""
+        return self.watcher.fetch_interval if self.events else self.watcher.interval
+
+    def due(self) -> Optional[float]:
+        """When this repository next needs a worker, or None if never"""
+        times = [t for t in (self.scan_due, self.next_fetch if self.fetch_interval > 0 else None) if t is not None]
+        return min(times) if times else None
+
+
+class WatchScheduler:
+    """
+    Multiplexes many RepoWatchers over one scheduler thread
+
+    Fetches and ref scans run on a bounded worker pool. Fetch times are
+    jittered so repositories do not fetch in lockstep, failing repositories
+    back off exponentially, and repositories with recent activity go first
+    when more work is due than there are workers. Ref changes are picked up
+    through a single shared inotify instance where available; other
+    repositories fall back to scanning after every fetch.
+    """
+
+    def __init__(self, max_workers: int = 4, jitter: float = 0.1, max_backoff: float = 1800.0):
+        """
+        Initialize the scheduler
+
+        Args:
+            max_workers: Maximum number of fetches/scans running at once
+            jitter: Random spread applied to every fetch interval (fraction of the interval)
+            max_backoff: Longest delay (in seconds) between fetches of a failing repository
+        """
+        self.max_workers = max_workers
+        self.jitter = jitter
+        self.max_backoff = max_backoff
+        self._repos: Dict[str, _WatchedRepo] = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._thread: Optional[threading.Thread] = None
+        self._running_count = 0
+        self.monitor: Optional[RefEventMonitor] = None
+
+    def start(self):
+        """Start the scheduler thread (called automatically by add())"""
+        with self._lock:
+            if self._thread:
+                return
+            self._stopped.clear()
+            if inotify_available():
+                try:
+                    self.monitor = RefEventMonitor()
+                except OSError as e:
+                    logger.warning(f"Cannot create inotify instance, repositories will be polled: {e}")
+            self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='gittracker-watch')
+            self._thread = threading.Thread(target=self._loop, name='gittracker-scheduler', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop scheduling; running fetches/scans finish in the background"""
+        self._stopped.set()
+        self._wake()
+        if self._thread:
+            self._thread.join(timeout=5.0)
+        with self._lock:
+            self._thread = None
+            if self._pool:
+                self._pool.shutdown(wait=False)
+                self._pool = None
+            if self.monitor:
+                self.monitor.close()
+                self.monitor = None
+
+    def add(self, watcher):
+        """Start scheduling a RepoWatcher (its state must already be captured)"""
+        self.start()
+        events = False
+        if watcher.mode != 'poll' and self.monitor:
+            try:
+                self.monitor.add(watcher.repo_path, watcher.git.get_git_dir())
+                events = True
+            except OSError as e:
+                logger.warning(f"Cannot watch {watcher.repo_path} for events, polling it instead: {e}")
+
+        with self._lock:
+            repo = _WatchedRepo(watcher, events)
+            # Spread the first fetches out instead of fetching everything at once
+            repo.next_fetch = time.monotonic() + random.uniform(0, repo.fetch_interval * self.jitter)
+            self._repos[watcher.repo_path] = repo
+        self._wake()
+        return events
+
+    def remove(self, watcher):
+        """Stop scheduling a RepoWatcher"""
+        with self._lock:
+            self._repos.pop(watcher.repo_path, None)
+        if self.monitor:
+            self.monitor.remove(watcher.repo_path)
+        self._wake()
+
+    def stats(self) -> Dict:
+        """Get the scheduling state of every watched repository"""
+        now = time.monotonic()
+        with self._lock:
+            return {
+                'max_workers': self.max_workers,
+                'running': self._running_count,
+                'events': bool(self.monitor),
+                'repositories': {
+                    path: {
+                        'events': repo.events,
+                        'failures': repo.failures,
+                        'running': repo.running,
+                        'next_fetch_in': round(repo.next_fetch - now, 3) if repo.fetch_interval > 0 else None,
+                        'idle_for': round(now - repo.last_activity, 3) if repo.last_activity else None
+                    }
+                    for path, repo in self._repos.items()
+                }
+            }
+
+    def _wake(self):
+        """Interrupt the scheduler's wait so it re-plans"""
+        self._wakeup.set()
+        monitor = self.monitor
+        if monitor:
+            monitor.wake()
+
+    def _loop(self):
+        """Scheduler thread: dispatch due work, then sleep until the next deadline or ref event"""
+        while not self._stopped.is_set():
+            self._wakeup.clear()
+            try:
+                timeout = self._dispatch()
+            except Exception as e:
+                logger.error(f"Error in watch scheduler: {e}", exc_info=True)
+                timeout = 1.0
+
+            monitor = self.monitor
+            if monitor:
+                for repo_path in monitor.wait(timeout):
+                    self._on_ref_event(repo_path)
+            else:
+                self._wakeup.wait(timeout)
+
+    def _on_ref_event(self, repo_path: str):
+        """Schedule a debounced ref scan after inotify reported a change"""
+        with self._lock:
+            repo = self._repos.get(repo_path)
+            if repo is None:
+                return
+            now = time.monotonic()
+            debounce = repo.watcher.debounce
+            if repo.scan_deadline is None:
+                # Bursts are coalesced, but a continuous stream still gets scanned eventually
+                repo.scan_deadline = now + max(debounce * 10, 1.0)
+            repo.scan_due = min(now + debounce, repo.scan_deadline)
+
+    def _dispatch(self) -> Optional[float]:
+        """Hand due work to free workers; return how long to sleep"""
+        now = time.monotonic()
+        with self._lock:
+            ready: List[_WatchedRepo] = []
+            next_due = None
+            for repo in self._repos.values():
+                if repo.running:
+                    continue
+                due = repo.due()
+                if due is None:
+                    continue
+                if due <= now:
+                    ready.append(repo)
+                elif next_due is None or due < next_due:
+                    next_due = due
+
+            # Recently active repositories first, then whoever has waited longest
+            ready.sort(key=lambda repo: (now - repo.last_activity > ACTIVE_WINDOW, repo.due()))
+
+            free = self.max_workers - self._running_count
+            for repo in ready[:free]:
+                fetch = repo.fetch_interval > 0 and repo.next_fetch <= now
+                scan = repo.scan_due is not None and repo.scan_due <= now
+                if scan:
+                    repo.scan_due = repo.scan_deadline = None
+                repo.running = True
+                self._running_count += 1
+                self._pool.submit(self._run, repo, fetch, scan)
+
+            if len(ready) > free:
+                # Woken again as soon as a worker finishes
+                return None
+
+        return None if next_due is None else max(0.0, next_due - now)
+
+    def _run(self, repo: _WatchedRepo, fetch: bool, scan: bool):
+        """Worker: fetch and/or scan one repository, then reschedule it"""
+        watcher = repo.watcher
+        ok = True
+        try:
+            if fetch:
+                ok = watcher.git.fetch_latest_changes()
+            # Without inotify a fetch is only noticed by scanning right after it
+            if scan or (fetch and not repo.events):
+                if watcher.check_for_changes():
+                    repo.last_activity = time.monotonic()
+        except Exception as e:
+            logger.error(f"Error watching {watcher.repo_path}: {e}")
+            ok = False
+
+        with self._lock:
+            repo.running = False
+            self._running_count -= 1
+            if not ok:
+                repo.failures += 1
+            elif fetch:
+                # Only a successful fetch proves the remote is reachable again
+                repo.failures = 0
+            if fetch or not ok:
+                interval = repo.fetch_interval or watcher.interval
+                if repo.failures:
+                    interval = min(interval * 2 ** min(repo.failures, 16), max(self.max_backoff, interval))
+                repo.next_fetch = time.monotonic() + interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+        self._wake()
+
+
+_scheduler: Optional[WatchScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> WatchScheduler:
+    """Get the process-wide scheduler configured via GITTRACKER_WATCH_WORKERS"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            max_workers = int(os.environ.get('GITTRACKER_WATCH_WORKERS', 4))
+            _scheduler = WatchScheduler(max_workers=max_workers)
+        return _scheduler
@@ -1,16 +1,22 @@
-from setuptools import setup, find_packages
+from setuptools import setup, find_namespace_packages
 
 setup(
     name="GitTracker",
     version="0.1.0",
-    packages=find_packages(),
+    # gittracker has no __init__.py
+    packages=find_namespace_packages(include=["gittracker", "gittracker.*"]),
     install_requires=[
         "flask>=2.0.0",
         "flask-cors>=3.0.0",
         "openai>=1.0.0",
         "google-generativeai>=0.3.0",
         "python-dotenv>=0.19.0",
+        "waitress>=2.0.0",
     ],
+    extras_require={
+        # Several worker processes (GitTracker-server --workers N)
+        "gunicorn": ["gunicorn>=20.1.0"],
+    },
     author="GitTracker Team",
     author_email="info@GitTracker.example.com",
     description="Git conflict pre-warning system",
@@ -27,7 +33,7 @@ setup(
     python_requires=">=3.8",
     entry_points={
         "console_scripts": [
-            "GitTracker-server=GitTracker.server:main",
+            "GitTracker-server=gittracker.server:main",
         ],
     },
 )
\ No newline at end of file
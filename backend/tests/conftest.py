@@ -0,0 +1,48 @@
+import os
+import subprocess
+from typing import Dict
+
+import pytest
+
+
+class Repo:
+    """A throwaway Git repository driven through the git CLI"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.git('init', '-q', '-b', 'main')
+
+    def git(self, *args: str) -> str:
+        """Run git in the repository and return its stripped output"""
+        return subprocess.run(['git', *args], cwd=self.path, check=True,
+                              capture_output=True, text=True).stdout.strip()
+
+    def commit(self, files: Dict[str, object], message: str = 'change') -> str:
+        """Write files (str or bytes content) and commit them; returns the commit SHA"""
+        for name, content in files.items():
+            full_path = os.path.join(self.path, name)
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            mode = 'wb' if isinstance(content, bytes) else 'w'
+            with open(full_path, mode) as f:
+                f.write(content)
+        self.git('add', '-A')
+        self.git('commit', '-q', '-m', message)
+        return self.git('rev-parse', 'HEAD')
+
+    def head(self, branch: str) -> str:
+        """The commit a branch points at"""
+        return self.git('rev-parse', branch)
+
+
+@pytest.fixture
+def repo(tmp_path, monkeypatch):
+    for var in ('GIT_AUTHOR', 'GIT_COMMITTER'):
+        monkeypatch.setenv(f'{var}_NAME', 'Test')
+        monkeypatch.setenv(f'{var}_EMAIL', 'test@example.com')
+    monkeypatch.setenv('GITTRACKER_COMMIT_GRAPH', 'false')
+    return Repo(str(tmp_path))
+
+
+def lines(n: int, **changed: str) -> str:
+    """A file of n numbered lines, with line<k>=text overrides"""
+    return ''.join(changed.get(f'line{i}', f'line {i}') + '\n' for i in range(1, n + 1))
@@ -0,0 +1,55 @@
+import subprocess
+
+import pytest
+
+from gittracker.cat_file import CatFilePool, CatFileProcess
+from gittracker.git_command import GitTimeoutError
+
+
+def _hang(worker: CatFileProcess):
+    """Swap the worker's git for a process that reads requests but never answers"""
+    worker.close()
+    worker.process = subprocess.Popen(['sleep', '30'], stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+
+
+def test_query_times_out_on_a_hung_process(repo):
+    blob = repo.commit({'a.txt': 'a\n'}) + ':a.txt'
+    worker = CatFileProcess(repo.path)
+    _hang(worker)
+
+    with pytest.raises(GitTimeoutError):
+        worker.query([blob], timeout=0.2)
+    assert worker.process.wait(timeout=5) != 0  # Killed by the watchdog
+    worker.close()
+
+
+def test_pool_restarts_a_worker_after_any_failure(repo, monkeypatch):
+    blob = repo.commit({'a.txt': 'a\n'}) + ':a.txt'
+    pool = CatFilePool(repo.path, max_processes=1)
+    worker = pool._acquire(False)
+    pool._release(worker)
+    _hang(worker)
+    hung = worker.process
+
+    monkeypatch.setattr('gittracker.cat_file.DEFAULT_TIMEOUT', 0.2)
+    with pytest.raises(GitTimeoutError):
+        pool.read_object(blob)
+    assert worker.process is not hung
+
+    # The fresh process answers instead of the hung one
+    assert pool.read_object(blob) == b'a\n'
+    pool.close()
+
+
+def test_waiting_for_a_busy_pool_times_out(repo, monkeypatch):
+    pool = CatFilePool(repo.path, max_processes=1)
+    worker = pool._acquire(False)
+    monkeypatch.setattr('gittracker.cat_file.DEFAULT_TIMEOUT', 0.2)
+
+    with pytest.raises(GitTimeoutError):
+        pool._acquire(False)
+
+    pool._release(worker)
+    assert pool._acquire(False) is worker
+    pool._release(worker)
+    pool.close()
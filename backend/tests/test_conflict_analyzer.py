@@ -0,0 +1,62 @@
+from conftest import lines
+
+from gittracker.conflict_analyzer import ConflictAnalyzer
+
+
+def _key(conflicts):
+    return sorted((c.file, c.branch1, c.branch2, c.line_start, c.line_end) for c in conflicts)
+
+
+def _heads(repo, branches):
+    return {branch: repo.head(branch) for branch in branches}
+
+
+def test_incremental_catches_branches_moved_before_the_watcher_started(repo):
+    branches = ['main', 'feature/3', 'feature/4']
+    repo.commit({'a.txt': lines(30)}, 'base')
+    for branch in branches[1:]:
+        repo.git('branch', branch)
+    repo.commit({'a.txt': lines(30, line2='main')})
+    repo.git('checkout', '-q', 'feature/3')
+    repo.commit({'a.txt': lines(30, line15='three')})
+    repo.git('checkout', '-q', 'feature/4')
+    repo.commit({'a.txt': lines(30, line25='four')})
+    repo.git('checkout', '-q', 'main')
+
+    analyzer = ConflictAnalyzer(repo.path, backend='heuristic')
+    previous = analyzer.analyze_all_branches()
+    previous_heads = _heads(repo, branches)
+    assert previous == []
+
+    # feature/3 moves before the watcher takes its baseline...
+    repo.git('checkout', '-q', 'feature/3')
+    repo.commit({'a.txt': lines(30, line2='three', line15='three')})
+    # ...so the watcher only reports feature/4 moving
+    repo.git('checkout', '-q', 'feature/4')
+    old4 = repo.head('feature/4')
+    repo.commit({'a.txt': lines(30, line25='four again')})
+    repo.git('checkout', '-q', 'main')
+    changes = {'updated_branches': [{'branch': 'feature/4', 'old_commit': old4}], 'new_branches': []}
+
+    incremental = analyzer.analyze_incremental(previous, changes, previous_branch='main',
+                                               previous_heads=previous_heads)
+    full = ConflictAnalyzer(repo.path, backend='heuristic').analyze_all_branches()
+
+    assert [c.branch2 for c in full] == ['feature/3']
+    assert _key(incremental) == _key(full)
+
+
+def test_hunks_backend_reports_binary_files_changed_on_both_branches(repo):
+    binary = b''.join(b'\x00\x01 chunk %d\n' % i for i in range(20))
+    repo.commit({'b.bin': binary, 'a.txt': lines(30)}, 'base')
+    repo.git('branch', 'feature')
+    repo.commit({'b.bin': binary.replace(b'chunk 5', b'main 5'), 'a.txt': lines(30, line2='main')})
+    repo.git('checkout', '-q', 'feature')
+    repo.commit({'b.bin': binary.replace(b'chunk 5', b'feature 5'), 'a.txt': lines(30, line25='feature')})
+    repo.git('checkout', '-q', 'main')
+
+    heuristic = ConflictAnalyzer(repo.path, backend='heuristic').analyze_all_branches()
+    hunks = ConflictAnalyzer(repo.path, backend='hunks').analyze_all_branches()
+
+    assert [c.file for c in heuristic] == ['b.bin']
+    assert _key(hunks) == _key(heuristic)
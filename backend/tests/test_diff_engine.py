@@ -0,0 +1,86 @@
+import random
+from difflib import SequenceMatcher
+
+import pytest
+
+from gittracker.diff_engine import MyersDiffEngine
+
+
+def _lcs_length(a, b):
+    """Longest common subsequence by dynamic programming"""
+    row = [0] * (len(b) + 1)
+    for x in a:
+        previous_diagonal = 0
+        for j, y in enumerate(b, 1):
+            previous_diagonal, row[j] = row[j], previous_diagonal + 1 if x == y else max(row[j], row[j - 1])
+    return row[-1]
+
+
+def _random_lines(rng, n, alphabet):
+    return [rng.choice(alphabet) for _ in range(n)]
+
+
+def _check_opcodes(opcodes, a, b):
+    """Opcodes must tile both sides in order and turn a into b; returns the matched line count"""
+    i = j = 0
+    matched = 0
+    rebuilt = []
+    for tag, i1, i2, j1, j2 in opcodes:
+        assert (i1, j1) == (i, j)
+        if tag == 'equal':
+            assert a[i1:i2] == b[j1:j2]
+            matched += i2 - i1
+        elif tag == 'delete':
+            assert i2 > i1 and j2 == j1
+        elif tag == 'insert':
+            assert i2 == i1 and j2 > j1
+        else:
+            assert tag == 'replace' and i2 > i1 and j2 > j1
+        rebuilt.extend(b[j1:j2])
+        i, j = i2, j2
+    assert (i, j) == (len(a), len(b))
+    assert rebuilt == b
+    return matched
+
+
+@pytest.mark.parametrize('seed', range(200))
+def test_myers_finds_a_minimal_diff(seed):
+    rng = random.Random(seed)
+    alphabet = [f'line {k}' for k in range(rng.randint(1, 6))]
+    a = _random_lines(rng, rng.randint(0, 40), alphabet)
+    b = _random_lines(rng, rng.randint(0, 40), alphabet)
+
+    opcodes = MyersDiffEngine().get_opcodes(a, b)
+
+    matched = _check_opcodes(opcodes, a, b)
+    assert matched == _lcs_length(a, b)
+    # SequenceMatcher is not minimal, so Myers never matches fewer lines than it
+    assert matched >= sum(size for _, _, size in SequenceMatcher(None, a, b, autojunk=False).get_matching_blocks())
+
+
+@pytest.mark.parametrize('seed', range(50))
+def test_myers_on_edits_of_a_file(seed):
+    rng = random.Random(seed)
+    a = [f'line {k}' for k in range(rng.randint(0, 300))]
+    b = list(a)
+    for _ in range(rng.randint(0, 10)):
+        position = rng.randint(0, len(b))
+        if b and rng.random() < 0.5:
+            del b[position:position + rng.randint(1, 5)]
+        else:
+            b[position:position] = [f'new {rng.random()}' for _ in range(rng.randint(1, 5))]
+
+    opcodes = MyersDiffEngine().get_opcodes(a, b)
+
+    assert _check_opcodes(opcodes, a, b) == _lcs_length(a, b)
+    assert MyersDiffEngine().changed_ranges(a, b) == [
+        (j1, j2 - 1) for tag, _, _, j1, j2 in opcodes if tag != 'equal'
+    ]
+
+
+def test_identical_and_empty_inputs():
+    engine = MyersDiffEngine()
+    assert engine.get_opcodes([], []) == []
+    assert engine.get_opcodes(['x'], ['x']) == [('equal', 0, 1, 0, 1)]
+    assert engine.get_opcodes([], ['x']) == [('insert', 0, 0, 0, 1)]
+    assert engine.get_opcodes(['x'], []) == [('delete', 0, 1, 0, 0)]
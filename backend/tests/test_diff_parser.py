@@ -0,0 +1,74 @@
+from conftest import lines
+
+from gittracker.diff_parser import iter_parse_diff
+
+
+def _diff(repo, *args):
+    return list(iter_parse_diff(repo.git('diff', '-U0', '--no-color', *args).splitlines()))
+
+
+def test_quoted_and_space_containing_paths(repo):
+    repo.commit({'with space.txt': 'a\n', 'café.txt': 'a\n', 'tab\there.txt': 'a\n'})
+    repo.commit({'with space.txt': 'b\n', 'café.txt': 'b\n', 'tab\there.txt': 'b\n'})
+
+    files = _diff(repo, 'HEAD~1', 'HEAD')
+
+    assert sorted(f.path for f in files) == ['café.txt', 'tab\there.txt', 'with space.txt']
+    for f in files:
+        assert (f.status, f.old_path, f.hunks) == ('modified', f.new_path, [(1, 1, 1, 1)])
+
+
+def test_renames_added_and_deleted_files(repo):
+    repo.commit({'old name.txt': lines(20), 'gone.txt': 'x\n'})
+    repo.git('mv', 'old name.txt', 'new name.txt')
+    repo.git('rm', '-q', 'gone.txt')
+    repo.commit({'new name.txt': lines(20, line5='changed'), 'added.txt': 'y\n'})
+
+    files = {f.path: f for f in _diff(repo, '-M', 'HEAD~1', 'HEAD')}
+
+    renamed = files['new name.txt']
+    assert (renamed.status, renamed.old_path, renamed.hunks) == ('renamed', 'old name.txt', [(5, 1, 5, 1)])
+    assert (files['gone.txt'].status, files['gone.txt'].new_path) == ('deleted', None)
+    assert (files['added.txt'].status, files['added.txt'].old_path) == ('added', None)
+    assert files['added.txt'].new_sha and files['gone.txt'].old_sha
+
+
+def test_binary_files(repo):
+    repo.commit({'image.bin': b'\x00\x01\x02'})
+    repo.commit({'image.bin': b'\x00\x03\x02'})
+
+    [file_diff] = _diff(repo, 'HEAD~1', 'HEAD')
+
+    assert file_diff.binary and file_diff.hunks == []
+    assert file_diff.path == 'image.bin'
+
+
+def test_zero_count_hunks_are_empty_ranges(repo):
+    repo.commit({'a.txt': lines(10)})
+    # Line 3 deleted, a line inserted after line 7
+    repo.commit({'a.txt': lines(10, line3='', line7='line 7\ninserted').replace('line 2\n\n', 'line 2\n')})
+
+    [file_diff] = _diff(repo, 'HEAD~1', 'HEAD')
+
+    assert file_diff.hunks == [(3, 1, 2, 0), (7, 0, 7, 1)]
+    assert file_diff.old_ranges == [(3, 3), (8, 7)]
+    assert file_diff.new_ranges == [(3, 2), (7, 7)]
+
+
+def test_content_lines_that_look_like_headers():
+    diff = [
+        'diff --git a/x b/x',
+        'index 1111111..2222222 100644',
+        '--- a/x',
+        '+++ b/x',
+        '@@ -1,2 +1,2 @@',
+        '--- not a header',
+        '-diff --git a/y b/y',
+        '+++ still content',
+        '+@@ -9 +9 @@',
+    ]
+
+    [file_diff] = iter_parse_diff(diff)
+
+    assert (file_diff.path, file_diff.hunks) == ('x', [(1, 2, 1, 2)])
+    assert (file_diff.old_sha, file_diff.new_sha) == ('1111111', '2222222')
@@ -0,0 +1,51 @@
+import random
+
+import pytest
+
+from gittracker.intervals import find_overlap_indexes, find_overlaps, find_overlaps_batch
+
+
+def _nested_loop(ranges1, ranges2):
+    """The comparison find_overlapping_changes made before the sweep"""
+    return [(i, j)
+            for i, (start1, end1) in enumerate(ranges1)
+            for j, (start2, end2) in enumerate(ranges2)
+            if start1 <= end2 and start2 <= end1]
+
+
+def _random_ranges(rng, n):
+    ranges = []
+    for _ in range(n):
+        start = rng.randint(1, 60)
+        if rng.random() < 0.25:
+            # Pure insertion or deletion: the empty range after line start - 1
+            ranges.append((start, start - 1))
+        else:
+            ranges.append((start, start + rng.randint(0, 8)))
+    return ranges
+
+
+@pytest.mark.parametrize('seed', range(300))
+def test_sweep_matches_the_nested_loop(seed):
+    rng = random.Random(seed)
+    ranges1 = _random_ranges(rng, rng.randint(0, 15))
+    ranges2 = _random_ranges(rng, rng.randint(0, 15))
+
+    assert find_overlap_indexes(ranges1, ranges2) == _nested_loop(ranges1, ranges2)
+
+
+def test_empty_ranges():
+    # An empty range only overlaps ranges that strictly contain its gap
+    assert find_overlap_indexes([(5, 4)], [(4, 5)]) == [(0, 0)]
+    assert find_overlap_indexes([(5, 4)], [(5, 6)]) == []
+    assert find_overlap_indexes([(5, 4)], [(1, 4)]) == []
+    assert find_overlap_indexes([(5, 4)], [(5, 4)]) == []
+
+
+def test_overlaps_and_batches():
+    ranges1 = [(1, 3), (10, 12)]
+    ranges2 = [(3, 4), (20, 21)]
+    assert find_overlaps(ranges1, ranges2) == [(1, 3, 3, 4)]
+    assert find_overlaps_batch({'a': (ranges1, ranges2), 'b': (ranges1, []), 'c': ([(7, 8)], [(1, 2)])}) == {
+        'a': [(1, 3, 3, 4)]
+    }
@@ -0,0 +1,67 @@
+import itertools
+
+from gittracker.git_utils import GitUtils
+from gittracker.merge_base import MergeBaseService, _CommitGraph
+
+
+def _criss_cross(repo):
+    """
+    Two branches that merged each other before moving on, so their tips have
+    two best common ancestors; returns every commit of interest by name
+    """
+    commits = {'base': repo.commit({'base.txt': 'base\n'}, 'base')}
+    repo.git('branch', 'y')
+    commits['x1'] = repo.commit({'x.txt': '1\n'}, 'x1')
+    repo.git('checkout', '-q', 'y')
+    commits['y1'] = repo.commit({'y.txt': '1\n'}, 'y1')
+    repo.git('merge', '-q', '--no-edit', commits['x1'])
+    commits['y2'] = repo.head('y')
+    repo.git('checkout', '-q', 'main')
+    repo.git('merge', '-q', '--no-edit', commits['y1'])
+    commits['x2'] = repo.head('main')
+    commits['x3'] = repo.commit({'x.txt': '3\n'}, 'x3')
+    repo.git('checkout', '-q', 'y')
+    commits['y3'] = repo.commit({'y.txt': '3\n'}, 'y3')
+    repo.git('checkout', '-q', '-b', 'z', commits['x1'])
+    commits['z1'] = repo.commit({'z.txt': '1\n'}, 'z1')
+    return commits
+
+
+def _git_merge_base(repo, sha1, sha2):
+    return repo.git('merge-base', sha1, sha2)
+
+
+def test_commit_graph_agrees_with_git_or_abstains(repo):
+    commits = _criss_cross(repo)
+    heads = [commits[name] for name in ('x3', 'y3', 'z1', 'y2')]
+    shared_base = commits['base']
+    parents = {}
+    for line in repo.git('rev-list', '--parents', *heads, '^' + shared_base).splitlines():
+        commit, *commit_parents = line.split()
+        parents[commit] = commit_parents
+    graph = _CommitGraph(parents)
+
+    for sha1, sha2 in itertools.permutations(heads, 2):
+        base = graph.merge_base(sha1, sha2, shared_base)
+        if len(repo.git('merge-base', '--all', sha1, sha2).split()) > 1:
+            # Several best common ancestors: left to git, whose pick depends on the order
+            assert base is None
+        else:
+            assert base == _git_merge_base(repo, sha1, sha2)
+
+
+def test_service_matches_git_merge_base_on_every_pair(repo):
+    commits = _criss_cross(repo)
+    pairs = list(itertools.permutations(commits.values(), 2))
+
+    bases = MergeBaseService(repo.path).merge_bases(pairs)
+
+    assert bases == [_git_merge_base(repo, sha1, sha2) for sha1, sha2 in pairs]
+
+
+def test_git_utils_keeps_returning_empty_for_unknown_revisions(repo):
+    repo.commit({'a.txt': 'a\n'})
+    git = GitUtils(repo.path)
+
+    assert git.get_merge_base('main', 'no-such-branch') == ''
+    assert git.get_merge_bases([('main', 'main'), ('main', 'no-such-branch')]) == [repo.head('main'), '']
@@ -0,0 +1,61 @@
+import threading
+
+import pytest
+
+from conftest import lines
+
+pytest.importorskip('flask')
+from gittracker import server  # noqa: E402
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(server, 'USE_SNAPSHOTS', False)
+    return server.app.test_client()
+
+
+def test_analyze_waits_for_the_result_with_several_workers(repo, client, monkeypatch):
+    repo.commit({'a.txt': lines(10)})
+    monkeypatch.setattr(server, 'MULTI_WORKER', True)
+
+    response = client.post('/analyze', json={'repo_path': repo.path, 'timeout': 0})
+
+    assert response.status_code == 200
+    assert response.get_json()['path'] == repo.path
+
+
+def test_watcher_updates_never_wait_on_the_analysis(repo, client, monkeypatch):
+    repo.commit({'a.txt': lines(10)})
+    release = threading.Event()
+    run_analysis = server.run_analysis
+
+    def slow_analysis(*args, **kwargs):
+        release.wait(10)
+        return run_analysis(*args, **kwargs)
+
+    monkeypatch.setattr(server, 'run_analysis', slow_analysis)
+
+    job = server.analyze_repository_incremental(repo.path, {'updated': {}})
+    assert not job.is_finished()
+
+    release.set()
+    job.wait(10)
+    assert job.status == server.Job.DONE
+    assert server.repo_states.peek(repo.path) is not None
+
+
+def test_a_missing_snapshot_is_looked_up_once(repo, client, monkeypatch):
+    repo.commit({'a.txt': lines(10)})
+    monkeypatch.setattr(server, 'USE_SNAPSHOTS', True)
+    reads = []
+    read_refs = server._read_refs
+    monkeypatch.setattr(server, '_read_refs', lambda *args: reads.append(args) or read_refs(*args))
+
+    assert server._cached_state(repo.path) is None
+    assert server._cached_state(repo.path) is None
+    assert len(reads) == 1
+
+    # Saving a snapshot changes the store, so the next miss looks again
+    server.run_analysis(repo.path)
+    server.repo_states.pop(repo.path)
+    assert server._cached_state(repo.path) is not None
@@ -0,0 +1,76 @@
+import http.client
+import threading
+import time
+
+import pytest
+
+from gittracker import serving
+
+pytestmark = pytest.mark.skipif(serving.waitress is None, reason='waitress is not installed')
+
+_stopping = threading.Event()
+
+
+def _app(environ, start_response):
+    """/events streams until the client leaves; everything else answers at once"""
+    if environ['PATH_INFO'] == '/events':
+        start_response('200 OK', [('Content-Type', 'text/event-stream')])
+
+        def stream():
+            while not _stopping.is_set():
+                yield b': keep-alive\n\n'
+                time.sleep(0.05)
+        return stream()
+    start_response('200 OK', [('Content-Type', 'application/json')])
+    return [b'{"conflicts": []}']
+
+
+@pytest.fixture
+def server():
+    server = serving._waitress_server(_app, '127.0.0.1', 0, threads=2, queue=4, max_streams=3)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    yield server
+    # Let the streams end before their channels' sockets go away
+    _stopping.set()
+    server.task_dispatcher.shutdown(timeout=5)
+    server.close()
+    _stopping.clear()
+
+
+def _get(server, path):
+    connection = http.client.HTTPConnection('127.0.0.1', server.effective_port, timeout=5)
+    connection.request('GET', path)
+    return connection, connection.getresponse()
+
+
+def test_requests_are_answered_while_streams_hold_threads(server):
+    streams = []
+    for _ in range(3):
+        connection, response = _get(server, '/events')
+        assert response.status == 200
+        assert response.readline() == b': keep-alive\n'
+        streams.append(connection)
+
+    connection, response = _get(server, '/events')
+    assert response.status == 503
+    connection.close()
+
+    for _ in range(4):
+        connection, response = _get(server, '/conflicts')
+        assert response.status == 200
+        assert response.read() == b'{"conflicts": []}'
+        connection.close()
+
+    for connection in streams:
+        connection.close()
+
+    # Waitress closes a stream once writing to its client fails, which frees its place
+    deadline = time.monotonic() + 5
+    while True:
+        connection, response = _get(server, '/events')
+        connection.close()
+        if response.status == 200 or time.monotonic() > deadline:
+            break
+        time.sleep(0.1)
+    assert response.status == 200
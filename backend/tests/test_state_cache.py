@@ -0,0 +1,12 @@
+from gittracker.models import BranchInfo, RepositoryState
+from gittracker.state_cache import StateCache, estimate_state_size
+
+
+def test_branches_without_an_author_can_be_cached():
+    state = RepositoryState('/repo', 'main', branches=[BranchInfo('main'), BranchInfo(None)])
+    cache = StateCache()
+
+    cache.put('/repo', state)
+
+    assert cache.get('/repo') is state
+    assert cache.current_bytes == estimate_state_size(state) > 0
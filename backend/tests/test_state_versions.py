@@ -0,0 +1,57 @@
+import gc
+import weakref
+
+from gittracker.models import Conflict, RepositoryState
+from gittracker.state_versions import StateVersions
+
+
+def _conflict(line: int, content: str = 'x') -> Conflict:
+    return Conflict('a.txt', 'main', 'feature', line, line, content, content)
+
+
+def _state(*conflicts: Conflict) -> RepositoryState:
+    return RepositoryState('/repo', 'main', conflicts=list(conflicts))
+
+
+def test_delta_reports_added_removed_and_changed_conflicts():
+    versions = StateVersions()
+    old = _state(_conflict(1), _conflict(2), _conflict(3))
+    since = versions.record('/repo', old, 'a' * 40)
+    new = _state(_conflict(1), _conflict(2, 'changed'), _conflict(4))
+    versions.record('/repo', new, 'b' * 40)
+
+    delta = versions.delta('/repo', new, since)
+
+    assert [c['id'] for c in delta['added']] == [_conflict(4).id]
+    assert delta['removed'] == [_conflict(3).id]
+    assert [c['content1'] for c in delta['changed']] == ['changed']
+
+
+def test_history_does_not_keep_past_conflicts_alive():
+    versions = StateVersions()
+    conflict = _conflict(1)
+    state = _state(conflict)
+    versions.record('/repo', state, 'a' * 40)
+    versions.find_conflict('/repo', state, conflict.id)
+    versions.record('/repo', _state(_conflict(2)), 'b' * 40)
+
+    ref = weakref.ref(conflict)
+    del conflict, state
+    gc.collect()
+    assert ref() is None
+
+
+def test_bodies_stay_within_their_budget():
+    versions = StateVersions(max_body_bytes=250)
+    states = []
+    for i in range(4):
+        state = RepositoryState(f'/repo{i}', 'main')
+        versions.record(state.path, state, 'a' * 40)
+        versions.body(state.path, state, 'state', lambda: {'pad': 'x' * 80})
+        states.append(state)
+
+    assert versions.body_bytes <= 250
+    assert versions.stats()['bodies'] == 2
+
+    versions.forget('/repo3')
+    assert versions.stats()['bodies'] == 1
@@ -174,8 +174,10 @@ class GitTracker {
             // Update status bar to show analysis in progress
             this.statusBar.setAnalyzing(true);
             // Call backend API to analyze repository
+            // wait: the backend otherwise answers 202 with a job id (see /jobs)
             const response = await axios_1.default.post(`${this.serverUrl}/analyze`, {
                 repo_path: this.workspaceRoot,
+                wait: true,
             });
             // Process results
             const conflicts = response.data.conflicts;
@@ -230,6 +230,7 @@ var GitTracker = /** @class */ (function () {
                         this.statusBar.setAnalyzing(true);
                         return [4 /*yield*/, axios_1.default.post("".concat(this.serverUrl, "/analyze"), {
                                 workspace: this.workspaceRoot,
+                                wait: true,
                             })];
                     case 1:
                         response = _a.sent();
@@ -184,8 +184,10 @@ export class GitTracker {
       this.statusBar.setAnalyzing(true);
 
       // Call backend API to analyze repository
+      // wait: the backend otherwise answers 202 with a job id (see /jobs)
       const response = await axios.post(`${this.serverUrl}/analyze`, {
         repo_path: this.workspaceRoot,
+        wait: true,
       });
 
       // Process results